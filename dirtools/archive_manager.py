@@ -153,7 +153,8 @@ class ArchiveManager:
         assert location._payloads[-1].protocol == "archive"
 
         origin = location.origin()
-        origin._payloads.append(Payload("archive", ""))
+        assert origin is not None
+        origin = origin.with_payload(Payload("archive", ""))
 
         loc_hash = hashlib.md5(origin.as_url().encode()).hexdigest()
         outdir = os.path.join(self._extractor_dir, loc_hash)
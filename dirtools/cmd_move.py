@@ -15,22 +15,24 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import List
+from typing import List, Optional
 
 import argparse
 import os
 import sys
 
 from dirtools.file_transfer import FileTransfer, ConsoleMediator, ConsoleProgress, Overwrite
-from dirtools.filesystem import Filesystem
+from dirtools.filesystem import Filesystem, Durability
+from dirtools.hash_cache import HashCache
+from dirtools.transfer_journal import TransferJournal
 
 
 def parse_args(action: str, args: List[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="{} files and directories.".format(action.capitalize()))
 
-    parser.add_argument('FILE', action='store', nargs='+',
+    parser.add_argument('FILE', action='store', nargs='*',
                         help='Files to {}'.format(action))
-    parser.add_argument('-t', '--target-directory', metavar='DIRECTORY', required=True,
+    parser.add_argument('-t', '--target-directory', metavar='DIRECTORY', default=None,
                         help="Target directory")
     parser.add_argument('-R', '--relative', action='store_true', default=False,
                         help="Preserve the path prefix on {}".format(action))
@@ -42,24 +44,101 @@ def parse_args(action: str, args: List[str]) -> argparse.Namespace:
                         help="NEVER overwrite any files")
     parser.add_argument('-Y', '--always', action='store_true', default=False,
                         help="ALWAYS overwrite files on conflict")
-    return parser.parse_args(args)
+    parser.add_argument('-u', '--update', '--sync', dest='update', action='store_true', default=False,
+                        help="Only overwrite files when size or mtime differ, merge directories")
+    parser.add_argument('-c', '--checksum', action='store_true', default=False,
+                        help="With --update compare checksums instead of mtime, checksums are cached")
+    parser.add_argument('--verify', action='store_true', default=False,
+                        help="Verify copied files by comparing checksums of source and destination")
+    parser.add_argument('--manifest', metavar='FILE', default=None,
+                        help="With --verify write the checksums of all copied files to FILE")
+    parser.add_argument('--streaming', action='store_true', default=False,
+                        help="Keep copied data out of the page cache, this is the default for files of 256MiB or more")
+    parser.add_argument('--durability', choices=[d.value for d in Durability], default=Durability.NONE.value,
+                        help="'none': leave it to the kernel, 'batch': sync the target filesystem once at the end, "
+                        "'strict': fsync every file (slow)")
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, default=None,
+                        help="Number of files to copy in parallel (default: 4 with --update, otherwise 1)")
+    if action == "move":
+        parser.add_argument('--resume', action='store_true', default=False,
+                            help="Resume an interrupted cross-device move")
+    else:
+        parser.set_defaults(resume=False)
+
+    result = parser.parse_args(args)
+
+    if result.manifest is not None and not result.verify:
+        parser.error("--manifest requires --verify")
+
+    if not result.resume:
+        if result.FILE == []:
+            parser.error("the following arguments are required: FILE")
+        if result.target_directory is None:
+            parser.error("the following arguments are required: -t/--target-directory")
+
+    return result
+
+
+def find_journal(action: str, sources: List[str], destdir: Optional[str]) -> Optional[TransferJournal]:
+    """Find the journal of the most recent interrupted transfer, if
+    'sources' or 'destdir' are given, the journal has to match them."""
+
+    journals = [journal for journal in TransferJournal.find_unfinished()
+                if journal.action == action]
+
+    if sources != []:
+        journals = [journal for journal in journals
+                    if journal.abs_sources() == [os.path.abspath(p) for p in sources]]
+
+    if destdir is not None:
+        journals = [journal for journal in journals
+                    if journal.destdir == os.path.abspath(destdir)]
+
+    if journals == []:
+        return None
+    else:
+        return journals[-1]
 
 
 def main(action: str, argv: List[str]) -> None:
     args = parse_args(action, argv[1:])
 
     sources = [os.path.normpath(p) for p in args.FILE]
-    destdir = os.path.normpath(args.target_directory)
+    destdir = os.path.normpath(args.target_directory) if args.target_directory is not None else None
+
+    journal: Optional[TransferJournal] = None
+    if args.resume:
+        journal = find_journal(action, sources, destdir)
+        if journal is None:
+            print("{}: no interrupted transfer found".format(argv[0]), file=sys.stderr)
+            sys.exit(1)
+
+        journal.acquire()
+        os.chdir(journal.cwd)
+        args.relative = journal.relative
+        destdir = journal.destdir
+        # sources that are gone have already been moved completely
+        sources = [p for p in journal.sources if os.path.lexists(p)]
+        print("resuming {} -> {}".format(", ".join(journal.abs_sources()), destdir))
+
+    assert destdir is not None
 
     fs = Filesystem()
     fs.verbose = args.verbose
     fs.enabled = not args.dry_run
+    fs.streaming = args.streaming
+    fs.durability = Durability(args.durability)
 
     mediator = ConsoleMediator()
     if args.always:
         mediator.overwrite = Overwrite.ALWAYS
     if args.never:
         mediator.overwrite = Overwrite.NEVER
+    if args.update:
+        mediator.overwrite = Overwrite.UPDATE
+        mediator.merge = Overwrite.UPDATE
+    if args.checksum:
+        mediator.hash_cache = HashCache()
 
     progress = ConsoleProgress()
     progress.verbose = args.verbose
@@ -67,7 +146,20 @@ def main(action: str, argv: List[str]) -> None:
     if not fs.isdir(destdir):
         raise Exception("{}: target directory does not exist".format(destdir))
 
-    ctx = FileTransfer(fs, mediator, progress)
+    if journal is None and action == "move" and fs.enabled:
+        journal = TransferJournal.create(action, sources, destdir, relative=args.relative)
+
+    if args.jobs is not None:
+        jobs = args.jobs
+    elif args.update:
+        jobs = 4
+    else:
+        jobs = 1
+
+    ctx = FileTransfer(fs, mediator, progress, journal, jobs=jobs)
+    ctx.verify = args.verify
+    if args.manifest is not None:
+        ctx.manifest = open(args.manifest, "w")
     for source in sources:
         if args.relative:
             actual_destdir = ctx.make_relative_dir(source, destdir)
@@ -80,6 +172,30 @@ def main(action: str, argv: List[str]) -> None:
         elif action == "move":
             ctx.move(source, actual_destdir)
 
+    ctx.finish()
+
+    if ctx.manifest is not None:
+        ctx.manifest.close()
+
+    if mediator.hash_cache is not None:
+        mediator.hash_cache.close()
+
+    if args.update:
+        progress.transfer_completed()
+
+    if progress.failed_verifications > 0:
+        print("{}: {} files failed verification".format(argv[0], progress.failed_verifications),
+              file=sys.stderr)
+        sys.exit(1)
+
+    # only reached when nothing went wrong, an interrupted transfer
+    # keeps its journal around for --resume
+    if journal is not None:
+        if fs.enabled:
+            journal.finish()
+        else:
+            journal.close()
+
 
 def move_main_entrypoint() -> None:
     main("move", sys.argv)
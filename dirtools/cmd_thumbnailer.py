@@ -27,6 +27,7 @@ from PyQt5.QtDBus import QDBusConnection
 
 from dirtools.dbus_thumbnailer import DBusThumbnailer, DBusThumbnailerListener
 from dirtools.dbus_thumbnail_cache import DBusThumbnailCache
+from dirtools.local_thumbnailer import LocalThumbnailer
 
 
 def parse_args(args: List[str]) -> argparse.Namespace:
@@ -50,6 +51,10 @@ def parse_args(args: List[str]) -> argparse.Namespace:
                         help="List supported URI types")
     parser.add_argument('-S', '--list-schedulers', action='store_true', default=False,
                         help="List supported schedulers")
+    parser.add_argument('-l', '--local', action='store_true', default=False,
+                        help="Generate the thumbnails in-process instead of using the D-Bus thumbnailer")
+    parser.add_argument('-j', '--jobs', metavar="N", type=int, default=None,
+                        help="Number of processes used with --local (default: number of CPUs)")
     return parser.parse_args(args)
 
 
@@ -111,9 +116,11 @@ def main(argv):
     app = QCoreApplication([])
 
     session_bus = QDBusConnection.sessionBus()
-    thumbnailer = DBusThumbnailer(session_bus,
-                                  ThumbnailerProgressListener(
-                                      app, verbose=args.verbose))
+    listener = ThumbnailerProgressListener(app, verbose=args.verbose)
+    if args.local:
+        thumbnailer = LocalThumbnailer(listener, max_workers=args.jobs)
+    else:
+        thumbnailer = DBusThumbnailer(session_bus, listener)
     thumbnail_cache = DBusThumbnailCache(session_bus)
     rc = 0
 
@@ -150,6 +157,9 @@ def main(argv):
     else:
         pass
 
+    if args.local:
+        thumbnailer.close()
+
     return rc
 
 
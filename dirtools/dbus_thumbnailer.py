@@ -143,7 +143,10 @@ class DBusThumbnailer(QObject):
     @pyqtSlot(QDBusMessage)
     def _receive_ready(self, msg):
         handle, uris = msg.arguments()
-        data = self.requests[handle]
+        data = self.requests.get(handle)
+        if data is None:
+            # dequeued or from another client
+            return
         self.listener.ready(handle, uris, data[2])
 
     @pyqtSlot(QDBusMessage)
@@ -196,8 +199,8 @@ class DBusThumbnailer(QObject):
     def dequeue(self, handle):
         logger.debug("DBusThumbnailer.dequeue: %s", handle)
 
-        handle, = self._call("Dequeue", handle)
-        del self.requests[handle]
+        self._call("Dequeue", dbus_uint(handle))
+        self.requests.pop(handle, None)
 
     def get_supported(self):
         uri_schemes, mime_types = self._call("GetSupported")
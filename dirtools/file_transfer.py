@@ -18,14 +18,23 @@
 import errno
 import hashlib
 import os
+import stat
 import sys
+import threading
+
+from typing import TYPE_CHECKING, IO, Optional, Set
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED, ALL_COMPLETED
 
 from enum import Enum
 from abc import ABC, abstractmethod
 import bytefmt
 
-from dirtools.filesystem import Filesystem
+from dirtools.filesystem import Filesystem, CopyProgressCallback, null_progress
 from dirtools.format import progressbar
+from dirtools.transfer_journal import TransferJournal
+
+if TYPE_CHECKING:
+    from dirtools.hash_cache import HashCache  # noqa: F401
 
 
 class CancellationException(Exception):
@@ -47,6 +56,7 @@ class Overwrite(Enum):
     ASK = 0
     NEVER = 1
     ALWAYS = 2
+    UPDATE = 3  # overwrite only when the file has changed
 
 
 def sha1sum(filename: str, blocksize: int = 65536) -> str:
@@ -59,6 +69,28 @@ def sha1sum(filename: str, blocksize: int = 65536) -> str:
         return hasher.hexdigest()
 
 
+def is_unchanged(source: str, dest: str, hash_cache: Optional['HashCache'] = None) -> bool:
+    """Returns True when 'dest' can be considered an up to date copy of
+    'source'. Without a 'hash_cache' this compares size and mtime,
+    with it the content checksums are compared instead of the
+    mtime."""
+
+    src_st = os.lstat(source)
+    dst_st = os.lstat(dest)
+
+    if stat.S_ISLNK(src_st.st_mode) or stat.S_ISLNK(dst_st.st_mode):
+        return (stat.S_ISLNK(src_st.st_mode) and stat.S_ISLNK(dst_st.st_mode) and
+                os.readlink(source) == os.readlink(dest))
+
+    if src_st.st_size != dst_st.st_size:
+        return False
+
+    if hash_cache is None:
+        return src_st.st_mtime_ns == dst_st.st_mtime_ns
+    else:
+        return hash_cache.sha1sum(source) == hash_cache.sha1sum(dest)
+
+
 class Mediator(ABC):
     """Whenever a filesystem operation would result in the destruction of data,
     the Mediator is called to decide which action should be taken."""
@@ -82,6 +114,10 @@ class ConsoleMediator(Mediator):
         self.overwrite: Overwrite = Overwrite.ASK
         self.merge: Overwrite = Overwrite.ASK
 
+        # used instead of plain sha1sum() when set, so that files
+        # don't have to be read again on every run
+        self.hash_cache: Optional['HashCache'] = None
+
     def cancel_transfer(self) -> bool:
         return False
 
@@ -97,12 +133,23 @@ class ConsoleMediator(Mediator):
             return ConflictResolution.OVERWRITE
         elif self.overwrite == Overwrite.NEVER:
             return ConflictResolution.SKIP
+        elif self.overwrite == Overwrite.UPDATE:
+            if is_unchanged(source, dest, self.hash_cache):
+                return ConflictResolution.SKIP
+            else:
+                return ConflictResolution.OVERWRITE
         else:
             assert False
 
+    def _sha1sum(self, filename: str) -> str:
+        if self.hash_cache is None:
+            return sha1sum(filename)
+        else:
+            return self.hash_cache.sha1sum(filename)
+
     def _file_conflict_interactive(self, source: str, dest: str) -> ConflictResolution:
-        source_sha1 = sha1sum(source)
-        dest_sha1 = sha1sum(dest)
+        source_sha1 = self._sha1sum(source)
+        dest_sha1 = self._sha1sum(dest)
         if source == dest:
             print("skipping '{}' same file as '{}'".format(source, dest))
             return ConflictResolution.SKIP
@@ -133,7 +180,7 @@ class ConsoleMediator(Mediator):
     def directory_conflict(self, sourcedir: str, destdir: str) -> ConflictResolution:
         if self.merge == Overwrite.ASK:
             return self._directory_conflict_interactive(sourcedir, destdir)
-        elif self.merge == Overwrite.ALWAYS:
+        elif self.merge == Overwrite.ALWAYS or self.merge == Overwrite.UPDATE:
             return ConflictResolution.OVERWRITE
         elif self.merge == Overwrite.NEVER:
             return ConflictResolution.SKIP
@@ -176,6 +223,10 @@ class Progress(ABC):
     def copy_directory(self, src: str, dst: str, resolution: ConflictResolution) -> None:
         pass
 
+    @abstractmethod
+    def verify_file(self, src: str, dst: str, success: bool) -> None:
+        pass
+
     @abstractmethod
     def remove_file(self, src: str) -> None:
         pass
@@ -210,9 +261,27 @@ class ConsoleProgress(Progress):
     def __init__(self):
         self.verbose: bool = False
 
+        self.new_files = 0
+        self.updated_files = 0
+        self.skipped_files = 0
+        self.failed_verifications = 0
+
+        # verify_file() gets called from the worker threads with -j
+        self._verify_lock = threading.Lock()
+
     def copy_file(self, src: str, dst: str, resolution: ConflictResolution) -> None:
+        if resolution == ConflictResolution.SKIP:
+            self.skipped_files += 1
+        elif resolution == ConflictResolution.OVERWRITE:
+            self.updated_files += 1
+        else:
+            self.new_files += 1
+
         if self.verbose:
-            print("copying {} -> {}".format(src, dst))
+            if resolution == ConflictResolution.SKIP:
+                print("skipping {}".format(src))
+            else:
+                print("copying {} -> {}".format(src, dst))
 
     def copy_progress(self, current: int, total: int) -> None:
         progress = current / total
@@ -229,6 +298,14 @@ class ConsoleProgress(Progress):
         if self.verbose:
             print("copying {} -> {}".format(src, dst))
 
+    def verify_file(self, src: str, dst: str, success: bool) -> None:
+        with self._verify_lock:
+            if not success:
+                self.failed_verifications += 1
+                print("verification failed: {} -> {}".format(src, dst))
+            elif self.verbose:
+                print("verified {} -> {}".format(src, dst))
+
     def remove_file(self, src: str) -> None:
         if self.verbose:
             print("removing {}".format(src))
@@ -253,16 +330,39 @@ class ConsoleProgress(Progress):
         print("transfer canceled")
 
     def transfer_completed(self) -> None:
-        print("transfer completed")
+        print("transfer completed: {} new, {} updated, {} skipped".format(
+            self.new_files, self.updated_files, self.skipped_files))
 
 
 class FileTransfer:
 
-    def __init__(self, fs: Filesystem, mediator: Mediator, progress: Progress) -> None:
+    def __init__(self, fs: Filesystem, mediator: Mediator, progress: Progress,
+                 journal: Optional[TransferJournal] = None, jobs: int = 1) -> None:
         self._fs = fs
         self._mediator = mediator
         self._progress = progress
 
+        # With more than one job, file content copies run in a thread
+        # pool while the directory traversal and conflict resolution
+        # continue in the calling thread. wait() has to be called at
+        # the end of the transfer.
+        self._jobs = jobs
+        self._executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(jobs) if jobs > 1 else None
+        self._pending: Set[Future] = set()
+
+        # Compare the checksum of the data read while copying with a
+        # checksum of the destination re-read from disk, when 'manifest'
+        # is set a 'sha1  filename' line is written for each verified
+        # file.
+        self.verify: bool = False
+        self.manifest: Optional[IO[str]] = None
+        self._manifest_lock = threading.Lock()
+
+        # Records the copy+delete fallback of cross-device moves, when
+        # the journal already contains entries from an earlier
+        # interrupted run, those are used to resume the transfer.
+        self._journal = journal
+
     def _move_file(self, source: str, destdir: str) -> None:
         assert self._fs.isreg(source) or self._fs.islink(source), "{}: unknown file type".format(source)
         assert os.path.isdir(destdir), "{}: not a directory".format(destdir)
@@ -274,7 +374,11 @@ class FileTransfer:
         self._move_file2(source, dest, destdir)
 
     def _move_file2(self, source: str, dest: str, destdir: str) -> None:
-        if self._fs.lexists(dest):
+        if self._journal is not None and \
+           self._journal.lookup(source, dest) is not None and \
+           self._fs.lexists(dest):
+            self._resume_move_file(source, dest)
+        elif self._fs.lexists(dest):
             resolution = self._mediator.file_conflict(source, dest)
             if resolution == ConflictResolution.SKIP:
                 self._progress.move_file(source, dest, resolution)
@@ -283,11 +387,7 @@ class FileTransfer:
                     self._fs.overwrite(source, dest)
                 except OSError as err:
                     if err.errno == errno.EXDEV:
-                        self._progress.copy_file(source, dest, resolution)
-                        self._fs.copy_file(source, dest, overwrite=True, progress=self._progress.copy_progress)
-
-                        self._progress.remove_file(source)
-                        self._fs.remove_file(source)
+                        self._move_file_crossdevice(source, dest, resolution)
                     else:
                         raise
             elif resolution == ConflictResolution.RENAME_SOURCE:
@@ -305,11 +405,42 @@ class FileTransfer:
                 self._fs.rename(source, dest)
             except OSError as err:
                 if err.errno == errno.EXDEV:
-                    self._fs.copy_file(source, dest, progress=self._progress.copy_progress)
-                    self._fs.remove_file(source)
+                    self._move_file_crossdevice(source, dest, ConflictResolution.NO_CONFLICT)
                 else:
                     raise
 
+    def _move_file_crossdevice(self, source: str, dest: str, resolution: ConflictResolution) -> None:
+        if self._journal is not None and self._fs.enabled:
+            self._journal.planned(source, dest)
+
+        self._progress.copy_file(source, dest, resolution)
+        if not self._copy_and_verify(source, dest,
+                                     overwrite=(resolution != ConflictResolution.NO_CONFLICT),
+                                     progress=self._progress.copy_progress):
+            # the copy is broken, keep the source around
+            return
+
+        if self._journal is not None and self._fs.enabled:
+            self._journal.completed(dest)
+            if not self._journal.is_transferred(source, dest):
+                raise Exception("{}: copy does not match source {}".format(dest, source))
+            self._journal.verified(dest)
+
+        self._progress.remove_file(source)
+        self._fs.remove_file(source)
+
+    def _resume_move_file(self, source: str, dest: str) -> None:
+        assert self._journal is not None
+
+        if self._journal.is_transferred(source, dest):
+            # the copy was finished in an earlier run, only the
+            # removal of the source is left to do
+            self._progress.remove_file(source)
+            self._fs.remove_file(source)
+        else:
+            # partial copy, start from scratch
+            self._move_file_crossdevice(source, dest, ConflictResolution.OVERWRITE)
+
     def _move_directory_content(self, sourcedir: str, destdir: str) -> None:
         assert os.path.isdir(sourcedir), "{}: not a directory".format(sourcedir)
         assert os.path.isdir(destdir), "{}: not a directory".format(destdir)
@@ -330,7 +461,13 @@ class FileTransfer:
         self._move_directory2(sourcedir, dest, destdir)
 
     def _move_directory2(self, sourcedir: str, dest: str, destdir: str) -> None:
-        if self._fs.lexists(dest):
+        if self._journal is not None and \
+           self._journal.lookup(sourcedir, dest) is not None and \
+           self._fs.isdir(dest):
+            # directory was created by an earlier interrupted run
+            self._move_directory_content(sourcedir, dest)
+            self._fs.rmdir(sourcedir)
+        elif self._fs.lexists(dest):
             resolution = self._mediator.directory_conflict(sourcedir, dest)
             if resolution == ConflictResolution.SKIP:
                 self._progress.move_directory(sourcedir, dest, resolution)
@@ -351,6 +488,8 @@ class FileTransfer:
                 self._fs.rename(sourcedir, dest)
             except OSError as err:
                 if err.errno == errno.EXDEV:
+                    if self._journal is not None and self._fs.enabled:
+                        self._journal.planned(sourcedir, dest)
                     self._fs.mkdir(dest)
                     self._fs.copy_stat(sourcedir, dest)
                     self._move_directory_content(sourcedir, dest)
@@ -420,7 +559,7 @@ class FileTransfer:
                 self._progress.copy_file(source, dest, resolution)
             elif resolution == ConflictResolution.OVERWRITE:
                 self._progress.copy_file(source, dest, resolution)
-                self._fs.copy_file(source, dest, overwrite=True, progress=self._progress.copy_progress)
+                self._copy_file_content(source, dest, overwrite=True)
             elif resolution == ConflictResolution.RENAME_SOURCE:
                 new_dest = self._fs.generate_unique(dest)
                 self._copy_file2(source, new_dest, destdir)
@@ -433,7 +572,61 @@ class FileTransfer:
                 assert False, "unknown conflict resolution: {}".format(resolution)
         else:
             self._progress.copy_file(source, dest, ConflictResolution.NO_CONFLICT)
-            self._fs.copy_file(source, dest, progress=self._progress.copy_progress)
+            self._copy_file_content(source, dest, overwrite=False)
+
+    def _copy_file_content(self, source: str, dest: str, overwrite: bool) -> None:
+        if self._executor is None:
+            self._copy_and_verify(source, dest, overwrite, self._progress.copy_progress)
+        else:
+            # limit the amount of queued copies, this also surfaces
+            # errors early instead of at the end of the transfer
+            while len(self._pending) >= 4 * self._jobs:
+                self._collect(FIRST_COMPLETED)
+
+            # per file progress makes no sense with multiple files in flight
+            self._pending.add(self._executor.submit(self._copy_and_verify, source, dest, overwrite, null_progress))
+
+    def _copy_and_verify(self, source: str, dest: str, overwrite: bool,
+                         progress: CopyProgressCallback) -> bool:
+        if not self.verify or not self._fs.enabled or self._fs.islink(source):
+            self._fs.copy_file(source, dest, overwrite=overwrite, progress=progress)
+            return True
+
+        hasher = hashlib.sha1()
+        self._fs.copy_file(source, dest, overwrite=overwrite, progress=progress, hasher=hasher)
+        source_sha1 = hasher.hexdigest()
+        dest_sha1 = self._fs.sha1sum_uncached(dest)
+
+        success = (source_sha1 == dest_sha1)
+        self._progress.verify_file(source, dest, success)
+
+        if success and self.manifest is not None:
+            with self._manifest_lock:
+                self.manifest.write("{}  {}\n".format(source_sha1, dest))
+
+        return success
+
+    def _collect(self, return_when: str) -> None:
+        done, self._pending = wait(self._pending, return_when=return_when)
+        for future in done:
+            future.result()
+
+    def wait(self) -> None:
+        """Wait for all outstanding copies to finish."""
+
+        if self._executor is not None:
+            try:
+                self._collect(ALL_COMPLETED)
+            finally:
+                self._executor.shutdown()
+                self._executor = None
+
+    def finish(self) -> None:
+        """Wait for outstanding copies and make the transfer durable as
+        far as the Filesystem's durability setting asks for it."""
+
+        self.wait()
+        self._fs.sync()
 
     def _copy_directory_content(self, sourcedir: str, destdir: str) -> None:
         assert os.path.isdir(sourcedir), "{}: not a directory".format(sourcedir)
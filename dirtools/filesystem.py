@@ -15,12 +15,17 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import List, Callable
+from typing import Any, IO, Dict, List, Callable, Optional, Set
 
+import ctypes
+import ctypes.util
+import hashlib
 import logging
 import os
 import shutil
 import stat
+import threading
+from enum import Enum
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +37,126 @@ def null_progress(current: int, total: int):
     pass
 
 
+SYNC_FILE_RANGE_WAIT_BEFORE = 1
+SYNC_FILE_RANGE_WRITE = 2
+SYNC_FILE_RANGE_WAIT_AFTER = 4
+
+
+def _load_sync_file_range() -> Optional[Callable[[int, int, int, int], int]]:
+    # sync_file_range() is Linux specific and not exposed by the os module
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        func = libc.sync_file_range
+    except (OSError, AttributeError):
+        return None
+    else:
+        func.argtypes = [ctypes.c_int, ctypes.c_int64, ctypes.c_int64, ctypes.c_uint]
+        func.restype = ctypes.c_int
+        return func
+
+
+_sync_file_range = _load_sync_file_range()
+
+
+def _load_syncfs() -> Optional[Callable[[int], int]]:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        func = libc.syncfs
+    except (OSError, AttributeError):
+        return None
+    else:
+        func.argtypes = [ctypes.c_int]
+        func.restype = ctypes.c_int
+        return func
+
+
+_syncfs = _load_syncfs()
+
+
+def syncfs(fd: int) -> None:
+    """Flush the filesystem containing 'fd' to disk."""
+
+    if _syncfs is None:
+        os.sync()
+    elif _syncfs(fd) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def fsync_path(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Durability(Enum):
+
+    NONE = "none"  # leave writeback to the kernel
+    BATCH = "batch"  # sync each touched filesystem once in Filesystem.sync()
+    STRICT = "strict"  # fsync every file and directory as it is changed
+
+
+def sync_file_range(fd: int, offset: int, nbytes: int, flags: int) -> None:
+    if _sync_file_range is None:
+        # fall back to flushing the whole file
+        os.fdatasync(fd)
+    elif _sync_file_range(fd, offset, nbytes, flags) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+class StreamingWriteback:
+    """Keeps the page cache footprint of a large copy small. The
+    destination is written back to disk in windows of 'window_size'
+    bytes: writeback of a window is started as soon as it is
+    complete, the window before it is waited for and then dropped
+    from the page cache, together with the corresponding range of the
+    source. This avoids evicting the rest of the page cache and
+    avoids the stall of flushing gigabytes of dirty pages at once."""
+
+    def __init__(self, fd_src: IO[bytes], fd_dst: IO[bytes], window_size: int) -> None:
+        self._fd_src = fd_src
+        self._fd_dst = fd_dst
+        self._window_size = window_size
+
+        # [0, _dropped) is on disk and no longer cached,
+        # [_dropped, _started) is being written back
+        self._dropped = 0
+        self._started = 0
+
+        os.posix_fadvise(self._fd_src.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+    def update(self, offset: int) -> None:
+        """Called after the data up to 'offset' has been written."""
+
+        if offset - self._started < self._window_size:
+            return
+
+        self._fd_dst.flush()
+        sync_file_range(self._fd_dst.fileno(), self._started, offset - self._started,
+                        SYNC_FILE_RANGE_WRITE)
+        self._drop(self._started)
+        self._started = offset
+
+    def finish(self, offset: int) -> None:
+        self._fd_dst.flush()
+        self._drop(offset)
+        self._started = offset
+
+    def _drop(self, offset: int) -> None:
+        if offset <= self._dropped:
+            return
+
+        length = offset - self._dropped
+        sync_file_range(self._fd_dst.fileno(), self._dropped, length,
+                        SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE | SYNC_FILE_RANGE_WAIT_AFTER)
+        os.posix_fadvise(self._fd_dst.fileno(), self._dropped, length, os.POSIX_FADV_DONTNEED)
+        os.posix_fadvise(self._fd_src.fileno(), self._dropped, length, os.POSIX_FADV_DONTNEED)
+        self._dropped = offset
+
+
 class Filesystem:
     """Low level filesystem functions, unlike the standard POSIX function
     the functions here try to be non-destructive and will error out when
@@ -41,6 +166,24 @@ class Filesystem:
     def __init__(self) -> None:
         self.buffer_size: int = 16 * 1024
 
+        # Streaming mode is for large files that are copied once and
+        # not needed again, it uses larger buffers and keeps them out
+        # of the page cache, see StreamingWriteback. It is enabled
+        # automatically for files of 'streaming_threshold' bytes or
+        # larger, set it to None to disable that.
+        self.streaming: bool = False
+        self.streaming_threshold: Optional[int] = 256 * 1024 * 1024
+        self.streaming_buffer_size: int = 1024 * 1024
+        self.streaming_window_size: int = 16 * 1024 * 1024
+
+        # How hard to try to get changes onto the disk, see Durability.
+        # In BATCH mode the touched directories and filesystems are
+        # collected and only synced when sync() is called.
+        self.durability: Durability = Durability.NONE
+        self._dirty_lock = threading.Lock()
+        self._dirty_dirs: Set[str] = set()
+        self._dirty_devices: Dict[int, str] = {}
+
         self.verbose: bool = True
         self.enabled: bool = True
 
@@ -53,6 +196,52 @@ class Filesystem:
         else:
             logger.info(text)
 
+    def _changed(self, path: str, data: bool = False) -> None:
+        """Called after 'path' has been created, removed or renamed, with
+        'data' after its content has been written."""
+
+        if self.durability == Durability.NONE:
+            return
+
+        parent = os.path.dirname(os.path.abspath(path))
+
+        if self.durability == Durability.STRICT:
+            if data:
+                fsync_path(path)
+            fsync_path(parent)
+        elif self.durability == Durability.BATCH:
+            with self._dirty_lock:
+                if parent not in self._dirty_dirs:
+                    self._dirty_dirs.add(parent)
+                    dev = os.stat(parent).st_dev
+                    if dev not in self._dirty_devices:
+                        self._dirty_devices[dev] = parent
+
+    def sync(self) -> None:
+        """Make the changes done so far durable, only does work in
+        Durability.BATCH mode, in the other modes this is a no-op."""
+
+        with self._dirty_lock:
+            dirty_dirs = self._dirty_dirs
+            dirty_devices = self._dirty_devices
+            self._dirty_dirs = set()
+            self._dirty_devices = {}
+
+        for dev, path in dirty_devices.items():
+            self._message("syncfs {!r}".format(path))
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                syncfs(fd)
+            finally:
+                os.close(fd)
+
+        # syncfs() covers the directories on Linux, the explicit
+        # fsync() is what POSIX requires and cheap when nothing is
+        # left to write
+        for directory in sorted(dirty_dirs):
+            if os.path.isdir(directory):
+                fsync_path(directory)
+
     def isdir(self, path: str) -> bool:
         return os.path.isdir(path)
 
@@ -77,24 +266,28 @@ class Filesystem:
 
         if self.enabled:
             os.symlink(src, dst)
+            self._changed(dst)
 
     def rmdir(self, path: str) -> None:
         self._message("rmdir {!r}".format(path))
 
         if self.enabled:
             os.rmdir(path)
+            self._changed(path)
 
     def mkdir(self, path: str) -> None:
         self._message("mkdir {!r}".format(path))
 
         if self.enabled:
             os.mkdir(path)
+            self._changed(path)
 
     def create_directory(self, path: str) -> None:
         self._message("create_directory {!r}".format(path))
 
         if self.enabled:
             os.mkdir(path)
+            self._changed(path)
 
     def create_file(self, path: str) -> None:
         self._message("create_file {!r}".format(path))
@@ -102,18 +295,22 @@ class Filesystem:
         if self.enabled:
             with open(path, "xb"):
                 pass
+            self._changed(path)
 
     def remove_file(self, path: str):
         self._message("remove_file {!r}".format(path))
 
         if self.enabled:
             os.unlink(path)
+            self._changed(path)
 
     def overwrite(self, src: str, dst: str) -> None:
         self._message("overwrite {!r} -> {!r}".format(src, dst))
 
         if self.enabled:
             os.rename(src, dst)
+            self._changed(src)
+            self._changed(dst)
 
     def rename(self, src: str, dst: str) -> None:
         self._message("rename {!r} -> {!r}".format(src, dst))
@@ -123,6 +320,8 @@ class Filesystem:
                 raise FileExistsError(dst)
             else:
                 os.rename(src, dst)
+                self._changed(src)
+                self._changed(dst)
 
     def rename_unique(self, path: str) -> str:
         new_path = self.generate_unique(path)
@@ -150,34 +349,55 @@ class Filesystem:
 
         if self.enabled:
             shutil.copystat(src, dst, follow_symlinks=False)
+            self._changed(dst, data=True)
 
     def _copy_filecontent(self, src: str, dst: str,
-                          progress: CopyProgressCallback = null_progress):
+                          progress: CopyProgressCallback = null_progress,
+                          hasher: Optional[Any] = None):
         assert self.enabled
 
         with open(src, 'rb') as fd_src, open(dst, 'wb') as fd_dst:
-
-            if progress is not None:
-                fd_src.seek(0, os.SEEK_END)
-                total_size = fd_src.tell()
-                fd_src.seek(0, os.SEEK_SET)
-                current_size = 0
+            total_size = os.fstat(fd_src.fileno()).st_size
+            current_size = 0
+
+            writeback: Optional[StreamingWriteback]
+            if self.streaming or \
+               (self.streaming_threshold is not None and total_size >= self.streaming_threshold):
+                writeback = StreamingWriteback(fd_src, fd_dst, self.streaming_window_size)
+                buffer_size = self.streaming_buffer_size
+            else:
+                writeback = None
+                buffer_size = self.buffer_size
 
             while True:
-                buf = fd_src.read(self.buffer_size)
+                buf = fd_src.read(buffer_size)
 
                 if not buf:
                     break
 
                 fd_dst.write(buf)
+                current_size += len(buf)
+
+                if writeback is not None:
+                    writeback.update(current_size)
+
+                if hasher is not None:
+                    hasher.update(buf)
 
                 if progress is not None:
-                    current_size += len(buf)
                     progress(current_size, total_size)
 
+            if writeback is not None:
+                writeback.finish(current_size)
+
     def copy_file(self, src: str, dst: str,
                   overwrite: bool = False,
-                  progress: CopyProgressCallback = null_progress) -> None:
+                  progress: CopyProgressCallback = null_progress,
+                  hasher: Optional[Any] = None) -> None:
+        """Copy 'src' to 'dst'. When 'hasher' is given (e.g. a
+        hashlib.sha1() object) it gets fed the data as it is read, so
+        the checksum of the source comes without an extra read."""
+
         self._message("copy_file {!r} -> {!r}  overwrite={}".format(src, dst, overwrite))
 
         if not self.enabled:
@@ -202,9 +422,34 @@ class Filesystem:
 
                 if self.islink(src):
                     os.symlink(os.readlink(src), dst)
+                    self._changed(dst)
                 else:
-                    self._copy_filecontent(src, dst, progress)
+                    self._copy_filecontent(src, dst, progress, hasher)
                     shutil.copystat(src, dst, follow_symlinks=False)
+                    self._changed(dst, data=True)
+
+    def sha1sum_uncached(self, path: str) -> str:
+        """Calculate the checksum of the file as it is stored on disk,
+        not as it is in the page cache, by flushing and dropping the
+        file from the cache before reading it."""
+
+        hasher = hashlib.sha1()
+
+        with open(path, 'rb') as fin:
+            fd = fin.fileno()
+
+            # POSIX_FADV_DONTNEED only drops clean pages, so the file
+            # has to be written back first
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+            while True:
+                buf = fin.read(self.buffer_size)
+                if not buf:
+                    break
+                hasher.update(buf)
+
+        return hasher.hexdigest()
 
     def makedirs(self, path: str) -> None:
         self._message("makedirs: {!r}".format(path))
@@ -213,6 +458,7 @@ class Filesystem:
             # makedirs() fails if the last element in the path already exists
             if not os.path.isdir(path):
                 os.makedirs(path)
+                self._changed(path)
 
 
 # EOF #
@@ -24,12 +24,15 @@ import logging
 import logging.config
 import xdg.BaseDirectory
 
+from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QPixmapCache
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtDBus import QDBusConnection
 
 from dirtools.dbus_thumbnail_cache import DBusThumbnailCache
 from dirtools.fileview.bookmarks import Bookmarks
+from dirtools.fileview.directory_cache import DirectoryCache
+from dirtools.fileview.pixmap_cache import PixmapCache
 from dirtools.fileview.executor import Executor
 from dirtools.fileview.filesystem_operations import FilesystemOperations
 from dirtools.fileview.history import SqlHistory
@@ -90,6 +93,8 @@ class FileViewApplication:
 
         self.stream_manager = StreamManager(self.stream_dir)
         self.vfs = VirtualFilesystem(self.cache_dir, self)
+        self.directory_cache = DirectoryCache()
+        self.pixmap_cache = PixmapCache()
         self.executor = Executor(self)
         self.thumbnailer = Thumbnailer(self.vfs)
         self.metadata_collector = MetaDataCollector(self.vfs.get_stdio_fs())
@@ -116,6 +121,7 @@ class FileViewApplication:
         self.qapp.quit()
 
     def run(self) -> int:
+        QTimer.singleShot(0, self.fs_operations.resume_interrupted_transfers)
         return cast(int, self.qapp.exec())
 
     def close(self) -> None:
@@ -37,20 +37,24 @@ class ArchiveDirectoryWatcher:
         self._directory_watcher.start()
 
     @property
-    def sig_file_added(self):
-        return self._directory_watcher.sig_file_added
+    def sig_files_added(self):
+        return self._directory_watcher.sig_files_added
 
     @property
-    def sig_file_removed(self):
-        return self._directory_watcher.sig_file_removed
+    def sig_files_removed(self):
+        return self._directory_watcher.sig_files_removed
 
     @property
-    def sig_file_modified(self):
-        return self._directory_watcher.sig_file_modified
+    def sig_files_modified(self):
+        return self._directory_watcher.sig_files_modified
 
     @property
-    def sig_file_closed(self):
-        return self._directory_watcher.sig_file_closed
+    def sig_files_closed(self):
+        return self._directory_watcher.sig_files_closed
+
+    @property
+    def sig_scandir_progress(self):
+        return self._directory_watcher.sig_scandir_progress
 
     @property
     def sig_scandir_finished(self):
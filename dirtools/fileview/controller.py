@@ -29,6 +29,7 @@ import bytefmt
 from dirtools.fileview.file_collection import FileCollection
 from dirtools.fileview.grouper import (DayGrouper, DirectoryGrouper,
                                        NoGrouper, DurationGrouper)
+from dirtools.fileview.directory_cache import DirectoryReconciler
 from dirtools.fileview.directory_watcher import DirectoryWatcher
 from dirtools.fileview.filter_parser import FilterParser
 from dirtools.fileview.settings import settings
@@ -38,6 +39,7 @@ from dirtools.fileview.file_view import FileItemStyle
 from dirtools.fileview.gnome import parse_gnome_copied_files, make_gnome_copied_files
 from dirtools.util import make_non_existing_filename
 from dirtools.fileview.path_completion import PathCompletion
+from dirtools.fileview.prefetcher import Prefetcher
 from dirtools.fileview.menu import Menu
 from dirtools.fileview.history_menu import make_history_menu_entries
 from dirtools.fileview.gui import Gui
@@ -75,7 +77,19 @@ class Controller(QObject):
 
         self._directory_watcher: Optional[DirectoryWatcher] = None
 
+        # the location whose complete directory content is in the
+        # FileCollection, it goes into the DirectoryCache when the
+        # location is left
+        self._snapshot_location: Optional[Location] = None
+
+        # applies the rescan of a directory restored from the
+        # DirectoryCache
+        self._reconciler: Optional[DirectoryReconciler] = None
+
+        self._prefetcher = Prefetcher(self.app)
+
         self._gui._window.file_view.set_file_collection(self.file_collection)
+        self.file_collection.sig_files_filtered.connect(self._update_info)
 
         self.app.metadata_collector.sig_metadata_ready.connect(self.receive_metadata)
 
@@ -93,8 +107,12 @@ class Controller(QObject):
             self._directory_watcher.close()
             self._directory_watcher = None
 
+        self._reconciler = None
+
     def close(self) -> None:
+        self._prefetcher.close()
         self.close_streams()
+        self.file_collection.close()
         self._path_completion.close()
 
     def _apply_settings(self) -> None:
@@ -113,7 +131,7 @@ class Controller(QObject):
     def show_hidden(self) -> None:
         self._filter.show_hidden = not self._filter.show_hidden
         settings.set_value("globals/show_hidden", self._filter.show_hidden)
-        self.file_collection.set_filter(self._filter)
+        self._apply_filter()
 
     def show_filtered(self) -> None:
         self._gui._window.file_view.set_show_filtered(not self._gui._window.file_view.show_filtered)
@@ -163,16 +181,19 @@ class Controller(QObject):
 
     def clear_filter(self) -> None:
         self._filter.set_match_func(None)
-        self.file_collection.set_filter(self._filter)
-        self._update_info()
+        self._apply_filter()
 
     def set_filter(self, pattern: str) -> None:
         parser = FilterParser()
         match_func = parser.parse(pattern)
         if match_func is not None:
-            self._filter.set_match_func(match_func)
-            self.file_collection.set_filter(self._filter)
-        self._update_info()
+            self._filter.set_match_func(match_func, pattern)
+            self._apply_filter()
+
+    def _apply_filter(self) -> None:
+        # _update_info() is called via sig_files_filtered as the
+        # batches come in
+        self.file_collection.set_filter(self._filter, self._gui._window.file_view.viewport_fileinfos())
 
     def go_forward(self) -> None:
         if self._location_history != []:
@@ -203,16 +224,53 @@ class Controller(QObject):
         logger.info("Controller._on_finished")
         self._gui._window.hide_loading()
 
+    def _on_scandir_progress(self, fileinfos) -> None:
+        logger.debug("Controller._on_scandir_progress: %d", len(fileinfos))
+        if self._reconciler is not None:
+            self._reconciler.add_fileinfos(fileinfos)
+        else:
+            self.file_collection.add_fileinfos(fileinfos)
+
     def _on_scandir_finished(self, fileinfos) -> None:
         logger.info("Controller._on_scandir_extractor_finished")
         self._gui._window.hide_loading()
 
-        self.file_collection.set_fileinfos(fileinfos)
+        if self._reconciler is not None:
+            self._reconciler.add_fileinfos(fileinfos)
+            self._reconciler.finish()
+            self._reconciler = None
+        else:
+            self.file_collection.add_fileinfos(fileinfos)
+
+        if isinstance(self._directory_watcher, DirectoryWatcher) and self.location is not None:
+            self._snapshot_location = self.location
+            self._prefetcher.prefetch_siblings(self.location)
+        self._prefetcher.resume()
+
+    def _on_search_progress(self, dirs_scanned: int, found_count: int) -> None:
+        self._gui._window.show_info("Searching... {} directories scanned, {} found".format(
+            dirs_scanned, found_count))
+
+    def _on_files_added(self, fileinfos) -> None:
+        self.file_collection.add_fileinfos(fileinfos, new=True)
 
     def _on_directory_watcher_message(self, message):
         self._gui._window._message_area.show_error(message)
 
+        if self._reconciler is not None:
+            # the directory can't be read anymore, so the restored
+            # content is of no use
+            self._reconciler = None
+            self.file_collection.clear()
+
+    def _store_snapshot(self) -> None:
+        if self._snapshot_location is not None:
+            self.app.directory_cache.store(self._snapshot_location, self.file_collection.snapshot())
+            self._snapshot_location = None
+
     def set_location(self, location: Location, track_history=True) -> None:
+        self._prefetcher.suspend()
+        self._store_snapshot()
         self.close_streams()
 
         self._gui._window.location_lineedit.hide()
@@ -240,7 +298,15 @@ class Controller(QObject):
         self.sig_location_changed.emit(location)
 
     def _set_directory_location(self, location: Location) -> None:
-        self.file_collection.clear()
+        snapshot = self.app.directory_cache.take(location)
+        if snapshot is None:
+            self.file_collection.clear()
+        else:
+            # show the old content right away, the rescan only applies
+            # what changed since
+            logger.debug("Controller._set_directory_location: cached: %s", location)
+            self.file_collection.restore(snapshot)
+            self._reconciler = DirectoryReconciler(self.file_collection)
 
         if self._directory_watcher is not None:
             self._directory_watcher.close()
@@ -258,12 +324,30 @@ class Controller(QObject):
         if hasattr(self._directory_watcher, 'sig_file_closed'):
             self._directory_watcher.sig_file_closed.connect(self.file_collection.close_file)
 
+        if hasattr(self._directory_watcher, 'sig_files_added'):
+            self._directory_watcher.sig_files_added.connect(self._on_files_added)
+
+        if hasattr(self._directory_watcher, 'sig_files_removed'):
+            self._directory_watcher.sig_files_removed.connect(self.file_collection.remove_files)
+
+        if hasattr(self._directory_watcher, 'sig_files_modified'):
+            self._directory_watcher.sig_files_modified.connect(self.file_collection.modify_files)
+
+        if hasattr(self._directory_watcher, 'sig_files_closed'):
+            self._directory_watcher.sig_files_closed.connect(self.file_collection.close_files)
+
         if hasattr(self._directory_watcher, 'sig_finished'):
             self._directory_watcher.sig_finished.connect(self._on_finished)
 
+        if hasattr(self._directory_watcher, 'sig_scandir_progress'):
+            self._directory_watcher.sig_scandir_progress.connect(self._on_scandir_progress)
+
         if hasattr(self._directory_watcher, 'sig_scandir_finished'):
             self._directory_watcher.sig_scandir_finished.connect(self._on_scandir_finished)
 
+        if hasattr(self._directory_watcher, 'sig_search_progress'):
+            self._directory_watcher.sig_search_progress.connect(self._on_search_progress)
+
         if hasattr(self._directory_watcher, 'sig_message'):
             self._directory_watcher.sig_message.connect(self._on_directory_watcher_message)
 
@@ -333,12 +417,12 @@ class Controller(QObject):
             total,
             bytefmt.humanize(total_size))
 
-        selected_items = self._gui._window.file_view._scene.selectedItems()
-        if selected_items != []:
+        selected_fileinfos = self.file_collection.selected_fileinfos()
+        if selected_fileinfos != []:
             total_size = 0
-            for item in selected_items:
-                total_size += item.fileinfo.size()
-            msg += ", {} selected ({})".format(len(selected_items), bytefmt.humanize(total_size))
+            for fileinfo in selected_fileinfos:
+                total_size += fileinfo.size()
+            msg += ", {} selected ({})".format(len(selected_fileinfos), bytefmt.humanize(total_size))
 
         self._gui._window.show_info(msg)
 
@@ -359,8 +443,7 @@ class Controller(QObject):
 
         if not fileinfo.isdir():
             if fileinfo.is_archive() and settings.value("globals/open_archives", True, bool):
-                location = fileinfo.location().copy()
-                location._payloads.append(Payload("archive", ""))
+                location = fileinfo.location().with_payload(Payload("archive", ""))
 
                 if new_window:
                     self.new_controller().set_location(location)
@@ -378,15 +461,10 @@ class Controller(QObject):
                 self.set_location(fileinfo.location())
 
     def clear_selection(self) -> None:
-        self._gui._window.file_view._scene.clearSelection()
+        self.file_collection.clear_selection()
 
     def select_all(self) -> None:
-        scene = self._gui._window.file_view._scene
-        oldstate = scene.blockSignals(True)
-        for item in scene.items():
-            item.setSelected(True)
-        scene.blockSignals(oldstate)
-        scene.selectionChanged.emit()
+        self.file_collection.select_all()
 
     def on_context_menu(self, pos) -> None:
         self._gui.on_context_menu(pos)
@@ -398,14 +476,21 @@ class Controller(QObject):
         self._gui._window.show_current_filename(filename)
 
     def add_files(self, files: List[Location]) -> None:
-        for location in files:
-            self.file_collection.add_fileinfo(self.app.vfs.get_fileinfo(location))
+        with self.file_collection.changes():
+            for location in files:
+                self.file_collection.add_fileinfo(self.app.vfs.get_fileinfo(location))
 
     def set_crop_thumbnails(self, v: bool) -> None:
         settings.set_value("globals/crop_thumbnails", v)
         self._gui._window.file_view.set_crop_thumbnails(v)
 
+    def prefetch_hint(self, fileinfo: FileInfo) -> None:
+        """The user is pointing at 'fileinfo', so it might be next."""
+        if fileinfo.isdir():
+            self._prefetcher.prefetch_directory(fileinfo.location())
+
     def request_metadata(self, fileinfo: FileInfo) -> None:
+        self._prefetcher.postpone()
         self.app.metadata_collector.request_metadata(fileinfo.location())
 
     def receive_metadata(self, location: Location, metadata: Dict[str, object]) -> None:
@@ -414,18 +499,26 @@ class Controller(QObject):
         if fileinfo is None:
             logger.error("Controller.receive_metadata: not found fileinfo for %s", location)
         else:
-            fileinfo.metadata().update(metadata)
+            fileinfo.update_metadata(metadata)
             self.file_collection.update_fileinfo(fileinfo)
 
-    def request_thumbnail(self, fileinfo: FileInfo, flavor: str, force: bool) -> None:
+    def request_thumbnail(self, fileinfo: FileInfo, flavor: str, force: bool, priority: int = 0) -> None:
+        self._prefetcher.postpone()
         self.app.thumbnailer.request_thumbnail(fileinfo.location(), flavor, force,
-                                               self.receive_thumbnail)
+                                               self.receive_thumbnail, priority)
+
+    def prioritize_thumbnails(self, priorities: Dict[Location, int]) -> None:
+        self.app.thumbnailer.prioritize_thumbnails(priorities, self.receive_thumbnail)
+
+    def cancel_thumbnails(self, locations: List[Location]) -> None:
+        self.app.thumbnailer.cancel_thumbnails(locations, self.receive_thumbnail)
 
     def prepare(self) -> None:
         self._gui._window.file_view.prepare()
 
     def reload(self) -> None:
         if self.location is not None:
+            self._snapshot_location = None
             self.set_location(self.location)
         else:
             self._gui._window.set_file_list()
@@ -434,8 +527,8 @@ class Controller(QObject):
             fileinfos = (self.app.vfs.get_fileinfo(f.location()) for f in fileinfos)
             self.file_collection.set_fileinfos(fileinfos)
 
-    def receive_thumbnail(self, location: Location, flavor: str,
-                          pixmap, error_code: int, message: str) -> None:
+    def receive_thumbnail(self, location: Location, flavor: Optional[str],
+                          pixmap, error_code: Optional[int], message: Optional[str]) -> None:
         logger.debug("Controller.receive_thumbnail: %s %s %s %s %s",
                      location, flavor, pixmap, error_code, message)
         if pixmap is None:
@@ -444,31 +537,29 @@ class Controller(QObject):
         self._gui._window.file_view.receive_thumbnail(location, flavor, pixmap, error_code, message)
 
     def reload_thumbnails(self) -> None:
-        selected_items = self._gui._window.file_view._scene.selectedItems()
-        files = [item.fileinfo.abspath()
-                 for item in selected_items]
+        fileinfos = self.selected_fileinfos()
+        files = [fileinfo.abspath()
+                 for fileinfo in fileinfos]
         self.app.dbus_thumbnail_cache.delete(files)
+        for fileinfo in fileinfos:
+            self.app.pixmap_cache.discard(fileinfo.location().as_url())
 
-        for item in selected_items:
-            item.reload_thumbnail()
+        self._gui._window.file_view.reload_thumbnails(fileinfos)
 
     def reload_metadata(self) -> None:
-        selected_items = self._gui._window.file_view._scene.selectedItems()
-        locations = [item.fileinfo.location() for item in selected_items]
+        fileinfos = self.selected_fileinfos()
+        locations = [fileinfo.location() for fileinfo in fileinfos]
         self.app.metadata_collector.request_delete_metadatas(locations)
 
-        for item in selected_items:
-            item.reload_metadata()
+        self._gui._window.file_view.reload_metadata(fileinfos)
 
     def make_directory_thumbnails(self) -> None:
-        selected_items = self._gui._window.file_view._scene.selectedItems()
         locations = []
-        for item in selected_items:
-            if item.fileinfo.isdir():
-                locations.append(item.fileinfo.location())
-            elif item.fileinfo.is_archive():
-                location = item.fileinfo.location().copy()
-                location._payloads.append(Payload("archive", ""))
+        for fileinfo in self.selected_fileinfos():
+            if fileinfo.isdir():
+                locations.append(fileinfo.location())
+            elif fileinfo.is_archive():
+                location = fileinfo.location().with_payload(Payload("archive", ""))
                 locations.append(location)
 
         for location in locations:
@@ -489,13 +580,11 @@ class Controller(QObject):
 
     def show_rename_dialog(self, location: Optional[Location] = None) -> None:
         if location is None:
-            item = self._gui._window.file_view._cursor_item
-            if item is None:
+            location = self.file_collection.cursor()
+            if location is None:
                 logger.error("no file selected for renaming")
                 return
 
-            location = item.fileinfo.location()
-
         self.app.fs_operations.rename_location(location, parent=self._gui._window)
 
     def toggle_bookmark(self) -> bool:
@@ -639,10 +728,8 @@ class Controller(QObject):
 
         # https://www.uninformativ.de/blog/postings/2017-04-02/0/POSTING-en.html
 
-    def selected_fileinfos(self):
-        selected_items = self._gui._window.file_view._scene.selectedItems()
-        return [item.fileinfo
-                for item in selected_items]
+    def selected_fileinfos(self) -> List[FileInfo]:
+        return self.file_collection.selected_fileinfos()
 
     def selection_to_mimedata(self, uri_only=False, action: Qt.DropActions = None):
         mime_data = QMimeData()
@@ -0,0 +1,157 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import TYPE_CHECKING, List, Optional, Set, cast
+
+import logging
+from collections import OrderedDict
+
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.location import Location
+from dirtools.fileview.settings import settings
+
+if TYPE_CHECKING:
+    from dirtools.fileview.file_collection import FileCollection, FileCollectionSnapshot  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+# Default for "globals/directory_cache_size" in MiB
+DIRECTORY_CACHE_SIZE = 64
+
+# Rough memory use of a FileInfo including its Location, path and
+# sort key, metadata is not accounted for. The FileInfo with its
+# Location is ~456 bytes, as measured by
+# experiments/fileinfo_memory/fileinfo_memory.py, the cached sort key
+# of a name like "IMG_000001.jpg" adds ~200 bytes.
+FILEINFO_SIZE_ESTIMATE = 456 + 200
+
+
+class DirectoryCache:
+    """Keeps the content of recently viewed directories around, so that
+    going back to one of them can show it right away instead of
+    waiting for a rescan. The least recently used snapshots are dropped
+    once the estimated memory use exceeds the
+    "globals/directory_cache_size" setting."""
+
+    def __init__(self) -> None:
+        self._snapshots: OrderedDict[Location, 'FileCollectionSnapshot'] = OrderedDict()
+        self._size = 0
+
+    def budget(self) -> int:
+        return cast(int, settings.value("globals/directory_cache_size", DIRECTORY_CACHE_SIZE, int)) * 1024 * 1024
+
+    def store(self, location: Location, snapshot: 'FileCollectionSnapshot') -> None:
+        self.discard(location)
+
+        size = len(snapshot.fileinfos) * FILEINFO_SIZE_ESTIMATE
+        if size > self.budget():
+            logger.debug("DirectoryCache.store: %s: too large: %d", location, size)
+            return
+
+        self._snapshots[location] = snapshot
+        self._size += size
+        self._shrink()
+
+    def take(self, location: Location) -> Optional['FileCollectionSnapshot']:
+        """Removes the snapshot of 'location' from the cache and returns
+        it, the FileInfos are shared with the FileCollection it gets
+        restored into, so it can't stay in the cache."""
+
+        snapshot = self._snapshots.pop(location, None)
+        if snapshot is not None:
+            self._size -= len(snapshot.fileinfos) * FILEINFO_SIZE_ESTIMATE
+        return snapshot
+
+    def peek(self, location: Location) -> Optional['FileCollectionSnapshot']:
+        """Returns the snapshot of 'location' while leaving it in the
+        cache, the FileInfos must not be modified."""
+        return self._snapshots.get(location)
+
+    def discard(self, location: Location) -> None:
+        self.take(location)
+
+    def clear(self) -> None:
+        self._snapshots.clear()
+        self._size = 0
+
+    def _shrink(self) -> None:
+        budget = self.budget()
+        while self._size > budget and self._snapshots:
+            location, snapshot = self._snapshots.popitem(last=False)
+            self._size -= len(snapshot.fileinfos) * FILEINFO_SIZE_ESTIMATE
+            logger.debug("DirectoryCache._shrink: dropped %s", location)
+
+    def __contains__(self, location: Location) -> bool:
+        return location in self._snapshots
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+
+class DirectoryReconciler:
+    """Applies a rescan of a directory to a FileCollection that has been
+    restored from a snapshot. Only the differences reach the
+    collection, unchanged files keep their FileInfo along with its
+    metadata."""
+
+    def __init__(self, file_collection: 'FileCollection') -> None:
+        self._file_collection = file_collection
+        self._unseen: Set[Location] = {fi.location() for fi in file_collection.get_fileinfos()}
+
+    def add_fileinfos(self, fileinfos: List[FileInfo]) -> None:
+        added: List[FileInfo] = []
+        modified: List[FileInfo] = []
+
+        for fileinfo in fileinfos:
+            location = fileinfo.location()
+            old = self._file_collection.get_fileinfo(location)
+            if old is None:
+                added.append(fileinfo)
+            else:
+                self._unseen.discard(location)
+                if self._is_modified(old, fileinfo):
+                    modified.append(fileinfo)
+
+        if added:
+            self._file_collection.add_fileinfos(added)
+
+        if modified:
+            self._file_collection.modify_files(modified)
+
+    def _is_modified(self, old: FileInfo, new: FileInfo) -> bool:
+        # atime is left out, as it changes by just looking at a file,
+        # ctime covers changes to mode and ownership
+        return (old.error() != new.error() or
+                old.isdir() != new.isdir() or
+                old.size() != new.size() or
+                old.mtime() != new.mtime() or
+                old.ctime() != new.ctime())
+
+    def finish(self) -> None:
+        """The rescan is complete, whatever wasn't seen is gone."""
+
+        # inotify might have removed some of them already
+        removed = [location for location in self._unseen
+                   if self._file_collection.get_fileinfo(location) is not None]
+        self._unseen.clear()
+
+        if removed:
+            self._file_collection.remove_files(removed)
+
+
+# EOF #
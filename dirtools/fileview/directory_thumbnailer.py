@@ -76,9 +76,24 @@ class DirectoryThumbnailerTask(QObject):
         if hasattr(self._stream, 'sig_file_closed'):
             self._stream.sig_file_closed.connect(self._file_collection.close_file)
 
+        if hasattr(self._stream, 'sig_files_added'):
+            self._stream.sig_files_added.connect(self._file_collection.add_fileinfos)
+
+        if hasattr(self._stream, 'sig_files_removed'):
+            self._stream.sig_files_removed.connect(self._file_collection.remove_files)
+
+        if hasattr(self._stream, 'sig_files_modified'):
+            self._stream.sig_files_modified.connect(self._file_collection.modify_files)
+
+        if hasattr(self._stream, 'sig_files_closed'):
+            self._stream.sig_files_closed.connect(self._file_collection.close_files)
+
         if hasattr(self._stream, 'sig_finished'):
             self._stream.sig_finished.connect(self._on_finished)
 
+        if hasattr(self._stream, 'sig_scandir_progress'):
+            self._stream.sig_scandir_progress.connect(self._file_collection.add_fileinfos)
+
         if hasattr(self._stream, 'sig_scandir_finished'):
             self._stream.sig_scandir_finished.connect(self._on_scandir_finished)
 
@@ -97,7 +112,7 @@ class DirectoryThumbnailerTask(QObject):
 
     def _on_scandir_finished(self, fileinfos):
         # print("_on_scandir_finished:")
-        self._file_collection.set_fileinfos(fileinfos)
+        self._file_collection.add_fileinfos(fileinfos)
         if not self._request_thumbnails():
             print("directory seems empty, no thumbnails to generate (might be archive, see file_collection.add_file)")
             self.sig_done.emit()
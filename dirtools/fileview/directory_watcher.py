@@ -15,13 +15,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Optional
+from typing import Dict, List, Optional, Set
 
 import logging
 import traceback
 import os
+import time
+from enum import Enum
 
-from PyQt5.QtCore import Qt, QObject, QSocketNotifier, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QObject, QSocketNotifier, QThread, QTimer, pyqtSignal
 
 from inotify_simple import INotify, flags as inotify_flags
 import inotify_simple
@@ -46,6 +48,18 @@ DEFAULT_FLAGS = (
 )
 
 
+# Time in seconds after which the first chunk of a directory scan is
+# handed to the GUI, following chunks get twice the time of the
+# previous one up to SCANDIR_MAX_CHUNK_TIME, so the GUI shows
+# something quickly without having to relayout for every few entries.
+SCANDIR_FIRST_CHUNK_TIME = 0.05
+SCANDIR_MAX_CHUNK_TIME = 1.0
+
+# Time in milliseconds during which inotify events are collected and
+# merged before they are handed to the GUI.
+COALESCE_INTERVAL = 100
+
+
 class INotifyQt(QObject):
 
     sig_event = pyqtSignal(inotify_simple.Event)
@@ -72,13 +86,75 @@ class INotifyQt(QObject):
         self.inotify.close()
 
 
+class Change(Enum):
+
+    ADDED = 0
+    REMOVED = 1
+    MODIFIED = 2
+    CLOSED = 3
+
+    # removed and added again, e.g. overwritten by a rename
+    REPLACED = 4
+
+
+class ChangeCoalescer:
+    """Merges the changes to a file into a single one, e.g. a file
+    that got created, written to and closed is just ADDED, one that
+    got created and removed again vanishes completely."""
+
+    def __init__(self) -> None:
+        self._changes: Dict[str, Change] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._changes)
+
+    def add(self, name: str, change: Change) -> None:
+        old = self._changes.get(name)
+        new = self._merge(old, change)
+
+        if new is None:
+            del self._changes[name]
+        else:
+            self._changes[name] = new
+
+    def _merge(self, old: Optional[Change], change: Change) -> Optional[Change]:
+        if old is None:
+            return change
+
+        if change == Change.REMOVED:
+            if old == Change.ADDED:
+                return None  # never existed as far as the GUI knows
+            else:
+                return Change.REMOVED
+        elif change in (Change.ADDED, Change.REPLACED):
+            if old == Change.ADDED:
+                return Change.ADDED
+            else:
+                return Change.REPLACED
+        else:  # MODIFIED or CLOSED
+            if old in (Change.ADDED, Change.REPLACED, Change.REMOVED):
+                # the file will be stat'ed when the changes are taken,
+                # so there is nothing extra to report
+                return old
+            else:
+                return change
+
+    def take(self) -> Dict[str, Change]:
+        changes = self._changes
+        self._changes = {}
+        return changes
+
+
 class DirectoryWatcherWorker(QObject):
 
-    sig_file_added = pyqtSignal(FileInfo)
-    sig_file_removed = pyqtSignal(Location)
-    sig_file_modified = pyqtSignal(FileInfo)
-    sig_file_closed = pyqtSignal(FileInfo)
+    # batched changes, coalesced over COALESCE_INTERVAL
+    sig_files_added = pyqtSignal(list)
+    sig_files_removed = pyqtSignal(list)
+    sig_files_modified = pyqtSignal(list)
+    sig_files_closed = pyqtSignal(list)
+
     sig_error = pyqtSignal()
+    sig_scandir_progress = pyqtSignal(list)
     sig_scandir_finished = pyqtSignal(list)
     sig_message = pyqtSignal(str)
 
@@ -90,8 +166,21 @@ class DirectoryWatcherWorker(QObject):
         self.path = self.vfs.get_stdio_name(location)
         self._close = False
 
+        self._changes = ChangeCoalescer()
+        self._flush_timer: Optional[QTimer] = None
+
+        # names the GUI knows about, as of the last flush, to tell a
+        # rename onto an existing file from a new one
+        self._names: Set[str] = set()
+
     def init(self) -> None:
         try:
+            # the timer has to be created in the worker thread
+            self._flush_timer = QTimer(self)
+            self._flush_timer.setSingleShot(True)
+            self._flush_timer.setInterval(COALESCE_INTERVAL)
+            self._flush_timer.timeout.connect(self._flush_changes)
+
             self.inotify = INotifyQt(self)
             self.inotify.add_watch(self.path)
             self.inotify.sig_event.connect(self.on_inotify_event)
@@ -100,20 +189,37 @@ class DirectoryWatcherWorker(QObject):
             self.sig_message.emit(str(err))
 
     def close(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+
         self.inotify.close()
         del self.inotify
 
     def process(self) -> None:
-        fileinfos = []
+        """Scan the directory and emit its content in chunks via
+        sig_scandir_progress, sig_scandir_finished receives the last
+        chunk, not the whole directory."""
+
+        fileinfos: List[FileInfo] = []
+
+        budget = SCANDIR_FIRST_CHUNK_TIME
+        deadline = time.monotonic() + budget
 
         logger.debug("DirectoryWatcher.process: gather directory content")
-        for entry in os.listdir(self.path):
-            location = Location.join(self.location, entry)
-            fileinfo = self.vfs.get_fileinfo(location)
-            fileinfos.append(fileinfo)
+        with os.scandir(self.path) as it:
+            for entry in it:
+                fileinfos.append(FileInfo.from_direntry(self.location, entry))
+                self._names.add(entry.name)
+
+                if self._close:
+                    return
+
+                if time.monotonic() > deadline:
+                    self.sig_scandir_progress.emit(fileinfos)
+                    fileinfos = []
 
-            if self._close:
-                return
+                    budget = min(budget * 2, SCANDIR_MAX_CHUNK_TIME)
+                    deadline = time.monotonic() + budget
 
         self.sig_scandir_finished.emit(fileinfos)
 
@@ -124,24 +230,27 @@ class DirectoryWatcherWorker(QObject):
                          ", ".join([str(x)
                                     for x in inotify_flags.from_mask(ev.mask)]))
 
-            location = Location.join(self.location, ev.name)
-
             if ev.mask & inotify_flags.CREATE:
-                self.sig_file_added.emit(self.vfs.get_fileinfo(location))
+                self._add_change(ev.name, Change.ADDED)
             elif ev.mask & inotify_flags.DELETE:
-                self.sig_file_removed.emit(location)
+                self._add_change(ev.name, Change.REMOVED)
             elif ev.mask & inotify_flags.DELETE_SELF:
                 pass  # directory itself has disappeared
             elif ev.mask & inotify_flags.MOVE_SELF:
                 pass  # directory itself has moved
             elif ev.mask & inotify_flags.MODIFY or ev.mask & inotify_flags.ATTRIB:
-                self.sig_file_modified.emit(self.vfs.get_fileinfo(location))
+                self._add_change(ev.name, Change.MODIFIED)
             elif ev.mask & inotify_flags.MOVED_FROM:
-                self.sig_file_removed.emit(location)
+                self._add_change(ev.name, Change.REMOVED)
             elif ev.mask & inotify_flags.MOVED_TO:
-                self.sig_file_added.emit(self.vfs.get_fileinfo(location))
+                # e.g. an editor saving via a temporary file, the GUI
+                # has to drop the entry it already shows for the name
+                if ev.name in self._names:
+                    self._add_change(ev.name, Change.REPLACED)
+                else:
+                    self._add_change(ev.name, Change.ADDED)
             elif ev.mask & inotify_flags.CLOSE_WRITE:
-                self.sig_file_closed.emit(self.vfs.get_fileinfo(location))
+                self._add_change(ev.name, Change.CLOSED)
             else:
                 # unhandled event
                 print("ERROR: Unhandled flags:")
@@ -151,6 +260,51 @@ class DirectoryWatcherWorker(QObject):
             print(traceback.format_exc())
             print("DirectoryWatcher:", err)
 
+    def _add_change(self, name: str, change: Change) -> None:
+        self._changes.add(name, change)
+
+        # not restarted on every event, so a constantly changing
+        # directory still gets updated every COALESCE_INTERVAL
+        assert self._flush_timer is not None
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush_changes(self) -> None:
+        removed: List[Location] = []
+        added: List[FileInfo] = []
+        modified: List[FileInfo] = []
+        closed: List[FileInfo] = []
+
+        for name, change in self._changes.take().items():
+            location = self.location.child(name)
+
+            if change == Change.REMOVED:
+                removed.append(location)
+                self._names.discard(name)
+            elif change == Change.REPLACED:
+                removed.append(location)
+                added.append(self.vfs.get_fileinfo(location))
+                self._names.add(name)
+            elif change == Change.ADDED:
+                added.append(self.vfs.get_fileinfo(location))
+                self._names.add(name)
+            elif change == Change.MODIFIED:
+                modified.append(self.vfs.get_fileinfo(location))
+            elif change == Change.CLOSED:
+                closed.append(self.vfs.get_fileinfo(location))
+
+        logger.debug("DirectoryWatcher._flush_changes: %d removed, %d added, %d modified, %d closed",
+                     len(removed), len(added), len(modified), len(closed))
+
+        if removed:
+            self.sig_files_removed.emit(removed)
+        if added:
+            self.sig_files_added.emit(added)
+        if modified:
+            self.sig_files_modified.emit(modified)
+        if closed:
+            self.sig_files_closed.emit(closed)
+
 
 class DirectoryWatcher(QObject):
 
@@ -180,20 +334,24 @@ class DirectoryWatcher(QObject):
         self._thread.wait()
 
     @property
-    def sig_file_added(self):
-        return self._worker.sig_file_added
+    def sig_files_added(self):
+        return self._worker.sig_files_added
+
+    @property
+    def sig_files_removed(self):
+        return self._worker.sig_files_removed
 
     @property
-    def sig_file_removed(self):
-        return self._worker.sig_file_removed
+    def sig_files_modified(self):
+        return self._worker.sig_files_modified
 
     @property
-    def sig_file_modified(self):
-        return self._worker.sig_file_modified
+    def sig_files_closed(self):
+        return self._worker.sig_files_closed
 
     @property
-    def sig_file_closed(self):
-        return self._worker.sig_file_closed
+    def sig_scandir_progress(self):
+        return self._worker.sig_scandir_progress
 
     @property
     def sig_scandir_finished(self):
@@ -15,11 +15,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Iterable, Optional, Iterator, Dict, List, cast
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Iterator, Dict, List, Set, Tuple, cast
 
+import copy
+import functools
 import logging
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from sortedcollections import SortedList
 
 from PyQt5.QtCore import QObject, pyqtSignal
@@ -27,29 +29,79 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from dirtools.fileview.location import Location
 from dirtools.fileview.file_info import FileInfo
 from dirtools.fileview.filter import Filter
-from dirtools.fileview.grouper import Grouper, NoGrouper
+from dirtools.fileview.filter_worker import FilterThread
+from dirtools.fileview.grouper import Grouper, NoGrouper, compare_groups
+from dirtools.fileview.match_func import MatchFunc, match_func_implies
 from dirtools.fileview.sorter import Sorter
 
 logger = logging.getLogger(__name__)
 
 
+# Number of filter results kept around, so that going back to a
+# previous filter doesn't need to evaluate it again.
+FILTER_RESULT_CACHE_SIZE = 8
+
+# Snapshots without filter results and with at most this many files
+# are filtered right away on restore(), instead of in the background.
+RESTORE_FILTER_MAX_FILES = 10000
+
+# (match_func, show_hidden) of a Filter
+FilterState = Tuple[Optional[MatchFunc], bool]
+
+
+class FileCollectionSnapshot(NamedTuple):
+    """The content of a FileCollection, see FileCollection.snapshot()."""
+
+    # in sort order, with .is_excluded/.is_hidden and the sort key
+    # set, when taken from a FileCollection
+    fileinfos: List[FileInfo]
+
+    # the filter that .is_excluded/.is_hidden came from, None when
+    # they are incomplete
+    filter_key: Optional[Tuple[str, bool]]
+
+
+class FileCollectionChanges:
+    """Context manager that groups all additions and removals done
+    inside of it into one sig_files_removed and one sig_files_added."""
+
+    def __init__(self, collection: 'FileCollection') -> None:
+        self._collection = collection
+
+    def __enter__(self) -> 'FileCollection':
+        self._collection.begin_changes()
+        return self._collection
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._collection.end_changes()
+
+
 class FileCollection(QObject):
 
     # A new file entry has been added
     sig_file_added = pyqtSignal(int, FileInfo)
 
-    # An existing file entry has been removed
-    sig_file_removed = pyqtSignal(Location)
+    # A batch of new file entries has been added, the bool is True
+    # when the files newly appeared on disk and False when they were
+    # just loaded
+    sig_files_added = pyqtSignal(list, bool)
+
+    # A batch of existing file entries has been removed
+    sig_files_removed = pyqtSignal(list)
 
     # A file changed on disk
     sig_file_modified = pyqtSignal(FileInfo)
 
+    # A batch of files changed on disk
+    sig_files_modified = pyqtSignal(list)
+
     # New information about a file has becomes available (thumbnail,
     # metadata, etc.)
     sig_fileinfo_updated = pyqtSignal(FileInfo)
 
     # File handle was closed and the file is in it's final state.
     sig_file_closed = pyqtSignal(FileInfo)
+    sig_files_closed = pyqtSignal(list)
 
     # The file list has changed completely and needs a reload from scratch
     sig_files_set = pyqtSignal()
@@ -58,12 +110,19 @@ class FileCollection(QObject):
     sig_files_reordered = pyqtSignal()
 
     # The file list has been filtered, .is_excluded has been
-    # set/unset, but otherwise stayed the same
+    # set/unset, but otherwise stayed the same. The filter is applied
+    # in the background, this is emitted for each batch of files.
     sig_files_filtered = pyqtSignal()
 
     # The file list has been grouped, .group has been set
     sig_files_grouped = pyqtSignal()
 
+    # Files moved to another group as new metadata became available
+    sig_files_regrouped = pyqtSignal(list)
+
+    # The set of selected files has changed
+    sig_selection_changed = pyqtSignal()
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -72,50 +131,224 @@ class FileCollection(QObject):
         self._sorter: Sorter = Sorter()
 
         self._location2fileinfo: Dict[Location, List[FileInfo]] = defaultdict(list)
-        self._fileinfos: SortedList[FileInfo] = SortedList(key=self._sorter.get_key_func())
+        self._sort_key_token = self._sorter.get_key_token()
+        self._sort_key_func: Callable[[FileInfo], Any] = self._sorter.get_key_func()
+        self._fileinfos: SortedList[FileInfo] = SortedList(key=self._sort_key_func)
+
+        # FileInfo.group -> members of the group in sort order, kept
+        # up to date with each change, so that a change only touches
+        # the groups it affects
+        self._groups: Dict[Any, SortedList[FileInfo]] = {}
+
+        # Selection and cursor are kept here instead of in the
+        # FileItems, as the FileView only creates items for the files
+        # that are currently visible
+        self._selection: Set[Location] = set()
+        self._cursor: Optional[Location] = None
+
+        # changes collected between begin_changes() and end_changes(),
+        # dicts are used as ordered sets
+        self._changes_depth = 0
+        self._pending_removed: Dict[Location, None] = {}
+        self._pending_added: Dict[Location, None] = {}
+        self._pending_new = False
+
+        # created on the first set_filter()
+        self._filter_thread: Optional[FilterThread] = None
+        self._filter_generation = 0
+
+        # The filters that the current .is_excluded/.is_hidden values
+        # came from, more than one while a filter is still running,
+        # None when unknown. A new filter that implies all of them only
+        # has to look at the files that are currently not excluded.
+        self._filter_sources: Optional[List[FilterState]] = [self._filter_state(self._filter)]
+        self._running_filter: Optional[Tuple[FilterState, Optional[Tuple[str, bool]]]] = None
+
+        # filter key -> is_excluded | is_hidden << 1 for each file in
+        # the order of self._fileinfos, cleared whenever the files change
+        self._filter_results: OrderedDict[Tuple[str, bool], bytearray] = OrderedDict()
+
+    def close(self) -> None:
+        if self._filter_thread is not None:
+            self._filter_thread.close()
+            self._filter_thread = None
+
+    def changes(self) -> FileCollectionChanges:
+        return FileCollectionChanges(self)
+
+    def begin_changes(self) -> None:
+        self._changes_depth += 1
+
+    def end_changes(self) -> None:
+        assert self._changes_depth > 0
+        self._changes_depth -= 1
+        if self._changes_depth == 0:
+            self._flush_changes()
+
+    def _flush_changes(self) -> None:
+        removed = list(self._pending_removed)
+
+        # files that were added and removed again within the same
+        # batch are gone from _location2fileinfo and thus skipped
+        added = [fi
+                 for location in self._pending_added
+                 for fi in self._location2fileinfo.get(location, [])]
+        new = self._pending_new
+
+        self._discard_changes()
+
+        if removed:
+            self.sig_files_removed.emit(removed)
+            self._forget_selection(removed)
+
+        if added:
+            self.sig_files_added.emit(added, new)
+
+    def _discard_changes(self) -> None:
+        self._pending_removed.clear()
+        self._pending_added.clear()
+        self._pending_new = False
 
     def clear(self) -> None:
         logger.debug("FileCollection.clear")
 
+        self._discard_changes()
+        self._cancel_filter()
+        self._filter_results.clear()
+        # files are filtered as they are added
+        self._filter_sources = [self._filter_state(self._filter)]
         self._location2fileinfo.clear()
 
         self._fileinfos.clear()
+        self._groups.clear()
+
+        self._selection.clear()
+        self._cursor = None
 
         self.sig_files_set.emit()
 
     def set_fileinfos(self, fileinfos: Iterable[FileInfo]) -> None:
         logger.debug("FileCollection.set_fileinfos")
 
+        self._discard_changes()
+        self._cancel_filter()
+        self._filter_results.clear()
+        self._filter_sources = None
+        self._selection.clear()
+        self._cursor = None
+
+        fileinfos = list(fileinfos)
+        self._location2fileinfo.clear()
         for fi in fileinfos:
             self._location2fileinfo[fi.location()].append(fi)
+            self._grouper(fi)
 
-        self._fileinfos.clear()
-        self._fileinfos.update(fileinfos)
+        self._fileinfos = self._make_sorted_list(fileinfos)
+        self._rebuild_groups()
 
         self.sig_files_set.emit()
 
+    def snapshot(self) -> FileCollectionSnapshot:
+        state = self._filter_state(self._filter)
+        if self._running_filter is None and self._filter_sources == [state]:
+            filter_key = self._filter_key(self._filter)
+        else:
+            filter_key = None
+
+        return FileCollectionSnapshot(list(self._fileinfos), filter_key)
+
+    def restore(self, snapshot: FileCollectionSnapshot) -> None:
+        """Like set_fileinfos(), but the files only get filtered again
+        when the filter changed since the snapshot was taken. Sorting
+        is cheap when the Sorter is still the same, as the files are
+        already in order and their sort keys are cached."""
+
+        logger.debug("FileCollection.restore: %d", len(snapshot.fileinfos))
+
+        if snapshot.filter_key is not None and snapshot.filter_key == self._filter_key(self._filter):
+            self.set_fileinfos(snapshot.fileinfos)
+            self._filter_sources = [self._filter_state(self._filter)]
+        elif snapshot.filter_key is None and len(snapshot.fileinfos) <= RESTORE_FILTER_MAX_FILES:
+            # never filtered, e.g. prefetched, filter before anything
+            # gets shown so that hidden files don't flash up
+            for fi in snapshot.fileinfos:
+                self._filter.apply(fi)
+            self.set_fileinfos(snapshot.fileinfos)
+            self._filter_sources = [self._filter_state(self._filter)]
+        else:
+            self.set_fileinfos(snapshot.fileinfos)
+            self.set_filter(self._filter)
+
     def add_fileinfo(self, fi: FileInfo) -> None:
         logger.debug("FileCollection.add_fileinfos: %s", fi)
 
         self._location2fileinfo[fi.location()].append(fi)
+        self._filter.apply(fi)
+        self._grouper(fi)
 
         self._fileinfos.add(fi)
+        self._add_to_group(fi)
+        self._filter_results.clear()
 
-        idx = self._fileinfos.index(fi)
-        self.sig_file_added.emit(idx, fi)
-
-    def remove_file(self, location: Location) -> None:
-        if location not in self._location2fileinfo:
-            logger.error("FileCollection.remove_file: %s: KeyError", location)
+        if self._changes_depth > 0:
+            self._pending_added[fi.location()] = None
         else:
-            logger.debug("FileCollection.remove_file: %s", location)
-            fis = self._location2fileinfo[location]
+            idx = self._fileinfos.index(fi)
+            self.sig_file_added.emit(idx, fi)
 
-            del self._location2fileinfo[location]
-            for fi in fis:
-                self._fileinfos.remove(fi)
+    def add_fileinfos(self, fileinfos: List[FileInfo], new: bool = False) -> None:
+        """Add a batch of files, used for appending the chunks of an
+        incremental directory scan and for files that showed up in a
+        watched directory, the later set 'new'."""
+
+        logger.debug("FileCollection.add_fileinfos: %d", len(fileinfos))
+
+        if not fileinfos:
+            return
+
+        for fi in fileinfos:
+            self._location2fileinfo[fi.location()].append(fi)
+            self._filter.apply(fi)
+            self._grouper(fi)
+
+        self._fileinfos.update(fileinfos)
+        self._add_to_groups(fileinfos)
+        self._filter_results.clear()
+
+        if self._changes_depth > 0:
+            for fi in fileinfos:
+                self._pending_added[fi.location()] = None
+            self._pending_new = self._pending_new or new
+        else:
+            self.sig_files_added.emit(fileinfos, new)
 
-            self.sig_file_removed.emit(location)
+    def remove_file(self, location: Location) -> None:
+        self.remove_files([location])
+
+    def remove_files(self, locations: List[Location]) -> None:
+        logger.debug("FileCollection.remove_files: %d", len(locations))
+
+        with self.changes():
+            for location in locations:
+                fis = self._location2fileinfo.pop(location, None)
+                if fis is None:
+                    logger.error("FileCollection.remove_files: %s: KeyError", location)
+                else:
+                    for fi in fis:
+                        self._fileinfos.remove(fi)
+                        self._remove_from_group(fi, fi.group)
+                    self._filter_results.clear()
+                    self._pending_removed[location] = None
+
+    def modify_files(self, fileinfos: List[FileInfo]) -> None:
+        modified = self._replace_fileinfos(fileinfos, "modify_files")
+        if modified:
+            self.sig_files_modified.emit(modified)
+
+    def close_files(self, fileinfos: List[FileInfo]) -> None:
+        closed = self._replace_fileinfos(fileinfos, "close_files")
+        if closed:
+            self.sig_files_closed.emit(closed)
 
     def modify_file(self, fileinfo: FileInfo) -> None:
         try:
@@ -124,16 +357,23 @@ class FileCollection(QObject):
             logger.error("FileCollection.modify_file: %s: KeyError", fileinfo)
         else:
             logger.debug("FileCollection.modify_file: %s", fileinfo)
-            self.sig_file_modified.emit(fileinfo)
+            if fileinfo.location() not in self._pending_added:
+                self.sig_file_modified.emit(fileinfo)
 
     def update_fileinfo(self, fileinfo: FileInfo) -> None:
+        # the metadata changed in place, so previous filter results
+        # might no longer hold
+        self._filter_results.clear()
+        self._filter_sources = None
+
         try:
             self._replace_fileinfo(fileinfo)
         except KeyError:
             logger.error("FileCollection.update_fileinfo: %s", fileinfo)
         else:
             logger.debug("FileCollection.update_fileinfo: %s: KeyError", fileinfo)
-            self.sig_fileinfo_updated.emit(fileinfo)
+            if fileinfo.location() not in self._pending_added:
+                self.sig_fileinfo_updated.emit(fileinfo)
 
     def close_file(self, fileinfo: FileInfo) -> None:
         try:
@@ -142,7 +382,8 @@ class FileCollection(QObject):
             logger.error("FileCollection.close_file: %s", fileinfo)
         else:
             logger.debug("FileCollection.close_file: %s: KeyError", fileinfo)
-            self.sig_file_closed.emit(fileinfo)
+            if fileinfo.location() not in self._pending_added:
+                self.sig_file_closed.emit(fileinfo)
 
     def get_fileinfos(self) -> Iterator[FileInfo]:
         if self._sorter.reverse:
@@ -150,6 +391,22 @@ class FileCollection(QObject):
         else:
             return cast(Iterator[FileInfo], iter(self._fileinfos))
 
+    def get_groups(self) -> List[Tuple[Any, Iterator[FileInfo]]]:
+        """Returns the groups in display order, each together with its
+        files in sort order."""
+
+        groups = sorted(self._groups, key=functools.cmp_to_key(compare_groups))
+        return [(group, self.get_group_fileinfos(group)) for group in groups]
+
+    def get_group_fileinfos(self, group: Any) -> Iterator[FileInfo]:
+        members = self._groups.get(group)
+        if members is None:
+            return iter(())
+        elif self._sorter.reverse:
+            return cast(Iterator[FileInfo], reversed(members))
+        else:
+            return cast(Iterator[FileInfo], iter(members))
+
     def get_fileinfo(self, location: Location) -> Optional[FileInfo]:
         if location not in self._location2fileinfo:
             return None
@@ -166,28 +423,246 @@ class FileCollection(QObject):
     def __len__(self) -> int:
         return len(self._fileinfos)
 
+    def is_selected(self, fileinfo: FileInfo) -> bool:
+        return fileinfo.location() in self._selection
+
+    def set_selected(self, fileinfo: FileInfo, selected: bool) -> None:
+        if selected:
+            self.update_selection([fileinfo], [])
+        else:
+            self.update_selection([], [fileinfo])
+
+    def update_selection(self, selected: Iterable[FileInfo], deselected: Iterable[FileInfo]) -> None:
+        changed = False
+        for fi in selected:
+            location = fi.location()
+            if location not in self._selection:
+                self._selection.add(location)
+                changed = True
+        for fi in deselected:
+            location = fi.location()
+            if location in self._selection:
+                self._selection.remove(location)
+                changed = True
+
+        if changed:
+            self.sig_selection_changed.emit()
+
+    def set_selection(self, fileinfos: Iterable[FileInfo]) -> None:
+        selection = {fi.location() for fi in fileinfos}
+        if selection != self._selection:
+            self._selection = selection
+            self.sig_selection_changed.emit()
+
+    def select_all(self) -> None:
+        self.set_selection(fi for fi in self._fileinfos if fi.is_visible)
+
+    def clear_selection(self) -> None:
+        self.set_selection([])
+
+    def selected_fileinfos(self) -> List[FileInfo]:
+        return [fi
+                for location in self._selection
+                for fi in self._location2fileinfo.get(location, [])]
+
+    def _forget_selection(self, locations: List[Location]) -> None:
+        if self._cursor in locations:
+            self._cursor = None
+
+        if self._selection:
+            old_len = len(self._selection)
+            self._selection.difference_update(locations)
+            if len(self._selection) != old_len:
+                self.sig_selection_changed.emit()
+
+    def set_cursor(self, location: Optional[Location]) -> None:
+        self._cursor = location
+
+    def cursor(self) -> Optional[Location]:
+        return self._cursor
+
     def set_grouper(self, grouper: Grouper) -> None:
         self._grouper = grouper
 
         for fi in self._fileinfos:
             self._grouper(fi)
+        self._rebuild_groups()
 
         self.sig_files_grouped.emit()
 
-    def set_filter(self, filter: Filter) -> None:
+    def _rebuild_groups(self) -> None:
+        members: Dict[Any, List[FileInfo]] = defaultdict(list)
+        for fi in self._fileinfos:
+            members[fi.group].append(fi)
+
+        # the members are already in order, which keeps this cheap
+        self._groups = {group: SortedList(fis, key=self._sort_key_func)
+                        for group, fis in members.items()}
+
+    def _group_members(self, group: Any) -> 'SortedList[FileInfo]':
+        members = self._groups.get(group)
+        if members is None:
+            members = SortedList(key=self._sort_key_func)
+            self._groups[group] = members
+        return members
+
+    def _add_to_group(self, fileinfo: FileInfo) -> None:
+        self._group_members(fileinfo.group).add(fileinfo)
+
+    def _add_to_groups(self, fileinfos: List[FileInfo]) -> None:
+        members: Dict[Any, List[FileInfo]] = defaultdict(list)
+        for fi in fileinfos:
+            members[fi.group].append(fi)
+
+        for group, fis in members.items():
+            self._group_members(group).update(fis)
+
+    def _remove_from_group(self, fileinfo: FileInfo, group: Any) -> None:
+        members = self._groups.get(group)
+        if members is not None:
+            members.discard(fileinfo)
+            if not members:
+                del self._groups[group]
+
+    def _regroup(self, fileinfo: FileInfo) -> bool:
+        """Run the grouper again on a file that is already part of the
+        collection, returns True when the file changed its group."""
+
+        old_group = fileinfo.group
+        self._grouper(fileinfo)
+        if fileinfo.group == old_group:
+            return False
+        else:
+            self._remove_from_group(fileinfo, old_group)
+            self._add_to_group(fileinfo)
+            return True
+
+    def set_filter(self, filter: Filter, priority: Optional[List[FileInfo]] = None) -> None:
+        """Applies 'filter' in the background. Files added from now on
+        are filtered right away, the existing ones follow in batches,
+        starting with those in 'priority', e.g. the visible ones."""
+
         self._filter = filter
+        self._cancel_filter()
+
+        state = self._filter_state(filter)
+        key = self._filter_key(filter)
+
+        results = self._filter_results.get(key) if key is not None else None
+        if key is not None and results is not None:
+            logger.debug("FileCollection.set_filter: cached: %s", key)
+            self._filter_results.move_to_end(key)
+            for fileinfo, bits in zip(self._fileinfos, results):
+                fileinfo.is_excluded = bool(bits & 1)
+                fileinfo.is_hidden = bool(bits & 2)
+            self._filter_sources = [state]
+            self.sig_files_filtered.emit()
+            return
 
-        for fi in self._fileinfos:
-            self._filter.apply(fi)
+        if self._is_filter_refinement(state):
+            # files excluded by now stay excluded
+            logger.debug("FileCollection.set_filter: refinement")
+            candidates = [fi for fi in self._fileinfos if not fi.is_excluded]
+            if priority:
+                priority = [fi for fi in priority if not fi.is_excluded]
+        else:
+            candidates = list(self._fileinfos)
+            # files that the worker hasn't reached yet keep their old values
+            self._filter_sources = None
+
+        if self._filter_sources is not None:
+            self._filter_sources.append(state)
+
+        if priority:
+            prioritized = set(priority)
+            fileinfos = list(priority) + [fi for fi in candidates if fi not in prioritized]
+        else:
+            fileinfos = candidates
+
+        if self._filter_thread is None:
+            self._filter_thread = FilterThread()
+            self._filter_thread.sig_batch_ready.connect(self._on_filter_batch_ready)
+            self._filter_thread.sig_finished.connect(self._on_filter_finished)
+            self._filter_thread.start()
+
+        # the worker gets a copy, as the Controller modifies its Filter in place
+        self._running_filter = (state, key)
+        self._filter_generation = self._filter_thread.request_filter(
+            copy.copy(filter), fileinfos, len(priority) if priority else 0)
+
+    def _filter_state(self, filter: Filter) -> FilterState:
+        return (filter.match_func, filter.show_hidden)
+
+    def _filter_key(self, filter: Filter) -> Optional[Tuple[str, bool]]:
+        if filter.match_func is None:
+            return ("", filter.show_hidden)
+        elif filter.pattern is not None:
+            return (filter.pattern, filter.show_hidden)
+        else:
+            return None
+
+    def _is_filter_refinement(self, state: FilterState) -> bool:
+        if self._filter_sources is None:
+            return False
+
+        match_func, show_hidden = state
+        return all(show_hidden == source_show_hidden and match_func_implies(match_func, source_match_func)
+                   for source_match_func, source_show_hidden in self._filter_sources)
+
+    def _cancel_filter(self) -> None:
+        if self._filter_thread is not None:
+            self._filter_thread.cancel()
+        self._running_filter = None
+
+    def _on_filter_batch_ready(self, generation: int, results: List) -> None:
+        if generation != self._filter_generation:
+            return  # a newer filter has been set in the meantime
+
+        for fileinfo, is_excluded, is_hidden in results:
+            fileinfo.is_excluded = is_excluded
+            fileinfo.is_hidden = is_hidden
 
         self.sig_files_filtered.emit()
 
+    def _on_filter_finished(self, generation: int) -> None:
+        if generation != self._filter_generation or self._running_filter is None:
+            return
+
+        state, key = self._running_filter
+        self._running_filter = None
+        self._filter_sources = [state]
+
+        if key is not None:
+            self._filter_results[key] = bytearray(fi.is_excluded | fi.is_hidden << 1 for fi in self._fileinfos)
+            while len(self._filter_results) > FILTER_RESULT_CACHE_SIZE:
+                self._filter_results.popitem(last=False)
+
+    def get_sorter(self) -> Sorter:
+        return self._sorter
+
     def set_sorter(self, sorter: Sorter) -> None:
-        print("rebuilding fileinfos")
-        self._sorter = sorter
-        self._fileinfos = SortedList(self._fileinfos, key=self._sorter.get_key_func())
+        if sorter.get_key_token() is self._sort_key_token:
+            # only the direction changed, which get_fileinfos() handles
+            logger.debug("FileCollection.set_sorter: reverse")
+            self._sorter = sorter
+        else:
+            logger.debug("FileCollection.set_sorter: sort")
+            self._sorter = sorter
+            self._fileinfos = self._make_sorted_list(self._fileinfos)
+            self._rebuild_groups()
+            self._filter_results.clear()
+
         self.sig_files_reordered.emit()
 
+    def _make_sorted_list(self, fileinfos: Iterable[FileInfo]) -> 'SortedList[FileInfo]':
+        """Sorts 'fileinfos' in one go, SortedList then only needs to
+        look up the keys cached in the FileInfos."""
+
+        key_func = self._sorter.get_key_func()
+        self._sort_key_token = self._sorter.get_key_token()
+        self._sort_key_func = key_func
+        return SortedList(sorted(fileinfos, key=key_func), key=key_func)
+
     # def sort(self, key, reverse: bool=False) -> None:
     #     logger.debug("FileCollection.sort")
     #     self._fileinfos.sort(key=key)
@@ -196,8 +671,28 @@ class FileCollection(QObject):
     #     logger.debug("FileCollection.sort:done")
     #     self.sig_files_reordered.emit()
 
+    def _replace_fileinfos(self, fileinfos: List[FileInfo], caller: str) -> List[FileInfo]:
+        logger.debug("FileCollection.%s: %d", caller, len(fileinfos))
+
+        replaced: List[FileInfo] = []
+        for fileinfo in fileinfos:
+            self._filter.apply(fileinfo)
+            try:
+                self._replace_fileinfo(fileinfo)
+            except KeyError:
+                logger.error("FileCollection.%s: %s: KeyError", caller, fileinfo)
+            else:
+                # files added in the current batch are reported with
+                # their latest FileInfo when the batch ends
+                if fileinfo.location() not in self._pending_added:
+                    replaced.append(fileinfo)
+        return replaced
+
     def _replace_fileinfo(self, fileinfo: FileInfo) -> None:
         if fileinfo in self._fileinfos:
+            # new metadata might move the file into another group
+            if self._regroup(fileinfo) and fileinfo.location() not in self._pending_added:
+                self.sig_files_regrouped.emit([fileinfo])
             return
 
         location = fileinfo.location()
@@ -211,8 +706,12 @@ class FileCollection(QObject):
 
             for fi in fis:
                 self._fileinfos.remove(fi)
+                self._remove_from_group(fi, fi.group)
 
+            self._grouper(fileinfo)
             self._fileinfos.add(fileinfo)
+            self._add_to_group(fileinfo)
+            self._filter_results.clear()
 
     # def shuffle(self) -> None:
     #     logger.debug("FileCollection.sort")
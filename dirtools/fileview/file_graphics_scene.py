@@ -29,8 +29,8 @@ class FileGraphicsScene(QGraphicsScene):
     # action, urls, destination
     sig_files_drop = pyqtSignal(int, list, object)
 
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
 
         self._drag_drop_item: Optional[FileItem] = None
 
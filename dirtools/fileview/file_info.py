@@ -15,12 +15,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Dict, Any, Optional
+from typing import Any, Dict, Mapping, NamedTuple, Optional
 import logging
 
 import os
 import stat
 import errno
+import types
 from enum import Enum
 
 from dirtools.fileview.location import Location
@@ -29,6 +30,11 @@ from dirtools.fileview.match_func_factory import VIDEO_EXT, IMAGE_EXT, ARCHIVE_E
 logger = logging.getLogger(__name__)
 
 
+# Returned by FileInfo.metadata() as long as there is no metadata,
+# so that not every FileInfo needs its own empty dict
+EMPTY_METADATA: Mapping[str, Any] = types.MappingProxyType({})
+
+
 class FileInfoError(Enum):
 
     NO_ERROR = 0
@@ -38,59 +44,112 @@ class FileInfoError(Enum):
     UNKNOWN = 4
 
 
+class FileStat(NamedTuple):
+    """The subset of os.stat_result that FileInfo keeps around."""
+
+    st_mode: int
+    st_uid: int
+    st_gid: int
+    st_size: int
+    st_atime: float
+    st_mtime: float
+    st_ctime: float
+
+
 class FileInfo:
 
+    # FileInfo is created for every file that is displayed, which can
+    # be millions for large search results or file lists, so it only
+    # stores the path and the stat fields that are actually used,
+    # everything else is derived on demand
+    __slots__ = ["_abspath", "_location", "_isdir", "_error", "_have_access",
+                 "_mode", "_uid", "_gid", "_size", "_atime", "_mtime", "_ctime",
+                 "_metadata",
+                 "is_excluded", "is_hidden", "group",
+                 "_sort_key", "_sort_key_token"]
+
     @staticmethod
     def from_path(path: str) -> 'FileInfo':
         logger.debug("FileInfo.from_path: %s", path)
 
         fi = FileInfo()
 
-        fi._abspath = os.path.abspath(path)
-        fi._location = Location.from_path(fi._abspath)
-        fi._dirname = os.path.dirname(fi._abspath)
-        fi._basename = os.path.basename(fi._abspath)
-        fi._ext = os.path.splitext(fi._abspath)[1]
+        fi._location = Location.from_path(path)
+        fi._abspath = fi._location.get_path()
 
         try:
-            fi._stat = os.lstat(fi._abspath)
-            fi._have_access = os.access(fi._abspath, os.R_OK)
-            fi._error = FileInfoError.NO_ERROR
-        except (FileNotFoundError, NotADirectoryError):
-            fi._error = FileInfoError.FILENOTFOUND
-        except PermissionError:
-            fi._error = FileInfoError.PERMISSIONDENIED
-        except OSError as err:
-            if err.errno == errno.EIO:
-                fi._error = FileInfoError.IO
-            else:
-                fi._error = FileInfoError.UNKNOWN
+            st = os.lstat(fi._abspath)
         except Exception as err:
-            fi._error = FileInfoError.UNKNOWN
+            fi._error = FileInfo._error_from_exception(err)
         else:
-            fi._isdir = os.path.isdir(fi._abspath)
-            fi._isfile = stat.S_ISREG(fi._stat.st_mode)
-            fi._issymlink = stat.S_ISLNK(fi._stat.st_mode)
+            fi._set_stat(st)
+            # only symlinks need another stat() to find out where they point to
+            fi._isdir = stat.S_ISDIR(st.st_mode) or (stat.S_ISLNK(st.st_mode) and os.path.isdir(fi._abspath))
 
         return fi
 
+    @staticmethod
+    def from_direntry(location_parent: Location, entry: os.DirEntry) -> 'FileInfo':
+        """Fast path for directory scans, reuses the file type that
+        os.scandir() already provides and builds the Location without
+        parsing an URL. 'location_parent' is the Location of the
+        directory that was passed to os.scandir()."""
+
+        fi = FileInfo()
+
+        fi._location = location_parent.child(entry.name)
+        if fi._location.has_stdio_name():
+            # share the string with the Location
+            fi._abspath = fi._location.get_stdio_name()
+        else:
+            fi._abspath = entry.path
+
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except Exception as err:
+            fi._error = FileInfo._error_from_exception(err)
+        else:
+            fi._set_stat(st)
+            try:
+                fi._isdir = entry.is_dir()
+            except OSError:
+                fi._isdir = False
+
+        return fi
+
+    @staticmethod
+    def _error_from_exception(err: Exception) -> FileInfoError:
+        if isinstance(err, (FileNotFoundError, NotADirectoryError)):
+            return FileInfoError.FILENOTFOUND
+        elif isinstance(err, PermissionError):
+            return FileInfoError.PERMISSIONDENIED
+        elif isinstance(err, OSError) and err.errno == errno.EIO:
+            return FileInfoError.IO
+        else:
+            return FileInfoError.UNKNOWN
+
     def __init__(self) -> None:
         self._abspath: str = ""
         self._location: Optional[Location] = None
-        self._dirname: str = ""
-        self._basename: str = ""
-        self._ext: str = ""
 
         self._isdir: bool = False
-        self._isfile: bool = False
-        self._issymlink: bool = False
 
-        self._stat: Optional[os.stat_result] = None
-        self._have_access: bool = False
+        # stat fields, only valid when _error is NO_ERROR
+        self._mode: int = 0
+        self._uid: int = 0
+        self._gid: int = 0
+        self._size: int = 0
+        self._atime: float = 0
+        self._mtime: float = 0
+        self._ctime: float = 0
+
+        # access() is only called when somebody asks for it
+        self._have_access: Optional[bool] = None
 
         self._error: FileInfoError = FileInfoError.NO_ERROR
 
-        self._metadata: Dict[str, Any] = {}
+        # only allocated when metadata arrives
+        self._metadata: Optional[Dict[str, Any]] = None
 
         # filter variables
         self.is_excluded: bool = False
@@ -99,6 +158,21 @@ class FileInfo:
         # grouper variables
         self.group: Any = None
 
+        # sorter variables, the key is only valid for the Sorter key
+        # function identified by the token, see Sorter.get_key_func()
+        self._sort_key: Any = None
+        self._sort_key_token: Optional[object] = None
+
+    def _set_stat(self, st: os.stat_result) -> None:
+        self._error = FileInfoError.NO_ERROR
+        self._mode = st.st_mode
+        self._uid = st.st_uid
+        self._gid = st.st_gid
+        self._size = st.st_size
+        self._atime = st.st_atime
+        self._mtime = st.st_mtime
+        self._ctime = st.st_ctime
+
     @property
     def is_visible(self) -> bool:
         return not self.is_hidden and not self.is_excluded
@@ -107,6 +181,12 @@ class FileInfo:
         return self._error
 
     def have_access(self) -> bool:
+        if self._have_access is None:
+            if self._error != FileInfoError.NO_ERROR:
+                self._have_access = False
+            else:
+                self._have_access = os.access(self._abspath, os.R_OK)
+
         return self._have_access
 
     def abspath(self) -> str:
@@ -117,52 +197,68 @@ class FileInfo:
         return self._location
 
     def dirname(self) -> str:
-        return self._dirname
+        return os.path.dirname(self._abspath)
 
     def basename(self) -> str:
-        return self._basename
+        return os.path.basename(self._abspath)
 
     def isdir(self) -> bool:
         return self._isdir
 
     def isfile(self) -> bool:
-        return self._isfile
+        return stat.S_ISREG(self._mode)
+
+    def issymlink(self) -> bool:
+        return stat.S_ISLNK(self._mode)
 
     def is_video(self) -> bool:
-        return self._ext[1:].lower() in VIDEO_EXT
+        return self.ext()[1:].lower() in VIDEO_EXT
 
     def is_image(self) -> bool:
-        return self._ext[1:].lower() in IMAGE_EXT
+        return self.ext()[1:].lower() in IMAGE_EXT
 
     def is_archive(self) -> bool:
-        return self._ext[1:].lower() in ARCHIVE_EXT
+        return self.ext()[1:].lower() in ARCHIVE_EXT
 
-    def stat(self) -> os.stat_result:
-        return self._stat
+    def stat(self) -> Optional[FileStat]:
+        if self._error != FileInfoError.NO_ERROR:
+            return None
+        else:
+            return FileStat(self._mode, self._uid, self._gid, self._size,
+                            self._atime, self._mtime, self._ctime)
 
     def uid(self) -> int:
-        return self._stat.st_uid if self._stat else 0
+        return self._uid
 
     def gid(self) -> int:
-        return self._stat.st_gid if self._stat else 0
+        return self._gid
 
     def ext(self) -> str:
-        return self._ext
+        return os.path.splitext(self._abspath)[1]
 
     def size(self) -> int:
-        return self._stat.st_size if self._stat is not None else 0
+        return self._size
 
     def atime(self) -> float:
-        return self._stat.st_atime if self._stat is not None else 0
+        return self._atime
 
     def ctime(self) -> float:
-        return self._stat.st_ctime if self._stat is not None else 0
+        return self._ctime
 
     def mtime(self) -> float:
-        return self._stat.st_mtime if self._stat is not None else 0
+        return self._mtime
 
-    def metadata(self) -> Dict[str, Any]:
-        return self._metadata
+    def metadata(self) -> Mapping[str, Any]:
+        if self._metadata is None:
+            return EMPTY_METADATA
+        else:
+            return self._metadata
+
+    def update_metadata(self, metadata: Mapping[str, Any]) -> None:
+        if self._metadata is None:
+            self._metadata = dict(metadata)
+        else:
+            self._metadata.update(metadata)
 
     def __str__(self) -> str:
         return "FileInfo({})".format(self._location)
@@ -69,6 +69,29 @@ class FileItem(QGraphicsObject):
         self._file_is_final = True
         self._dropable = False
 
+    def set_fileinfo(self, fileinfo: FileInfo) -> None:
+        """Rebind a recycled item to a different file."""
+
+        self.fileinfo = fileinfo
+
+        self.press_pos = None
+        self._new = False
+        self.hovering = False
+
+        if self.animation_timer is not None:
+            self.killTimer(self.animation_timer)
+            self.animation_timer = None
+
+        self.icon = self.make_icon()
+        self.normal_thumbnail = Thumbnail("normal", self)
+        self.large_thumbnail = Thumbnail("large", self)
+        self.metadata = None
+
+        self._file_is_final = True
+        self._dropable = False
+
+        self.update()
+
     def on_file_modified(self, fileinfo: FileInfo, final=False):
         self.fileinfo = fileinfo
         self._file_is_final = final
@@ -102,7 +125,7 @@ class FileItem(QGraphicsObject):
     def prepare(self) -> None:
         if self._file_is_final:
             if self.metadata is None:
-                self.controller.request_metadata(self.fileinfo)
+                self.file_view.request_metadata(self.fileinfo)
                 self.metadata = {}
 
             thumbnail = self._get_thumbnail()
@@ -164,6 +187,7 @@ class FileItem(QGraphicsObject):
 
         if not self.file_view.is_scrolling():
             self.controller.show_current_filename(self.fileinfo.abspath())
+            self.controller.prefetch_hint(self.fileinfo)
 
         self.update()
 
@@ -176,6 +200,10 @@ class FileItem(QGraphicsObject):
 
         self.update()
 
+    def is_thumbnail_loading(self) -> bool:
+        return (self.normal_thumbnail.status == ThumbnailStatus.LOADING or
+                self.large_thumbnail.status == ThumbnailStatus.LOADING)
+
     def set_thumbnail_image(self, image: QImage, flavor) -> None:
         thumbnail = self._get_thumbnail(flavor)
         thumbnail.set_thumbnail_image(image)
@@ -49,7 +49,7 @@ class FileItemRenderer:
         self.new = item._new
         self.crop_thumbnails = item.file_view._crop_thumbnails
         self.is_selected = item.isSelected()
-        self.is_cursor = item.file_view._cursor_item == item
+        self.is_cursor = item.file_view.cursor_location() == item.fileinfo.location()
 
         self.thumbnail_rect: QRect = QRect(0, 0, item.tile_rect.width(), item.tile_rect.width())
 
@@ -47,6 +47,16 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+# Items are materialized for the viewport plus this fraction of the
+# viewport height above and below, so that slow scrolling never shows
+# empty tiles
+PREFETCH_MARGIN = 1.0
+
+# Changes of up to this many files are applied to the existing layout,
+# larger ones rebuild it
+INCREMENTAL_LAYOUT_LIMIT = 128
+
+
 class FileView(QGraphicsView):
 
     def __init__(self, controller: 'Controller') -> None:
@@ -61,14 +71,28 @@ class FileView(QGraphicsView):
 
         self._show_filtered = False
 
+        # FileItems only exist for the files near the viewport, the
+        # rest of the files are just entries in the layout
+        self._virtualize = settings.value("globals/virtualize_file_view", True, bool)
+        self._fileinfo2item: Dict[FileInfo, FileItem] = {}
         self._location2item: Dict[Location, List[FileItem]] = defaultdict(list)
+        self._item_pool: List[FileItem] = []
+        self._new_locations: Set[Location] = set()
+        self._metadata_requested: Set[Location] = set()
+
+        # set while FileItem selection is changed to mirror the
+        # FileCollection, to avoid feeding it back
+        self._syncing_selection = False
+
         self.setAcceptDrops(True)
 
-        self._scene = FileGraphicsScene()
+        # owned by the view, so that the view is gone before the
+        # scene emits selectionChanged() while deleting its items
+        self._scene = FileGraphicsScene(self)
         self._scene.sig_files_drop.connect(self._controller.on_files_drop)
         self.setScene(self._scene)
 
-        self._scene.selectionChanged.connect(self.on_selection_changed)
+        self._scene.selectionChanged.connect(self._on_scene_selection_changed)
 
         self._style = FileViewStyle()
 
@@ -80,15 +104,13 @@ class FileView(QGraphicsView):
         self._mode = self._modes[FileItemStyle.ICON.value]
 
         self._layout: Optional[RootLayout] = None
-
-        self._items: List[FileItem] = []
+        self._layout_builder: Optional[LayoutBuilder] = None
 
         self._file_collection: Optional[FileCollection] = None
 
         self._needs_layout = True
 
         self.apply_zoom()
-        self._cursor_item: Optional[FileItem] = None
         self._crop_thumbnails = False
         self.setBackgroundBrush(QBrush(Qt.white, Qt.SolidPattern))
         self._resize_timer: Optional[int] = None
@@ -134,6 +156,9 @@ class FileView(QGraphicsView):
     def _on_vertical_scrollbar_slider_value_changed(self, value: int) -> None:
         self._is_scrolling = True
 
+        if not self._needs_layout:
+            self._update_viewport_items()
+
         if self._scroll_timer is not None:
             self.killTimer(self._scroll_timer)
             self._scroll_timer = None
@@ -147,79 +172,158 @@ class FileView(QGraphicsView):
         self._controller.hide_all()
 
     def prepare(self) -> None:
-        for item in self._items:
+        for item in self._fileinfo2item.values():
             item.prepare()
 
+    def _on_scene_selection_changed(self) -> None:
+        if self._syncing_selection or self._file_collection is None:
+            return
+
+        selected_items = set(self._scene.selectedItems())
+
+        selected = []
+        deselected = []
+        for fileinfo, item in self._fileinfo2item.items():
+            if item in selected_items:
+                selected.append(fileinfo)
+            else:
+                deselected.append(fileinfo)
+
+        self._file_collection.update_selection(selected, deselected)
+
     def on_selection_changed(self) -> None:
+        assert self._file_collection is not None
+
+        self._syncing_selection = True
+        for fileinfo, item in self._fileinfo2item.items():
+            item.setSelected(self._file_collection.is_selected(fileinfo))
+        self._syncing_selection = False
+
         self._controller._update_info()
 
+    def viewport_fileinfos(self) -> List[FileInfo]:
+        """Returns the files that currently have an item, i.e. those in
+        or close to the viewport."""
+
+        return list(self._fileinfo2item)
+
+    def cursor_location(self) -> Optional[Location]:
+        if self._file_collection is None:
+            return None
+        else:
+            return self._file_collection.cursor()
+
+    def cursor_item(self) -> Optional[FileItem]:
+        location = self.cursor_location()
+        if location is None:
+            return None
+        else:
+            return self._location2item.get(location, [None])[0]
+
+    def cursor_fileinfo(self) -> Optional[FileInfo]:
+        location = self.cursor_location()
+        if location is None or self._file_collection is None:
+            return None
+        else:
+            return self._file_collection.get_fileinfo(location)
+
+    def _set_cursor(self, fileinfo: Optional[FileInfo]) -> None:
+        if self._file_collection is None:
+            return
+
+        item = self.cursor_item()
+        if item is not None:
+            item.update()
+
+        self._file_collection.set_cursor(None if fileinfo is None else fileinfo.location())
+
+        item = self.cursor_item()
+        if item is not None:
+            item.update()
+
+        if fileinfo is not None:
+            self._controller.prefetch_hint(fileinfo)
+
+    def _tile_rect(self, x: int, y: int) -> QRectF:
+        return QRectF(x, y, self._mode._tile_style.tile_width, self._mode._tile_style.tile_height)
+
+    def _ensure_fileinfo_visible(self, fileinfo: FileInfo) -> None:
+        if self._layout is None:
+            return
+
+        pos = self._layout.get_fileinfo_pos(fileinfo)
+        if pos is not None:
+            self.ensureVisible(self._tile_rect(*pos))
+
     def cursor_move(self, dx: int, dy: int) -> None:
-        def best_item(items, rect):
-            """Select the most top/left and fully visible item"""
-            def contains(item):
-                r = QRectF(item.tile_rect)
-                r.moveTo(item.pos())
-                return rect.contains(r)
-
-            items = sorted(items, key=lambda item: (not contains(item),
-                                                    item.pos().x(),
-                                                    item.pos().y()))
-            return items[0]
-
-        if self._cursor_item is None:
-            rect = self.mapToScene(self.rect()).boundingRect()
-            items = [item for item in self._scene.items(rect) if isinstance(item, FileItem)]
-            if not items:
-                return
-            else:
-                self._cursor_item = best_item(items, rect)
-                self.ensureVisible(self._cursor_item)
-                self._cursor_item.update()
-                return
+        if self._layout is None:
+            return
 
-        self._cursor_item.update()
+        fileinfo = self.cursor_fileinfo()
+        pos = None if fileinfo is None else self._layout.get_fileinfo_pos(fileinfo)
 
-        # query a rectengular area next to the current item for items,
-        # use the first one that we find
-        rect = QRectF(self._cursor_item.tile_rect)
-        rect.moveTo(self._cursor_item.pos().x() + (self._cursor_item.tile_rect.width() + 4) * dx,
-                    self._cursor_item.pos().y() + (self._cursor_item.tile_rect.height() + 4) * dy)
-        items = [item for item in self._scene.items(rect) if isinstance(item, FileItem)]
-        if items:
-            self._cursor_item = items[0]
+        if pos is None:
+            # select the most top/left and fully visible file
+            rect = self.mapToScene(self.rect()).boundingRect()
+            tiles = list(self._layout.get_fileinfos_in_rect(rect))
+            if not tiles:
+                return
 
-        self._cursor_item.update()
-        self.ensureVisible(self._cursor_item)
+            fileinfo, x, y = min(tiles, key=lambda tile: (not rect.contains(self._tile_rect(tile[1], tile[2])),
+                                                          tile[1], tile[2]))
+        else:
+            # query a rectengular area next to the current file, use
+            # the one closest to where the cursor would move
+            x, y = pos
+            rect = self._tile_rect(x, y)
+            rect.moveTo(x + (rect.width() + 4) * dx,
+                        y + (rect.height() + 4) * dy)
+            tiles = list(self._layout.get_fileinfos_in_rect(rect))
+            if tiles:
+                fileinfo, x, y = min(tiles, key=lambda tile: (abs(tile[1] - rect.x()) +
+                                                              abs(tile[2] - rect.y())))
+
+        self._set_cursor(fileinfo)
+        self.ensureVisible(self._tile_rect(x, y))
+
+    def _select_cursor(self) -> None:
+        fileinfo = self.cursor_fileinfo()
+        if fileinfo is not None and self._file_collection is not None:
+            self._file_collection.set_selected(fileinfo, True)
 
     def keyPressEvent(self, ev) -> None:
         if ev.key() == Qt.Key_Escape:
-            self._scene.clearSelection()
-            item = self._cursor_item
-            self._cursor_item = None
-            if item is not None:
-                item.update()
+            if self._file_collection is not None:
+                self._file_collection.clear_selection()
+            self._set_cursor(None)
         elif ev.key() == Qt.Key_Space and ev.modifiers() & Qt.ControlModifier:
-            if self._cursor_item is not None:
-                self._cursor_item.setSelected(not self._cursor_item.isSelected())
+            fileinfo = self.cursor_fileinfo()
+            if fileinfo is not None and self._file_collection is not None:
+                self._file_collection.set_selected(fileinfo, not self._file_collection.is_selected(fileinfo))
         elif ev.key() == Qt.Key_Left:
-            if self._cursor_item is not None and ev.modifiers() & Qt.ShiftModifier:
-                self._cursor_item.setSelected(True)
+            if ev.modifiers() & Qt.ShiftModifier:
+                self._select_cursor()
             self.cursor_move(-1, 0)
         elif ev.key() == Qt.Key_Right:
-            if self._cursor_item is not None and ev.modifiers() & Qt.ShiftModifier:
-                self._cursor_item.setSelected(True)
+            if ev.modifiers() & Qt.ShiftModifier:
+                self._select_cursor()
             self.cursor_move(+1, 0)
         elif ev.key() == Qt.Key_Up:
-            if self._cursor_item is not None and ev.modifiers() & Qt.ShiftModifier:
-                self._cursor_item.setSelected(True)
+            if ev.modifiers() & Qt.ShiftModifier:
+                self._select_cursor()
             self.cursor_move(0, -1)
         elif ev.key() == Qt.Key_Down:
-            if self._cursor_item is not None and ev.modifiers() & Qt.ShiftModifier:
-                self._cursor_item.setSelected(True)
+            if ev.modifiers() & Qt.ShiftModifier:
+                self._select_cursor()
             self.cursor_move(0, +1)
         elif ev.key() == Qt.Key_Return:
-            if self._cursor_item is not None:
-                self._cursor_item.click_action(new_window=ev.modifiers() & Qt.ShiftModifier)
+            item = self.cursor_item()
+            if item is not None:
+                item.click_action(new_window=ev.modifiers() & Qt.ShiftModifier)
+            else:
+                fileinfo = self.cursor_fileinfo()
+                if fileinfo is not None:
+                    self._controller.on_click(fileinfo, new_window=ev.modifiers() & Qt.ShiftModifier)
         elif ev.text() != "":
             self._leap_widget.show()
             self._leap_widget._line_edit.setText(ev.text())
@@ -229,7 +333,7 @@ class FileView(QGraphicsView):
 
     def set_crop_thumbnails(self, v) -> None:
         self._crop_thumbnails = v
-        for item in self._items:
+        for item in self._fileinfo2item.values():
             item.update()
 
     def set_file_collection(self, file_collection: FileCollection) -> None:
@@ -240,12 +344,17 @@ class FileView(QGraphicsView):
         self._file_collection.sig_files_reordered.connect(self.on_file_collection_reordered)
         self._file_collection.sig_files_filtered.connect(self.on_file_collection_filtered)
         self._file_collection.sig_files_grouped.connect(self.on_file_collection_grouped)
+        self._file_collection.sig_files_regrouped.connect(self.on_files_regrouped)
 
         self._file_collection.sig_file_added.connect(self.on_file_added)
-        self._file_collection.sig_file_removed.connect(self.on_file_removed)
+        self._file_collection.sig_files_added.connect(self.on_files_added)
+        self._file_collection.sig_files_removed.connect(self.on_files_removed)
         self._file_collection.sig_file_modified.connect(self.on_file_modified)
+        self._file_collection.sig_files_modified.connect(self.on_files_modified)
         self._file_collection.sig_fileinfo_updated.connect(self.on_fileinfo_updated)
         self._file_collection.sig_file_closed.connect(self.on_file_closed)
+        self._file_collection.sig_files_closed.connect(self.on_files_closed)
+        self._file_collection.sig_selection_changed.connect(self.on_selection_changed)
 
         self.on_file_collection_set()
 
@@ -253,35 +362,97 @@ class FileView(QGraphicsView):
 
     def on_file_added(self, idx: int, fileinfo: FileInfo) -> None:
         logger.debug("FileView.on_file_added: %s %s", idx, fileinfo)
-        item = FileItem(fileinfo, self._controller, self)
-        item._new = True
-        self._location2item[fileinfo.location()].append(item)
-        self._scene.addItem(item)
-        self._items.append(item)
+        self._new_locations.add(fileinfo.location())
 
-        self.style_item(item)
+        # same as a batch, so the file lands at its sort position in
+        # its group and stays out when it is filtered
+        self._update_layout([], [fileinfo])
 
-        if self._layout is not None:
-            self._layout.append_item(item)
-            self.refresh_bounding_rect()
+    def on_files_added(self, fileinfos: List[FileInfo], new: bool) -> None:
+        logger.debug("FileView.on_files_added: %d", len(fileinfos))
 
-    def on_file_removed(self, location: Location) -> None:
-        logger.debug("FileView.on_file_removed: %s", location)
-        items = self._location2item.get(location, [])
-        for item in items:
-            self._scene.removeItem(item)
-            self._items.remove(item)
+        if new:
+            self._new_locations.update(fi.location() for fi in fileinfos)
+
+        # large batches are picked up in collection order by a
+        # relayout, that is deferred to the next paintEvent() and thus
+        # happens at most once per frame no matter how many chunks
+        # arrive
+        self._update_layout([], fileinfos)
+
+    def on_files_removed(self, locations: List[Location]) -> None:
+        logger.debug("FileView.on_files_removed: %d", len(locations))
+
+        removed: Set[Location] = set(locations)
+
+        # hiding a few thousand items one by one would otherwise
+        # trigger a scene update for each of them
+        self.setUpdatesEnabled(False)
+        try:
+            for location in removed:
+                for item in list(self._location2item.get(location, [])):
+                    self._release_item(item)
+            self._new_locations.difference_update(removed)
+
+            self._update_layout(list(removed), [])
+        finally:
+            self.setUpdatesEnabled(True)
+
+    def _replace_fileinfos(self, fileinfos: List[FileInfo], final: bool) -> None:
+        for fileinfo in fileinfos:
+            self._new_locations.add(fileinfo.location())
+
+            # duplicate Locations get collapsed into one FileInfo by
+            # FileCollection, so only one item survives
+            items = list(self._location2item.get(fileinfo.location(), []))
+            for item in items[1:]:
+                self._release_item(item)
+
+            if items:
+                item = items[0]
+                del self._fileinfo2item[item.fileinfo]
+                item.on_file_modified(fileinfo, final=final)
+                self._fileinfo2item[fileinfo] = item
+                self.style_item(item)
+                item.update()
+
+        # the modified files are new FileInfo objects and might have
+        # moved in the sort order
+        self._update_layout([fi.location() for fi in fileinfos], fileinfos)
 
-        if items != []:
-            del self._location2item[location]
+    def _update_layout(self, removed: List[Location], added: List[FileInfo]) -> None:
+        """Apply the changes to the current layout, only the tiles after
+        the changed ones move and only the affected groups get
+        touched. Falls back to a complete relayout for large changes or
+        when the layout switches between one and multiple groups.
+        Removals are done in a single pass over each affected group, so
+        only the number of added files is limited."""
+
+        if self._layout is None or self._needs_layout or len(added) > INCREMENTAL_LAYOUT_LIMIT:
+            self.layout_items()
+            return
+
+        assert self._layout_builder is not None and self._file_collection is not None
+        sorter = self._file_collection.get_sorter()
+        if not self._layout_builder.remove_locations(self._layout, removed):
+            self.layout_items()
+        elif not self._layout_builder.insert_fileinfos(self._layout, added, sorter.get_key_func(), sorter.reverse):
             self.layout_items()
+        else:
+            self.refresh_bounding_rect()
+            self._update_viewport_items()
+
+    def on_files_modified(self, fileinfos: List[FileInfo]) -> None:
+        logger.debug("FileView.on_files_modified: %d", len(fileinfos))
+        self._replace_fileinfos(fileinfos, final=False)
+
+    def on_files_closed(self, fileinfos: List[FileInfo]) -> None:
+        logger.debug("FileView.on_files_closed: %d", len(fileinfos))
+        self._replace_fileinfos(fileinfos, final=True)
 
     def on_file_modified(self, fileinfo: FileInfo) -> None:
         logger.debug("FileView.on_file_modified: %s", fileinfo)
-        items = self._location2item.get(fileinfo.location(), [])
-        for item in items:
-            item.on_file_modified(fileinfo)
-            item.update()
+        self._replace_fileinfos([fileinfo], final=False)
 
     def on_fileinfo_updated(self, fileinfo: FileInfo) -> None:
         logger.debug("FileView.on_fileinfo_updated: %s", fileinfo)
@@ -292,27 +463,11 @@ class FileView(QGraphicsView):
 
     def on_file_closed(self, fileinfo: FileInfo) -> None:
         logger.debug("FileView.on_file_closed: %s", fileinfo)
-        items = self._location2item.get(fileinfo.location(), [])
-        for item in items:
-            item.on_file_modified(fileinfo, final=True)
-            item.update()
+        self._replace_fileinfos([fileinfo], final=True)
 
     def on_file_collection_reordered(self) -> None:
         logger.debug("FileView.on_file_collection_reordered")
 
-        fileinfos = self._file_collection.get_fileinfos()
-
-        # FIXME: this is a crude hack to deal with duplicate
-        # Locations, this problem should probably be attacked in
-        # FileCollection and asign a unique id to each FileInfo.
-        self._items = []
-        processed: Set[Location] = set()
-        for fi in fileinfos:
-            if fi.location() not in processed:
-                lst = self._location2item[fi.location()]
-                processed.add(fi.location())
-                self._items += lst
-
         self.layout_items()
 
     def on_file_collection_filtered(self) -> None:
@@ -320,46 +475,155 @@ class FileView(QGraphicsView):
         self.style_items()
         self.layout_items()
 
+    def on_files_regrouped(self, fileinfos: List[FileInfo]) -> None:
+        logger.debug("FileView.on_files_regrouped: %d", len(fileinfos))
+        self._update_layout([fi.location() for fi in fileinfos], fileinfos)
+
     def on_file_collection_grouped(self) -> None:
         logger.debug("FileView.on_file_collection_grouped")
         self.style_items()
         self.layout_items()
 
     def clear(self) -> None:
-        self._items.clear()
-        self._cursor_item = None
+        loading = [fileinfo.location() for fileinfo, item in self._fileinfo2item.items()
+                   if item.is_thumbnail_loading()]
+        if loading:
+            self._controller.cancel_thumbnails(loading)
+
+        self._fileinfo2item.clear()
         self._location2item.clear()
+        self._item_pool.clear()
+        self._new_locations.clear()
+        self._metadata_requested.clear()
+
+        self._syncing_selection = True
         self._scene.clear()
+        self._syncing_selection = False
         self._layout = None
+        self._layout_builder = None
 
     def on_file_collection_set(self) -> None:
         logger.debug("FileView.on_file_collection_set")
         self.clear()
 
-        fileinfos = self._file_collection.get_fileinfos()
+        self.layout_items()
+
+    def _acquire_item(self, fileinfo: FileInfo) -> FileItem:
+        assert self._file_collection is not None
 
-        for fileinfo in fileinfos:
+        if self._item_pool:
+            item = self._item_pool.pop()
+            item.set_fileinfo(fileinfo)
+            item.setVisible(True)
+        else:
             item = FileItem(fileinfo, self._controller, self)
-            self._location2item[fileinfo.location()].append(item)
             self._scene.addItem(item)
-            self._items.append(item)
 
-        self.style_items()
-        self.layout_items()
+        item._new = fileinfo.location() in self._new_locations
+
+        syncing = self._syncing_selection
+        self._syncing_selection = True
+        item.setSelected(self._file_collection.is_selected(fileinfo))
+        self._syncing_selection = syncing
+
+        self._fileinfo2item[fileinfo] = item
+        self._location2item[fileinfo.location()].append(item)
+        self.style_item(item)
+        return item
+
+    def _release_item(self, item: FileItem) -> None:
+        del self._fileinfo2item[item.fileinfo]
+
+        items = self._location2item[item.fileinfo.location()]
+        items.remove(item)
+        if not items:
+            del self._location2item[item.fileinfo.location()]
+
+        # hidden items stay in the scene, so that they can be reused
+        # without paying for the scene index
+        syncing = self._syncing_selection
+        self._syncing_selection = True
+        item.setSelected(False)
+        item.setVisible(False)
+        self._syncing_selection = syncing
+
+        self._item_pool.append(item)
+
+    def _prefetch_rect(self) -> Optional[QRectF]:
+        if not self._virtualize:
+            return None
+
+        rect = self._viewport_rect()
+        margin = rect.height() * PREFETCH_MARGIN
+        return rect.adjusted(0, -margin, 0, margin)
+
+    @profile
+    def _update_viewport_items(self) -> None:
+        """Materialize FileItems for the files that are in or near the
+        viewport and return the others to the pool."""
+
+        if self._layout is None or self._file_collection is None:
+            return
+
+        tiles = list(self._layout.get_fileinfos_in_rect(self._prefetch_rect()))
+        wanted = {fileinfo for fileinfo, _, _ in tiles}
+
+        released = []
+        for fileinfo, item in list(self._fileinfo2item.items()):
+            if fileinfo not in wanted:
+                if item.is_thumbnail_loading():
+                    released.append(fileinfo.location())
+                self._release_item(item)
+
+        for fileinfo, x, y in tiles:
+            tile_item = self._fileinfo2item.get(fileinfo)
+            if tile_item is None:
+                tile_item = self._acquire_item(fileinfo)
+            tile_item.setPos(x, y)
+
+        # thumbnails of items that scrolled out of reach are no longer
+        # needed, the others get reordered by distance to the viewport
+        cancelled = [location for location in released if location not in self._location2item]
+        if cancelled:
+            self._controller.cancel_thumbnails(cancelled)
+
+        viewport = self._viewport_rect()
+        priorities = {item.fileinfo.location(): self._thumbnail_priority(item, viewport)
+                      for item in self._fileinfo2item.values()
+                      if item.is_thumbnail_loading()}
+        if priorities:
+            self._controller.prioritize_thumbnails(priorities)
+
+    def _viewport_rect(self) -> QRectF:
+        viewport = self.viewport()
+        assert viewport is not None
+        rect: QRectF = self.mapToScene(viewport.rect()).boundingRect()
+        return rect
+
+    def _thumbnail_priority(self, item: FileItem, viewport: QRectF) -> int:
+        """Distance of 'item' from the viewport in pixel, 0 when visible."""
+
+        rect = item.sceneBoundingRect()
+        if rect.bottom() < viewport.top():
+            return int(viewport.top() - rect.bottom()) + 1
+        elif rect.top() > viewport.bottom():
+            return int(rect.top() - viewport.bottom()) + 1
+        else:
+            return 0
 
     def resizeEvent(self, ev) -> None:
         logger.debug("FileView.resizeEvent: %s", ev)
 
         super().resizeEvent(ev)
 
-        self.apply_zoom()
+        self._update_tile_style()
 
         if settings.value("globals/resize_delay", True):
             if self._resize_timer is not None:
                 self.killTimer(self._resize_timer)
             self._resize_timer = self.startTimer(100)
         else:
-            self.layout_items()
+            self._relayout_items()
 
         self._leap_widget.place_widget()
 
@@ -372,9 +636,7 @@ class FileView(QGraphicsView):
             self.killTimer(self._resize_timer)
             self._resize_timer = None
 
-            if self._layout is not None:
-                self._layout.layout(self.viewport().width(), self.viewport().height())
-            self.layout_items()
+            self._relayout_items()
         elif ev.timerId() == self._scroll_timer:
             self.killTimer(self._scroll_timer)
             self._is_scrolling = False
@@ -398,7 +660,7 @@ class FileView(QGraphicsView):
             item.setOpacity(1.0)
 
     def style_items(self) -> None:
-        for item in self._items:
+        for item in self._fileinfo2item.values():
             self.style_item(item)
 
     def initPainter(self, painter):
@@ -418,18 +680,35 @@ class FileView(QGraphicsView):
         self.invalidateScene()
         self.update()
 
+    def _relayout_items(self) -> None:
+        """Recalculate positions for a new viewport size, the tiles
+        themselves stay the same, so no rebuild is needed."""
+
+        if self._layout is None or self._needs_layout:
+            self.layout_items()
+        else:
+            self._layout.layout(self.viewport().width(), self.viewport().height())
+            self.refresh_bounding_rect()
+            self._update_viewport_items()
+
     @profile
     def _layout_items(self) -> None:
         logger.debug("FileView._layout_items")
 
+        # painted before the Controller handed over its FileCollection
+        if self._file_collection is None:
+            return
+
         self.setUpdatesEnabled(False)
         # old_item_index_method = self._scene.itemIndexMethod()
         # self._scene.setItemIndexMethod(QGraphicsScene.NoIndex)
-        layout_builder = LayoutBuilder(self._scene, self._mode._tile_style)
-        self._layout = layout_builder.build_layout(self._items)
+        self._layout_builder = LayoutBuilder(self._scene, self._mode._tile_style)
+        self._layout_builder.set_show_filtered(self._show_filtered)
+        self._layout = self._layout_builder.build_layout(self._file_collection.get_groups())
 
         self._layout.layout(self.viewport().width(), self.viewport().height())
         self.refresh_bounding_rect()
+        self._update_viewport_items()
 
         # self._scene.setItemIndexMethod(old_item_index_method)
         self.setUpdatesEnabled(True)
@@ -475,7 +754,7 @@ class FileView(QGraphicsView):
         self._mode = self._modes[item_style.value]
         self.apply_zoom()
 
-    def apply_zoom(self) -> None:
+    def _update_tile_style(self) -> None:
         self._mode.update()
 
         if self._mode._zoom_index < 2:
@@ -483,13 +762,16 @@ class FileView(QGraphicsView):
         else:
             self.flavor = "large"
 
-        for item in self._items:
+        for item in itertools.chain(self._fileinfo2item.values(), self._item_pool):
             item.set_tile_size(self._mode._tile_style.tile_width, self._mode._tile_style.tile_height)
 
+    def apply_zoom(self) -> None:
+        self._update_tile_style()
+
         self.style_items()
         self.layout_items()
 
-        for item in self._items:
+        for item in self._fileinfo2item.values():
             item.update()
 
     def icon_from_fileinfo(self, fileinfo: FileInfo) -> QIcon:
@@ -526,12 +808,33 @@ class FileView(QGraphicsView):
                 pass
 
     def request_thumbnail(self, item, fileinfo: FileInfo, flavor: str, force: bool):
-        self._controller.request_thumbnail(fileinfo, flavor, force)
+        priority = self._thumbnail_priority(item, self._viewport_rect())
+        self._controller.request_thumbnail(fileinfo, flavor, force, priority)
+
+    def request_metadata(self, fileinfo: FileInfo) -> None:
+        # recycled items would otherwise request the metadata again
+        # each time they scroll into view
+        if fileinfo.location() not in self._metadata_requested:
+            self._metadata_requested.add(fileinfo.location())
+            self._controller.request_metadata(fileinfo)
+
+    def _items_for(self, fileinfos: Optional[List[FileInfo]]) -> List[FileItem]:
+        if fileinfos is None:
+            return list(self._fileinfo2item.values())
+        else:
+            return [item
+                    for fi in fileinfos
+                    for item in self._location2item.get(fi.location(), [])]
 
-    def reload_thumbnails(self):
-        for item in self._items:
+    def reload_thumbnails(self, fileinfos: Optional[List[FileInfo]] = None) -> None:
+        for item in self._items_for(fileinfos):
             item.reload_thumbnail()
 
+    def reload_metadata(self, fileinfos: List[FileInfo]) -> None:
+        self._metadata_requested.difference_update(fi.location() for fi in fileinfos)
+        for item in self._items_for(fileinfos):
+            item.reload_metadata()
+
     def set_show_filtered(self, show_filtered):
         self._show_filtered = show_filtered
         self.style_items()
@@ -551,31 +854,33 @@ class FileView(QGraphicsView):
         scrollbar.setValue(scrollbar.value() + x)
 
     def set_cursor_to_fileinfo(self, fileinfo: 'FileInfo', ensure_visible: bool):
-        self._scene.clearSelection()
+        if self._file_collection is None:
+            return
+
+        self._file_collection.set_selection([fileinfo])
+        self._set_cursor(fileinfo)
 
-        if self._cursor_item is not None:
-            self._cursor_item.update()
-        self._cursor_item = self._location2item.get(fileinfo.location(), [None])[0]
-        if self._cursor_item is not None:
-            self._cursor_item.setSelected(True)
-            self._cursor_item.update()
-            if ensure_visible:
-                self.ensureVisible(self._cursor_item)
+        if ensure_visible:
+            self._ensure_fileinfo_visible(fileinfo)
 
     def mousePressEvent(self, ev):
+        on_background = not isinstance(self.itemAt(ev.pos()), FileItem)
+        if ev.button() == Qt.LeftButton and on_background and not ev.modifiers() & Qt.ControlModifier:
+            # Qt only clears the selection of the existing items, the
+            # files outside of the viewport have to be cleared too
+            self._file_collection.clear_selection()
+
         super().mousePressEvent(ev)
 
-        item = self._cursor_item
-        if item is not None:
-            self._cursor_item = None
-            item.update()
+        self._set_cursor(None)
 
     def contextMenuEvent(self, ev):
         if ev.reason() == QContextMenuEvent.Keyboard:
-            if self._cursor_item is None:
+            item = self.cursor_item()
+            if item is None:
                 self._controller.on_context_menu(ev.globalPos())
             else:
-                self._controller.on_item_context_menu(ev, self._cursor_item)
+                self._controller.on_item_context_menu(ev, item)
         else:
             super().contextMenuEvent(ev)
             if not ev.isAccepted():
@@ -583,17 +888,14 @@ class FileView(QGraphicsView):
 
     def leap_to(self, text: str, forward: bool, skip: bool) -> None:
         if text == "":
-            item = self._cursor_item
-            self._cursor_item = None
-            if item is not None:
-                item.update()
+            self._set_cursor(None)
         else:
             text = text.lower()
 
-            item = self._cursor_item
-            if item is not None:
+            fileinfo = self.cursor_fileinfo()
+            if fileinfo is not None:
                 try:
-                    idx = self._file_collection.index(item.fileinfo)
+                    idx = self._file_collection.index(fileinfo)
                 except ValueError:
                     idx = None
             else:
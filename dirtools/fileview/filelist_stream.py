@@ -15,16 +15,17 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import TYPE_CHECKING, Optional, IO
+from typing import TYPE_CHECKING, List, IO
 
 import logging
-import fcntl
 import os
+import select
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from PyQt5.QtCore import QObject, QSocketNotifier, pyqtSignal
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
 
 from dirtools.fileview.file_info import FileInfo
-from dirtools.fileview.location import Location
 
 if TYPE_CHECKING:
     from dirtools.fileview.virtual_filesystem import VirtualFilesystem  # noqa: F401
@@ -32,40 +33,114 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
-def non_blocking_readline(fp, linesep):
-    flag = fcntl.fcntl(fp, fcntl.F_GETFL)
-    fcntl.fcntl(fp.fileno(), fcntl.F_SETFL, flag | os.O_NONBLOCK)
+# Number of bytes requested from the stream per read() call.
+READ_SIZE = 256 * 1024
 
-    rest = ""
-    while True:
+# Time in seconds the worker waits for new data before it checks
+# whether it got closed or a chunk is due.
+POLL_INTERVAL = 0.1
+
+# Files are stat()'ed in parallel in batches of STAT_BATCH_SIZE, which
+# mostly pays off on network filesystems and cold caches.
+STAT_JOBS = 8
+STAT_BATCH_SIZE = 256
+
+# Same chunking as DirectoryWatcher uses for directory scans, the
+# first chunk is handed to the GUI quickly, later ones get bigger.
+FIRST_CHUNK_TIME = 0.05
+MAX_CHUNK_TIME = 1.0
+
+
+class EntrySplitter:
+    """Splits a byte stream at 'sep' into entries, data that isn't
+    terminated yet is kept until the next feed()."""
+
+    def __init__(self, sep: bytes) -> None:
+        self._sep = sep
+        self._rest = b""
+
+    def feed(self, data: bytes) -> List[bytes]:
+        entries = (self._rest + data).split(self._sep)
+        self._rest = entries.pop()
+        return [entry for entry in entries if entry]
+
+    def finish(self) -> List[bytes]:
+        """Returns the last entry, which doesn't need a separator."""
+
+        rest = self._rest
+        self._rest = b""
+        return [rest] if rest else []
+
+
+def fileinfos_from_paths(paths: List[bytes]) -> List[FileInfo]:
+    return [FileInfo.from_path(os.fsdecode(path)) for path in paths]
+
+
+class FileListStreamWorker(QObject):
+
+    sig_scandir_progress = pyqtSignal(list)
+    sig_scandir_finished = pyqtSignal(list)
+    sig_message = pyqtSignal(str)
+
+    def __init__(self, fp: IO[bytes], linesep: str) -> None:
+        super().__init__()
+
+        self.fp = fp
+        self._splitter = EntrySplitter(os.fsencode(linesep))
+        self._close = False
+
+    def init(self) -> None:
         try:
-            # The buffer size is chosen to be artificially tiny to not
-            # make the GUI unresponsive.
-            data = fp.read(16)
-        except BlockingIOError:
-            yield None
-        else:
-            if data == "":
-                return
-            else:
-                data = rest + data
-                idx = data.find(linesep)
-                if idx != -1:
-                    rest = data[idx + 1:]
-                    yield data[0:idx]
-                else:
-                    rest = data
-                    yield None
+            self.process()
+        except Exception as err:
+            logger.exception("FileListStreamWorker.init: failed to read stream")
+            self.sig_message.emit(str(err))
+
+    def close(self) -> None:
+        pass
+
+    def process(self) -> None:
+        """Read the stream till the end and emit its content in chunks
+        via sig_scandir_progress, sig_scandir_finished receives the
+        last chunk."""
+
+        fileinfos: List[FileInfo] = []
+
+        budget = FIRST_CHUNK_TIME
+        deadline = time.monotonic() + budget
+
+        with ThreadPoolExecutor(STAT_JOBS) as executor:
+            while not self._close:
+                # select() with a timeout so that close() doesn't have
+                # to wait for the writer side of a pipe
+                readable, _, _ = select.select([self.fp], [], [], POLL_INTERVAL)
+                if readable:
+                    data = self.fp.read(READ_SIZE)
+                    if not data:
+                        fileinfos += fileinfos_from_paths(self._splitter.finish())
+                        self.sig_scandir_finished.emit(fileinfos)
+                        return
+
+                    paths = self._splitter.feed(data)
+                    batches = [paths[i:i + STAT_BATCH_SIZE] for i in range(0, len(paths), STAT_BATCH_SIZE)]
+                    for batch in executor.map(fileinfos_from_paths, batches):
+                        fileinfos += batch
+
+                if fileinfos and time.monotonic() > deadline:
+                    self.sig_scandir_progress.emit(fileinfos)
+                    fileinfos = []
+
+                    budget = min(budget * 2, MAX_CHUNK_TIME)
+                    deadline = time.monotonic() + budget
 
 
 class FileListStream(QObject):
     """FileListStream represents a stream of filenames read from stdin or
-    from other sources that is visualized in the FileView.
+    from other sources that is visualized in the FileView. The stream
+    is read and the files are stat()'ed in a separate thread.
     """
 
-    sig_file_added = pyqtSignal(FileInfo)
-    sig_end_of_stream = pyqtSignal()
-    sig_error = pyqtSignal()
+    sig_close_requested = pyqtSignal()
 
     @staticmethod
     def from_location(app, linesep, location):
@@ -76,45 +151,46 @@ class FileListStream(QObject):
 
         return FileListStream(app.vfs, tee_fd, linesep)
 
-    @property
-    def sig_finished(self):
-        return self.sig_end_of_stream
-
     def __init__(self, vfs: 'VirtualFilesystem',
-                 fp: IO, linesep: str = "\n") -> None:
+                 fp: IO[bytes], linesep: str = "\n") -> None:
         super().__init__()
 
         self.vfs = vfs
         self.fp = fp
-        self.linesep = linesep
 
-        self.readliner = None
-        self.socket_notifier: Optional[QSocketNotifier] = None
+        self._worker = FileListStreamWorker(fp, linesep)
+        self._thread = QThread(self)
+        self._worker.moveToThread(self._thread)
+
+        self._thread.started.connect(self._worker.init)
+
+        # see DirectoryWatcher, the PyQt5 stubs don't know about 'type'
+        self.sig_close_requested.connect(self._worker.close,
+                                         type=Qt.BlockingQueuedConnection)  # type: ignore[call-arg]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        assert self._worker._close is False
+        self._worker._close = True
+        self.sig_close_requested.emit()
+        self._thread.quit()
+        self._thread.wait()
 
-    def close(self):
         self.fp.close()
 
-    def start(self):
-        self.readliner = non_blocking_readline(self.fp, self.linesep)
-
-        self.socket_notifier = QSocketNotifier(self.fp.fileno(), QSocketNotifier.Read)
-        self.socket_notifier.activated.connect(self._on_activated)
-
-    def _on_activated(self, fd: int) -> None:
-        while True:
-            try:
-                filename: str = next(self.readliner)
-            except StopIteration:
-                self.socket_notifier.setEnabled(False)
-                self.socket_notifier = None
-                self.sig_end_of_stream.emit()
-                return
-            else:
-                if filename is not None:
-                    location = Location.from_path(filename)
-                    self.sig_file_added.emit(self.vfs.get_fileinfo(location))
-                else:
-                    return
+    @property
+    def sig_scandir_progress(self):
+        return self._worker.sig_scandir_progress
+
+    @property
+    def sig_scandir_finished(self):
+        return self._worker.sig_scandir_finished
+
+    @property
+    def sig_message(self):
+        return self._worker.sig_message
 
 
 # EOF #
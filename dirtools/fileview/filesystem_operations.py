@@ -15,12 +15,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Optional, List, Callable, TYPE_CHECKING
+from typing import Optional, List, Callable
 
 import logging
+import os
 
 from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import QWidget, QMessageBox
 
 from dirtools.fileview.location import Location
 from dirtools.fileview.rename_operation import RenameOperation
@@ -28,17 +29,19 @@ from dirtools.fileview.return_value import ReturnValue
 from dirtools.file_transfer import FileTransfer, Progress, ConflictResolution, Mediator, CancellationException
 from dirtools.fileview.conflict_dialog import ConflictDialog
 from dirtools.fileview.transfer_dialog import TransferDialog
+from dirtools.fileview.settings import settings
+from dirtools.transfer_journal import TransferJournal
 
-if TYPE_CHECKING:
-    from dirtools.filesystem import Filesystem  # noqa: F401
+from dirtools.filesystem import Durability, Filesystem
 
 logger = logging.getLogger(__name__)
 
 
 class TransferWorker(QObject):
 
-    def __init__(self, fs: 'Filesystem', action: Callable, sources: List[str], destination: str,
-                 mediator: Mediator, progress: Progress) -> None:
+    def __init__(self, fs: Filesystem, action: Callable, sources: List[str], destination: str,
+                 mediator: Mediator, progress: Progress,
+                 journal: Optional[TransferJournal] = None, verify: bool = False) -> None:
         super().__init__()
 
         self._fs = fs
@@ -47,6 +50,8 @@ class TransferWorker(QObject):
         self._destination = destination
         self._mediator = mediator
         self._progress = progress
+        self._journal = journal
+        self._verify = verify
 
         self._close = False
 
@@ -54,14 +59,23 @@ class TransferWorker(QObject):
         pass
 
     def on_started(self) -> None:
-        transfer = FileTransfer(self._fs, self._mediator, self._progress)
+        transfer = FileTransfer(self._fs, self._mediator, self._progress, self._journal)
+        transfer.verify = self._verify
 
         try:
             for source in self._sources:
                 self._action(transfer, source, self._destination)
+
+            transfer.finish()
+
+            if self._journal is not None:
+                self._journal.finish()
         except CancellationException:
+            transfer.finish()
             self._progress.transfer_canceled()
         finally:
+            if self._journal is not None:
+                self._journal.close()
             self._progress.transfer_completed()
 
 
@@ -70,6 +84,7 @@ class GuiProgress(QObject):
     sig_copy_file = pyqtSignal(str, str, ConflictResolution)
     sig_copy_progress = pyqtSignal(int, int)
     sig_copy_directory = pyqtSignal(str, str, ConflictResolution)
+    sig_verify_file = pyqtSignal(str, str, bool)
     sig_link_file = pyqtSignal(str, str, ConflictResolution)
     sig_move_file = pyqtSignal(str, str, ConflictResolution)
     sig_move_directory = pyqtSignal(str, str, ConflictResolution)
@@ -90,6 +105,9 @@ class GuiProgress(QObject):
     def copy_directory(self, src: str, dst: str, resolution: ConflictResolution) -> None:
         self.sig_copy_directory.emit(src, dst, resolution)
 
+    def verify_file(self, src: str, dst: str, success: bool) -> None:
+        self.sig_verify_file.emit(src, dst, success)
+
     def remove_file(self, src: str) -> None:
         self.sig_remove_file.emit(src)
 
@@ -143,7 +161,8 @@ class GuiFileTransfer(QObject):
     sig_finished = pyqtSignal()
     sig_close_requested = pyqtSignal()
 
-    def __init__(self, app, action: Callable, sources: List[str], destination: str) -> None:
+    def __init__(self, app, fs: Filesystem, action: Callable, sources: List[str], destination: str,
+                 journal: Optional[TransferJournal] = None) -> None:
         super().__init__()
 
         self._app = app
@@ -162,7 +181,8 @@ class GuiFileTransfer(QObject):
         transfer_dialog.finished.connect(self._on_finished)
         transfer_dialog.show()
 
-        worker = TransferWorker(self._app.fs, action, sources, destination, mediator, progress)
+        worker = TransferWorker(fs, action, sources, destination, mediator, progress, journal,
+                                verify=settings.value("globals/verify_transfers", False, bool))
         worker.moveToThread(thread)
         thread.started.connect(worker.on_started)
         thread.start()
@@ -211,20 +231,66 @@ class FilesystemOperations:
         self._rename_op.rename_location(location, parent)
 
     def move_files(self, sources: List[str], destination: str) -> None:
-        self._transfer_files(FileTransfer.move, sources, destination)
+        if self._app.fs.enabled:
+            journal: Optional[TransferJournal] = TransferJournal.create("move", sources, destination)
+        else:
+            journal = None
+        self._transfer_files(FileTransfer.move, sources, destination, journal)
         # transfer_dialog = TransferDialog(destination)
 
+    def resume_interrupted_transfers(self) -> None:
+        """Offer to resume moves that got interrupted by a crash or
+        restart."""
+
+        for journal in TransferJournal.find_unfinished():
+            if journal.action != "move" or journal.relative:
+                continue
+
+            result = QMessageBox.question(
+                None, "Resume interrupted transfer?",
+                "A transfer was interrupted before it finished:\n\n"
+                "{}\n\n-> {}\n\n"
+                "Resume it? Files that were completely copied won't be copied again.".format(
+                    "\n".join(journal.abs_sources()), journal.destdir),
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+
+            if result == QMessageBox.Yes:
+                try:
+                    journal.acquire()
+                except Exception as err:
+                    logger.error("FilesystemOperations.resume_interrupted_transfers: %s", err)
+                else:
+                    # sources that are gone have already been moved completely
+                    sources = [p for p in journal.abs_sources() if os.path.lexists(p)]
+                    self._transfer_files(FileTransfer.move, sources, journal.destdir, journal)
+            elif result == QMessageBox.No:
+                journal.finish()
+            else:
+                pass  # ask again next time
+
     def copy_files(self, sources: List[str], destination: str) -> None:
         self._transfer_files(FileTransfer.copy, sources, destination)
 
     def link_files(self, sources: List[str], destination: str) -> None:
         self._transfer_files(FileTransfer.link, sources, destination)
 
-    def _transfer_files(self, action: Callable, sources: List[str], destination: str) -> None:
-        transfer = GuiFileTransfer(self._app, action, sources, destination)
+    def _transfer_files(self, action: Callable, sources: List[str], destination: str,
+                        journal: Optional[TransferJournal] = None) -> None:
+        transfer = GuiFileTransfer(self._app, self._make_filesystem(), action, sources, destination, journal)
         transfer.sig_finished.connect(lambda transfer=transfer: self._cleanup_transfer(transfer))
         self._transfers.append(transfer)
 
+    def _make_filesystem(self) -> Filesystem:
+        """Each transfer gets its own Filesystem, so that the settings
+        and the dirty directories of one don't leak into another."""
+
+        fs = Filesystem()
+        fs.set_enabled(self._app.fs.enabled)
+        fs.verbose = self._app.fs.verbose
+        fs.streaming = settings.value("globals/streaming_transfers", False, bool)
+        fs.durability = Durability(settings.value("globals/transfer_durability", Durability.BATCH.value))
+        return fs
+
     def _cleanup_transfer(self, transfer: GuiFileTransfer) -> None:
         transfer.close()
         self._transfers.remove(transfer)
@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Tuple
 
 from dirtools.fileview.settings import settings
 from dirtools.fileview.match_func import MatchFunc
@@ -31,12 +31,21 @@ class Filter:
         self.show_inaccessible = True
         self.match_func: Optional[MatchFunc] = None
 
+        # the text 'match_func' was parsed from, if any
+        self.pattern: Optional[str] = None
+
     def apply(self, fileinfo: 'FileInfo') -> None:
-        fileinfo.is_excluded = self._is_excluded(fileinfo)
-        fileinfo.is_hidden = self._is_hidden(fileinfo)
+        fileinfo.is_excluded, fileinfo.is_hidden = self.evaluate(fileinfo)
+
+    def evaluate(self, fileinfo: 'FileInfo') -> Tuple[bool, bool]:
+        """Returns (is_excluded, is_hidden) without touching 'fileinfo',
+        so it can be called from another thread."""
+
+        return self._is_excluded(fileinfo), self._is_hidden(fileinfo)
 
-    def set_match_func(self, match_func: Optional[MatchFunc]) -> None:
+    def set_match_func(self, match_func: Optional[MatchFunc], pattern: Optional[str] = None) -> None:
         self.match_func = match_func
+        self.pattern = pattern
 
     def _is_hidden(self, fileinfo) -> bool:
         if not self.show_hidden:
@@ -0,0 +1,116 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import TYPE_CHECKING, List
+
+import logging
+
+from PyQt5.QtCore import pyqtSignal
+
+from dirtools.fileview.worker_thread import WorkerThread, Worker
+
+if TYPE_CHECKING:
+    from dirtools.fileview.file_info import FileInfo  # noqa: F401
+    from dirtools.fileview.filter import Filter  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+# The first batch covers at least the files in the viewport, following
+# batches double in size up to FILTER_MAX_BATCH, so a large collection
+# only causes a handful of relayouts.
+FILTER_FIRST_BATCH = 256
+FILTER_MAX_BATCH = 8192
+
+
+class FilterWorker(Worker):
+
+    # generation, [(FileInfo, is_excluded, is_hidden), ...]
+    sig_batch_ready = pyqtSignal(int, list)
+    sig_finished = pyqtSignal(int)
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        # set from the GUI thread, a run stops as soon as it no
+        # longer matches its own generation
+        self._generation = 0
+
+    def _on_filter_requested(self, generation: int, filter: 'Filter',
+                             fileinfos: List['FileInfo'], first_batch: int) -> None:
+        logger.debug("FilterWorker._on_filter_requested: %d: %d files", generation, len(fileinfos))
+
+        batch_size = first_batch
+        results: List = []
+        for fileinfo in fileinfos:
+            if self._close or generation != self._generation:
+                logger.debug("FilterWorker._on_filter_requested: %d: cancelled", generation)
+                return
+
+            is_excluded, is_hidden = filter.evaluate(fileinfo)
+            results.append((fileinfo, is_excluded, is_hidden))
+
+            if len(results) >= batch_size:
+                self.sig_batch_ready.emit(generation, results)
+                results = []
+                batch_size = min(batch_size * 2, FILTER_MAX_BATCH)
+
+        if results:
+            self.sig_batch_ready.emit(generation, results)
+
+        self.sig_finished.emit(generation)
+
+
+class FilterThread(WorkerThread):
+    """Evaluates a Filter for a list of files in the background,
+    results for a request are dropped as soon as a newer one
+    arrives."""
+
+    sig_filter_requested = pyqtSignal(int, object, list, int)
+
+    def __init__(self) -> None:
+        super().__init__()
+        # WorkerThread._worker is Optional, keep the typed reference
+        self._filter_worker = FilterWorker()
+        self.set_worker(self._filter_worker)
+        self.sig_filter_requested.connect(self._filter_worker._on_filter_requested)
+
+        self._generation = 0
+
+    def request_filter(self, filter: 'Filter', fileinfos: List['FileInfo'],
+                       first_batch: int = FILTER_FIRST_BATCH) -> int:
+        """Returns the generation that the results will be tagged with."""
+
+        self.cancel()
+        self.sig_filter_requested.emit(self._generation, filter, fileinfos,
+                                       max(first_batch, FILTER_FIRST_BATCH))
+        return self._generation
+
+    def cancel(self) -> None:
+        self._generation += 1
+        self._filter_worker._generation = self._generation
+
+    @property
+    def sig_batch_ready(self):
+        return self._filter_worker.sig_batch_ready
+
+    @property
+    def sig_finished(self):
+        return self._filter_worker.sig_finished
+
+
+# EOF #
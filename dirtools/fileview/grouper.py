@@ -50,6 +50,22 @@ class Group:
         return self.label
 
 
+def compare_groups(lhs: Any, rhs: Any) -> int:
+    """Display order of the groups, files without a group come first,
+    followed by the groups in descending order."""
+
+    if lhs == rhs:
+        return 0
+    elif lhs is None:
+        return -1
+    elif rhs is None:
+        return 1
+    elif rhs < lhs:
+        return -1
+    else:
+        return 1
+
+
 class Grouper:
 
     def __init__(self) -> None:
@@ -80,13 +80,13 @@ class Gui(QObject):
 
     def on_item_context_menu(self, ev, item) -> None:
         if item.isSelected():
-            selected_items = self._window.file_view._scene.selectedItems()
+            fileinfos = self._controller.selected_fileinfos()
         else:
             self._controller.clear_selection()
             item.setSelected(True)
-            selected_items = [item]
+            fileinfos = [item.fileinfo]
 
-        menu = ItemContextMenu(self._controller, [item.fileinfo for item in selected_items])
+        menu = ItemContextMenu(self._controller, fileinfos)
 
         if ev.reason() == QContextMenuEvent.Keyboard:
             pos = self._window.file_view.mapToGlobal(
@@ -54,9 +54,7 @@ class ItemContextMenu(Menu):
 
     def _build_archive_menu(self):
         def make_extract(archive_location):
-            location = archive_location.copy()
-            location._payloads.append(Payload("archive", ""))
-            return location
+            return archive_location.with_payload(Payload("archive", ""))
 
         def left_func(location=self._fileinfo.location()):
             self._controller.set_location(make_extract(location))
@@ -15,8 +15,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Iterable, Iterator, Set, Tuple
 
+import bisect
 import math
 from enum import Enum
 from PyQt5.QtCore import QRectF
@@ -24,6 +25,10 @@ from PyQt5.QtWidgets import QGraphicsItem
 
 from dirtools.fileview.profiler import profile
 
+if TYPE_CHECKING:
+    from dirtools.fileview.file_info import FileInfo  # noqa: F401
+    from dirtools.fileview.location import Location  # noqa: F401
+
 
 class Layout:
 
@@ -53,6 +58,11 @@ class Layout:
     def get_bounding_rect(self) -> QRectF:
         return QRectF(self.x, self.y, self.width, self.height)
 
+    def get_fileinfos_in_rect(self, rect: Optional[QRectF]) -> Iterator[Tuple['FileInfo', int, int]]:
+        """Returns the files whose tiles intersect 'rect' together with
+        the tile position, all files when 'rect' is None."""
+        return iter(())
+
 
 class VSpacer(Layout):
 
@@ -74,6 +84,9 @@ class RootLayout(Layout):
         self.root: Optional[Layout] = None
         self.append_layout: Optional[TileLayout] = None
 
+        # Location -> (TileLayout, FileInfo), only built when needed
+        self._location_index: Optional[Dict['Location', Tuple[TileLayout, 'FileInfo']]] = None
+
     def set_root(self, root: Layout) -> None:
         assert self.root is None
         self.root = root
@@ -95,11 +108,69 @@ class RootLayout(Layout):
         assert self.root is not None
         return self.root.get_bounding_rect()
 
-    def append_item(self, item) -> None:
+    def relayout(self) -> None:
+        """Recalculate the positions after the content of a TileLayout
+        changed, the viewport size stays the same."""
         assert self.root is not None
-        self.append_layout.append_item(item)
         self.root.layout(self.width, self.height)
 
+    def insert_fileinfo(self, tile_layout: 'TileLayout', idx: int, fileinfo: 'FileInfo',
+                        relayout: bool = True) -> None:
+        tile_layout.insert_fileinfo(idx, fileinfo)
+
+        if self._location_index is not None:
+            self._location_index[fileinfo.location()] = (tile_layout, fileinfo)
+
+        if relayout:
+            self.relayout()
+
+    def remove_locations(self, locations: Iterable['Location']) -> List['TileLayout']:
+        """Removes the files at 'locations' and returns the TileLayouts
+        that contained them. The caller has to call relayout()
+        afterwards."""
+
+        index = self._get_location_index()
+
+        removed: Dict[TileLayout, Set['FileInfo']] = {}
+        for location in locations:
+            entry = index.pop(location, None)
+            if entry is not None:
+                tile_layout, fileinfo = entry
+                removed.setdefault(tile_layout, set()).add(fileinfo)
+
+        for tile_layout, fileinfos in removed.items():
+            tile_layout.remove_fileinfos(fileinfos)
+
+        return list(removed)
+
+    def get_fileinfos_in_rect(self, rect: Optional[QRectF]) -> Iterator[Tuple['FileInfo', int, int]]:
+        assert self.root is not None
+        return self.root.get_fileinfos_in_rect(rect)
+
+    def _get_location_index(self) -> Dict['Location', Tuple['TileLayout', 'FileInfo']]:
+        if self._location_index is None:
+            self._location_index = {}
+            for tile_layout in self._tile_layouts(self.root):
+                for fi in tile_layout.fileinfos:
+                    self._location_index[fi.location()] = (tile_layout, fi)
+
+        return self._location_index
+
+    def get_fileinfo_pos(self, fileinfo: 'FileInfo') -> Optional[Tuple[int, int]]:
+        entry = self._get_location_index().get(fileinfo.location())
+        if entry is None:
+            return None
+        else:
+            tile_layout, fi = entry
+            return tile_layout.get_tile_pos(tile_layout.fileinfos.index(fi))
+
+    def _tile_layouts(self, layout: Optional[Layout]) -> Iterator['TileLayout']:
+        if isinstance(layout, TileLayout):
+            yield layout
+        elif isinstance(layout, HBoxLayout):
+            for child in layout.children:
+                yield from self._tile_layouts(child)
+
 
 class HBoxLayout(Layout):
 
@@ -108,24 +179,50 @@ class HBoxLayout(Layout):
 
         self.children: List[Layout] = []
 
+        # bottom of each child, used to find the children in a
+        # rectangle without looking at all of them
+        self._child_bottoms: List[int] = []
+
     def add(self, child: Layout) -> None:
         self.children.append(child)
         child.parent = self
 
+    def insert(self, idx: int, child: Layout) -> None:
+        self.children.insert(idx, child)
+        child.parent = self
+
+    def remove(self, child: Layout) -> None:
+        self.children.remove(child)
+        child.parent = None
+
     def layout(self, viewport_width: int, viewport_height: int) -> None:
         super().layout(viewport_width, viewport_height)
 
+        self._child_bottoms = []
         y = 0
         for child in self.children:
             child.set_pos(0, self.y + y)
             child.layout(viewport_width, viewport_height)
             y += child.height
+            self._child_bottoms.append(self.y + y)
 
         self.height = y
 
     def resize(self, width: int, height: int) -> None:
         self.layout(width, height)
 
+    def get_fileinfos_in_rect(self, rect: Optional[QRectF]) -> Iterator[Tuple['FileInfo', int, int]]:
+        if rect is None:
+            for child in self.children:
+                yield from child.get_fileinfos_in_rect(rect)
+        else:
+            start = bisect.bisect_right(self._child_bottoms, rect.top())
+            for idx in range(start, len(self.children)):
+                child = self.children[idx]
+                if child.y >= rect.bottom():
+                    break
+                yield from child.get_fileinfos_in_rect(rect)
+
 
 class ItemLayout(Layout):
     """Layout used to hold a QGraphicsItem, e.g. the text title of a
@@ -187,6 +284,9 @@ class TileStyle:
 
 
 class TileLayout(Layout):
+    """A grid of equally sized tiles. The position of a tile is a pure
+    function of its index, so nothing is stored per tile except the
+    FileInfo itself."""
 
     def __init__(self, style: TileStyle, group: bool) -> None:
         super().__init__()
@@ -194,48 +294,32 @@ class TileLayout(Layout):
         self.style = style
         self.group = group
 
-        self.items: List[QGraphicsItem] = []
+        self.fileinfos: List['FileInfo'] = []
 
         self.rows = 0
-        self.columns = 0
+        self.columns = 1
 
-        self.next_col = 0
-        self.next_row = 0
+        # number of rows that fit into the viewport
+        self.viewport_rows = 1
 
         self.center_x_off = 0
 
-    def set_items(self, items: List[QGraphicsItem]) -> None:
-        self.items = items
-
-    def append_item(self, item: QGraphicsItem) -> None:
-        self.items.append(item)
-
-        col = self.next_col
-        row = self.next_row
+    def set_fileinfos(self, fileinfos: List['FileInfo']) -> None:
+        self.fileinfos = fileinfos
 
-        x = col * (self.style.tile_width + self.style.spacing_x) + self.style.padding_x
-        y = row * (self.style.tile_height + self.style.spacing_y) + self.style.padding_y
+    def insert_fileinfo(self, idx: int, fileinfo: 'FileInfo') -> None:
+        # the tiles after 'idx' move implicitly, as their position is
+        # derived from their index
+        self.fileinfos.insert(idx, fileinfo)
+        self._update_rows()
 
-        item.setPos(self.x + x + self.center_x_off,
-                    self.y + y)
-
-        bottom_y = y + self.style.tile_height + self.style.padding_y
-
-        # calculate next items position
-        if self.style.arrangement == TileStyle.Arrangement.ROWS:
-            col += 1
-            if col == self.columns:
-                col = 0
-                row += 1
+    def remove_fileinfos(self, fileinfos: Set['FileInfo']) -> None:
+        if len(fileinfos) == 1:
+            del self.fileinfos[self.fileinfos.index(next(iter(fileinfos)))]
         else:
-            row += 1
-            if row == self.rows:
-                row = 0
-                col += 1
-
-        self.next_col = col
-        self.next_row = row
-        self.height = bottom_y
+            # a single pass instead of shifting the list once per file
+            self.fileinfos = [fi for fi in self.fileinfos if fi not in fileinfos]
+        self._update_rows()
 
     def _calc_num_columns(self, viewport_width: int) -> int:
         return max(1,
@@ -251,6 +335,24 @@ class TileLayout(Layout):
         return ((columns * (self.style.tile_width + self.style.spacing_x)) -
                 self.style.spacing_x + 2 * self.style.padding_x)
 
+    def _update_rows(self) -> None:
+        count = len(self.fileinfos)
+
+        self.rows = self.viewport_rows
+        if count > (self.columns * self.rows) or self.group:
+            self.rows = math.ceil(count / self.columns)
+
+        if count == 0:
+            self.height = 0
+        else:
+            if self.style.arrangement == TileStyle.Arrangement.ROWS:
+                used_rows = math.ceil(count / self.columns)
+            else:
+                used_rows = min(count, self.rows)
+
+            self.height = (used_rows * (self.style.tile_height + self.style.spacing_y) -
+                           self.style.spacing_y + 2 * self.style.padding_y)
+
     def set_pos(self, x: int, y: int) -> None:
         super().set_pos(x, y)
 
@@ -258,46 +360,67 @@ class TileLayout(Layout):
     def layout(self, viewport_width: int, viewport_height: int) -> None:
         super().layout(viewport_width, viewport_height)
 
-        new_columns = self._calc_num_columns(viewport_width)
-        grid_width = self._calc_grid_width(new_columns)
+        self.columns = self._calc_num_columns(viewport_width)
+        grid_width = self._calc_grid_width(self.columns)
 
         self.center_x_off = (viewport_width - grid_width) // 2
-        self.columns = new_columns
-        self.rows = self._calc_num_rows(viewport_height)
+        self.viewport_rows = self._calc_num_rows(viewport_height)
 
-        if len(self.items) > (self.columns * self.rows) or self.group:
-            self.rows = math.ceil(len(self.items) / self.columns)
+        self._update_rows()
 
-        bottom_y = 0
-        right_x = 0
-        col = 0
-        row = 0
-        for item in self.items:
-            # insert new item at the current position
-            x = col * (self.style.tile_width + self.style.spacing_x) + self.style.padding_x
-            y = row * (self.style.tile_height + self.style.spacing_y) + self.style.padding_y
-
-            item.setPos(self.x + x + self.center_x_off,
-                        self.y + y)
-
-            right_x = max(right_x, x + self.style.tile_width + self.style.padding_x)
-            bottom_y = max(bottom_y, y + self.style.tile_height + self.style.padding_y)
+    def _index2cell(self, idx: int) -> Tuple[int, int]:
+        if self.style.arrangement == TileStyle.Arrangement.ROWS:
+            return (idx % self.columns, idx // self.columns)
+        else:
+            return (idx // self.rows, idx % self.rows)
 
-            # calculate next items position
-            if self.style.arrangement == TileStyle.Arrangement.ROWS:
-                col += 1
-                if col == self.columns:
-                    col = 0
-                    row += 1
-            else:
-                row += 1
-                if row == self.rows:
-                    row = 0
-                    col += 1
-
-        self.next_row = row
-        self.next_col = col
-        self.height = bottom_y
+    def _cell2index(self, col: int, row: int) -> int:
+        if self.style.arrangement == TileStyle.Arrangement.ROWS:
+            return row * self.columns + col
+        else:
+            return col * self.rows + row
+
+    def get_tile_pos(self, idx: int) -> Tuple[int, int]:
+        col, row = self._index2cell(idx)
+        return (self.x + self.center_x_off + self.style.padding_x +
+                col * (self.style.tile_width + self.style.spacing_x),
+                self.y + self.style.padding_y +
+                row * (self.style.tile_height + self.style.spacing_y))
+
+    def get_fileinfos_in_rect(self, rect: Optional[QRectF]) -> Iterator[Tuple['FileInfo', int, int]]:
+        count = len(self.fileinfos)
+        if count == 0:
+            return
+
+        if rect is None:
+            for idx, fileinfo in enumerate(self.fileinfos):
+                x, y = self.get_tile_pos(idx)
+                yield (fileinfo, x, y)
+            return
+
+        step_x = self.style.tile_width + self.style.spacing_x
+        step_y = self.style.tile_height + self.style.spacing_y
+
+        left = rect.left() - self.x - self.center_x_off - self.style.padding_x
+        right = rect.right() - self.x - self.center_x_off - self.style.padding_x
+        top = rect.top() - self.y - self.style.padding_y
+        bottom = rect.bottom() - self.y - self.style.padding_y
+
+        # a tile intersects when it starts before the end of the
+        # rectangle and ends after the start of it
+        first_col = max(0, int((left - self.style.tile_width) // step_x) + 1)
+        last_col = min(self.columns if self.style.arrangement == TileStyle.Arrangement.ROWS
+                       else math.ceil(count / self.rows),
+                       math.ceil(right / step_x)) - 1
+        first_row = max(0, int((top - self.style.tile_height) // step_y) + 1)
+        last_row = min(self.rows, math.ceil(bottom / step_y)) - 1
+
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                idx = self._cell2index(col, row)
+                if idx < count:
+                    x, y = self.get_tile_pos(idx)
+                    yield (self.fileinfos[idx], x, y)
 
 
 # EOF #
@@ -15,14 +15,33 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Dict, List, Any, Hashable
+from typing import Any, Callable, Dict, Iterable, List, Hashable, Optional, Tuple
 
 from PyQt5.QtGui import QFont
-from PyQt5.QtWidgets import QGraphicsItem
 
-from dirtools.fileview.layout import RootLayout, HBoxLayout, TileLayout, ItemLayout, VSpacer
+from dirtools.fileview.grouper import compare_groups
+from dirtools.fileview.layout import Layout, RootLayout, HBoxLayout, TileLayout, ItemLayout, VSpacer
 from dirtools.fileview.file_info import FileInfo
 from dirtools.fileview.file_item import FileItem
+from dirtools.fileview.location import Location
+
+
+def bisect_fileinfos(fileinfos: List[FileInfo], fileinfo: FileInfo,
+                     key_func: Callable[[FileInfo], Any], reverse: bool) -> int:
+    """Find the index at which 'fileinfo' has to be inserted to keep
+    'fileinfos' sorted."""
+
+    key = key_func(fileinfo)
+    lo = 0
+    hi = len(fileinfos)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        mid_key = key_func(fileinfos[mid])
+        if (mid_key < key) if reverse else (key < mid_key):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
 
 
 class LayoutBuilder:
@@ -32,13 +51,30 @@ class LayoutBuilder:
         self._style = style
         self._show_filtered = False
 
-    def _group_items(self, items):
-        groups: Dict[Hashable, List[FileInfo]] = {}
-        for item in items:
-            if item.fileinfo.group not in groups:
-                groups[item.fileinfo.group] = []
-            groups[item.fileinfo.group].append(item)
-        return groups
+        self._hbox: Optional[HBoxLayout] = None
+        self._incoming_title: Optional[ItemLayout] = None
+
+        # True when the layout shows more than one group, each with
+        # a title and the "Incoming" grid at the end
+        self._grouped = False
+
+        # The groups in the last build in display order, each group
+        # has a section of layouts in the HBoxLayout (spacer, title,
+        # grid) that can be inserted or removed without touching the
+        # other groups.
+        self._groups: List[Hashable] = []
+        self._group2section: Dict[Hashable, List[Layout]] = {}
+        self._group2grid: Dict[Hashable, TileLayout] = {}
+        self._grid2group: Dict[TileLayout, Hashable] = {}
+
+    def set_show_filtered(self, show_filtered: bool) -> None:
+        self._show_filtered = show_filtered
+
+    def _is_visible(self, fileinfo: FileInfo) -> bool:
+        if self._show_filtered:
+            return not fileinfo.is_hidden
+        else:
+            return fileinfo.is_visible
 
     def _build_group_title(self, title: str) -> ItemLayout:
         text_item = self._scene.addText(title, QFont("Verdana", 12))
@@ -46,67 +82,74 @@ class LayoutBuilder:
         group_title.set_item(text_item)
         return group_title
 
-    def _build_tile_grid(self, items: List[QGraphicsItem], group) -> TileLayout:
+    def _build_tile_grid(self, fileinfos: List[FileInfo], group) -> TileLayout:
         tile_layout = TileLayout(self._style, group=group)
-        tile_layout.set_items(items)
+        tile_layout.set_fileinfos(fileinfos)
         return tile_layout
 
+    def _build_section(self, group: Hashable, fileinfos: List[FileInfo], first: bool) -> List[Layout]:
+        section: List[Layout] = []
+
+        if not first:
+            section.append(VSpacer(48))
+
+        if group is not None:
+            section.append(self._build_group_title(str(group)))
+
+        grid = self._build_tile_grid(fileinfos, self._grouped)
+        section.append(grid)
+
+        self._group2section[group] = section
+        self._group2grid[group] = grid
+        self._grid2group[grid] = group
+
+        return section
+
     def cleanup(self):
         # FileItem's are recycled between layouts
         for item in self._scene.items():
             if not isinstance(item, FileItem):
                 self._scene.removeItem(item)
 
-    def build_layout(self, items: List[Any]) -> RootLayout:
+    def build_layout(self, groups: Iterable[Tuple[Hashable, Iterable[FileInfo]]]) -> RootLayout:
+        """Build the layout for 'groups', which are expected in display
+        order, see FileCollection.get_groups()."""
+
         self.cleanup()
 
         hbox = HBoxLayout()
+        self._hbox = hbox
+        self._incoming_title = None
 
-        groups = self._group_items(items)
-
-        if None in groups:
-            first_group = (None, groups[None])
-            del groups[None]
-        else:
-            first_group = None
+        visible_groups = []
+        for group, fileinfos in groups:
+            visible_fileinfos = [fi for fi in fileinfos if self._is_visible(fi)]
+            if visible_fileinfos:
+                visible_groups.append((group, visible_fileinfos))
 
-        sorted_groups = sorted(groups.items(),
-                               key=lambda x: x[0],
-                               reverse=True)
-
-        if first_group is not None:
-            sorted_groups = [first_group] + sorted_groups
+        self._grouped = len(visible_groups) > 1
+        self._groups = []
+        self._group2section = {}
+        self._group2grid = {}
+        self._grid2group = {}
 
         grid = None
-        for idx, (group, items) in enumerate(sorted_groups):
-            if self._show_filtered:
-                visible_items = [item for item in items if not item.fileinfo.is_hidden]
-            else:
-                visible_items = [item for item in items if item.fileinfo.is_visible]
+        for group, visible_fileinfos in visible_groups:
+            for child in self._build_section(group, visible_fileinfos, first=not self._groups):
+                hbox.add(child)
+            self._groups.append(group)
+            grid = self._group2grid[group]
 
-            if visible_items == []:
-                continue
-
-            if group is not None:
-                title = self._build_group_title(str(group))
-                hbox.add(title)
-
-            grid = self._build_tile_grid(visible_items, len(sorted_groups) > 1)
-
-            hbox.add(grid)
-
-            if idx + 1 != len(sorted_groups):
-                spacer = VSpacer(48)
-                hbox.add(spacer)
-
-        if len(sorted_groups) <= 1:
+        if not self._grouped:
             if grid is None:
                 append_layout = TileLayout(self._style, group=False)
                 hbox.add(append_layout)
+                self._group2grid[None] = append_layout
             else:
                 append_layout = grid
         else:
-            hbox.add(self._build_group_title("Incoming"))
+            self._incoming_title = self._build_group_title("Incoming")
+            hbox.add(self._incoming_title)
             append_layout = TileLayout(self._style, group=True)
             hbox.add(append_layout)
 
@@ -115,5 +158,105 @@ class LayoutBuilder:
         root.set_append_layout(append_layout)
         return root
 
+    def _group_index(self, group: Hashable) -> int:
+        """Find the index at which 'group' has to be inserted to keep
+        the groups in display order."""
+
+        lo = 0
+        hi = len(self._groups)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if compare_groups(group, self._groups[mid]) < 0:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _add_section(self, group: Hashable) -> TileLayout:
+        assert self._hbox is not None
+        assert self._incoming_title is not None
+
+        idx = self._group_index(group)
+
+        if idx == 0 and self._groups:
+            # the previous first group needs a spacer now
+            spacer = VSpacer(48)
+            old_first = self._group2section[self._groups[0]]
+            self._hbox.insert(self._hbox.children.index(old_first[0]), spacer)
+            old_first.insert(0, spacer)
+
+        if idx < len(self._groups):
+            pos = self._hbox.children.index(self._group2section[self._groups[idx]][0])
+        else:
+            pos = self._hbox.children.index(self._incoming_title)
+
+        section = self._build_section(group, [], first=(idx == 0))
+        for child in reversed(section):
+            self._hbox.insert(pos, child)
+        self._groups.insert(idx, group)
+
+        return self._group2grid[group]
+
+    def _remove_section(self, group: Hashable) -> None:
+        assert self._hbox is not None
+
+        idx = self._groups.index(group)
+        del self._groups[idx]
+        section = self._group2section.pop(group)
+        grid = self._group2grid.pop(group)
+        del self._grid2group[grid]
+
+        if idx == 0 and self._groups:
+            # the new first group doesn't need a spacer
+            new_first = self._group2section[self._groups[0]]
+            self._hbox.remove(new_first.pop(0))
+
+        for child in section:
+            self._hbox.remove(child)
+            if isinstance(child, ItemLayout) and child.item is not None:
+                self._scene.removeItem(child.item)
+
+    def insert_fileinfos(self, root: RootLayout, fileinfos: Iterable[FileInfo],
+                         key_func: Callable[[FileInfo], Any], reverse: bool) -> bool:
+        """Insert the files into the grid of their group at their sort
+        position, a group that is new to the layout gets added in
+        place. Returns False when the layout has to be rebuilt, as it
+        goes from one group to multiple."""
+
+        for fi in fileinfos:
+            if not self._is_visible(fi):
+                continue
+
+            grid = self._group2grid.get(fi.group)
+            if grid is None:
+                if not self._grouped:
+                    return False
+                grid = self._add_section(fi.group)
+
+            idx = bisect_fileinfos(grid.fileinfos, fi, key_func, reverse)
+            root.insert_fileinfo(grid, idx, fi, relayout=False)
+
+        root.relayout()
+        return True
+
+    def remove_locations(self, root: RootLayout, locations: Iterable[Location]) -> bool:
+        """Remove the files from the layout, groups that became empty are
+        removed along with their title. Returns False when the layout
+        has to be rebuilt, as only a single group is left."""
+
+        grids = root.remove_locations(locations)
+
+        for grid in grids:
+            if grid.fileinfos or grid is root.append_layout:
+                continue
+
+            if len(self._groups) <= 2:
+                return False
+
+            self._remove_section(self._grid2group[grid])
+
+        root.relayout()
+        return True
+
 
 # EOF #
@@ -36,6 +36,16 @@ class LazyFileInfo:
         fi = LazyFileInfo(path)
         return fi
 
+    @staticmethod
+    def from_direntry(entry: os.DirEntry) -> 'LazyFileInfo':
+        """Takes the file type and stat() from 'entry', which caches
+        them, so a later FileInfo.from_direntry() doesn't have to stat
+        the file again."""
+
+        fi = LazyFileInfo(entry.path)
+        fi._direntry = entry
+        return fi
+
     def __init__(self, path) -> None:
         self._abspath: str = os.path.abspath(path)
 
@@ -55,9 +65,14 @@ class LazyFileInfo:
 
         self._metadata: Optional[Dict[str, Any]] = None
 
+        self._direntry: Optional[os.DirEntry] = None
+
     def _collect_stat(self) -> None:
         if self._stat is None:
-            self._stat = os.lstat(self._abspath)
+            if self._direntry is not None:
+                self._stat = self._direntry.stat(follow_symlinks=False)
+            else:
+                self._stat = os.lstat(self._abspath)
             self._have_access = os.access(self._abspath, os.R_OK)
 
     def have_access(self) -> bool:
@@ -80,7 +95,10 @@ class LazyFileInfo:
         return self._basename
 
     def isdir(self) -> bool:
-        return os.path.isdir(self._abspath)
+        if self._direntry is not None:
+            return self._direntry.is_dir()
+        else:
+            return os.path.isdir(self._abspath)
 
     def isfile(self) -> bool:
         self._collect_stat()
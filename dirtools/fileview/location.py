@@ -15,8 +15,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import List, NamedTuple, Optional, Tuple
+from typing import Iterable, List, NamedTuple, Optional, Tuple
 
+import sys
 import urllib.parse
 import logging
 import os
@@ -41,26 +42,31 @@ class Payload(NamedTuple):
 
 @total_ordering
 class Location:
+    """An immutable URL-like reference to a file, possibly inside an
+    archive. Locations are used as dict keys all over the place, so
+    the hash and the URL are computed once and cached, all the
+    methods that 'modify' a Location return a new one."""
+
+    __slots__ = ["_protocol", "_path", "_payloads", "_hash", "_url", "_parent"]
 
     @staticmethod
     def join(location: 'Location', path: str) -> 'Location':
         if len(location._payloads) == 0:
-            result = location.copy()
-            result._path = os.path.join(result._path, path)
-            return result
+            return Location(location._protocol, os.path.join(location._path, path), ())
         else:
-            result = location.copy()
-            result._payloads[-1] = Payload(result._payloads[-1].protocol,
-                                           os.path.join(result._payloads[-1].path, path))
-            return result
+            last = location._payloads[-1]
+            return Location(location._protocol, location._path,
+                            location._payloads[:-1] + (Payload(last.protocol, os.path.join(last.path, path)),))
 
     @staticmethod
     def from_search_query(path: str, query: str) -> 'Location':
-        return Location("search", path, [Payload("query", query)])
+        return Location("search", path, (Payload("query", query),))
 
     @staticmethod
     def from_path(path: str) -> 'Location':
-        return Location.from_url("file://" + os.path.abspath(path))
+        # os.path.abspath() already normalizes the path, so there is
+        # nothing left for .from_url() to parse
+        return Location("file", os.path.abspath(path), ())
 
     @staticmethod
     def from_human(path: str) -> 'Location':
@@ -88,47 +94,85 @@ class Location:
 
             abspath = os.path.normpath(abspath)
 
-            payloads: List[Payload] = []
+            payloads = []
             for payload_spec in payload_specs:
                 payload = payload_spec.split(":", 1)
                 if len(payload) == 1:
-                    payloads.append(Payload(payload[0], ""))
+                    payloads.append(Payload(sys.intern(payload[0]), ""))
                 else:
-                    payloads.append(Payload(payload[0], payload[1]))
+                    payloads.append(Payload(sys.intern(payload[0]), payload[1]))
 
-            return Location(protocol, abspath, payloads)
+            return Location(sys.intern(protocol), abspath, payloads)
 
-    def __init__(self, protocol: str, abspath: str, payloads: List[Payload]) -> None:
+    def __init__(self, protocol: str, abspath: str, payloads: Iterable[Payload]) -> None:
         assert os.path.isabs(abspath)
 
         self._protocol: str = protocol
         self._path: str = abspath
-        self._payloads: List[Payload] = payloads
+        self._payloads: Tuple[Payload, ...] = payloads if type(payloads) is tuple else tuple(payloads)
+
+        # caches, filled on first use
+        self._hash: Optional[int] = None
+        self._url: Optional[str] = None
+
+        # Locations created with .child() share the parent object,
+        # so all the entries of a directory point to the same parent
+        self._parent: Optional[Location] = None
+
+    def child(self, name: str) -> 'Location':
+        """Cheap variant of Location.join() for a single filename as
+        returned by os.scandir() or inotify, 'name' must not contain
+        a '/'."""
+
+        if not self._payloads:
+            if self._path == "/":
+                result = Location(self._protocol, "/" + name, ())
+            else:
+                result = Location(self._protocol, self._path + "/" + name, ())
+        else:
+            last = self._payloads[-1]
+            result = Location(self._protocol, self._path,
+                              self._payloads[:-1] +
+                              (Payload(last.protocol, last.path + "/" + name if last.path else name),))
+
+        result._parent = self
+        return result
+
+    def with_payload(self, payload: Payload) -> 'Location':
+        """Returns a Location with 'payload' appended, e.g. to look
+        inside an archive."""
+
+        return Location(self._protocol, self._path, self._payloads + (payload,))
 
     def has_payload(self) -> bool:
-        return self._payloads != []
+        return self._payloads != ()
 
     def parent(self) -> 'Location':
         """The parent directory. Archives are threated like directories as well."""
 
-        if self._payloads == [] or (len(self._payloads) == 1 and self._payloads[0].path == ""):
+        if self._parent is None:
+            self._parent = self._make_parent()
+
+        return self._parent
+
+    def _make_parent(self) -> 'Location':
+        if self._payloads == () or (len(self._payloads) == 1 and self._payloads[0].path == ""):
             path = os.path.dirname(self._path)
-            return Location(self._protocol, path, [])
+            return Location(self._protocol, path, ())
         else:
             path = os.path.dirname(self._payloads[-1].path)
             if path == self._payloads[-1].path:  # path is ""
-                payloads = self._payloads[:-1]
-                payloads[-1] = Payload(payloads[-1].protocol,
-                                       os.path.dirname(payloads[-1].path))
+                payloads = self._payloads[:-2] + (Payload(self._payloads[-2].protocol,
+                                                          os.path.dirname(self._payloads[-2].path)),)
                 return Location(self._protocol, self._path, payloads)
             else:
-                payloads = self._payloads[:-1] + [Payload(self._payloads[-1].protocol, path)]
+                payloads = self._payloads[:-1] + (Payload(self._payloads[-1].protocol, path),)
                 return Location(self._protocol, self._path, payloads)
 
     def basename(self) -> str:
         """Returns the last element in the URL."""
 
-        if self._payloads == []:
+        if self._payloads == ():
             return os.path.basename(self._path)
         elif len(self._payloads) == 1 and self._payloads[-1].path == "":
             return "{}//{}".format(os.path.basename(self._path),
@@ -161,31 +205,30 @@ class Location:
         pointing to inside an archive, this would return the location
         of the archive itself."""
 
-        if self._payloads == []:
+        if self._payloads == ():
             return None
         else:
-            location = self.copy()
-            location._payloads.pop()
-            return location
+            return Location(self._protocol, self._path, self._payloads[:-1])
 
     def pure(self) -> 'Location':
         """Returns Location with the last payload stripped if the payload path
         is empty, i.e. strip the '//archive' part if it exist."""
 
-        if self._payloads == [] or self._payloads[-1].path != "":
-            return self.copy()
+        if self._payloads == () or self._payloads[-1].path != "":
+            return self
         else:
-            location = self.copy()
-            location._payloads.pop()
-            return location
+            return Location(self._protocol, self._path, self._payloads[:-1])
 
     def as_url(self) -> str:
-        payload_text = "".join(["//{}{}".format(prot, (":" + urllib.parse.quote(path)) if path else "")
-                                for prot, path in self._payloads])
-        return ("{}://{}{}".format(
-            self._protocol,
-            urllib.parse.quote(self._path),
-            payload_text))
+        if self._url is None:
+            payload_text = "".join(["//{}{}".format(prot, (":" + urllib.parse.quote(path)) if path else "")
+                                    for prot, path in self._payloads])
+            self._url = "{}://{}{}".format(
+                self._protocol,
+                urllib.parse.quote(self._path),
+                payload_text)
+
+        return self._url
 
     def as_path(self) -> str:
         """Like .as_url() but without the protocol part. Only use this for
@@ -211,7 +254,8 @@ class Location:
             return os.path.exists(self._path)
 
     def copy(self) -> 'Location':
-        return Location(self._protocol, self._path, list(self._payloads))
+        # Location is immutable, so there is no need for a real copy
+        return self
 
     def protocol(self) -> str:
         return self._protocol
@@ -228,8 +272,15 @@ class Location:
         return self.get_path()
 
     def __eq__(self, other: object) -> bool:
-        if isinstance(other, Location):
-            return (self._protocol, self._path, self._payloads) == (other._protocol, other._path, other._payloads)
+        if self is other:
+            return True
+        elif isinstance(other, Location):
+            if self._hash is not None and other._hash is not None and self._hash != other._hash:
+                return False
+            else:
+                return (self._path == other._path and
+                        self._protocol == other._protocol and
+                        self._payloads == other._payloads)
         else:
             return False
 
@@ -248,9 +299,11 @@ class Location:
         # tuple (_payloads as list): 0.9
         # tuple (_payloads as tuple): 0.6
         # self.path: 0.45
-        return hash((self._protocol, self._path, tuple(self._payloads)))
-        # return hash(self.as_url())
-        # return hash(self._path)
+        # cached: 0.1
+        # see experiments/location_perf/ for more
+        if self._hash is None:
+            self._hash = hash((self._protocol, self._path, self._payloads))
+        return self._hash
 
     def __str__(self) -> str:
         return self.as_url()
@@ -15,15 +15,17 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import TYPE_CHECKING, Callable, Any
+from typing import TYPE_CHECKING, Callable, Optional, Any
 
 import logging
+import operator
 import random
 import re
 from fnmatch import fnmatchcase
 from datetime import datetime
 
 from dirtools.fuzzy import fuzzy
+from dirtools.util import is_glob_pattern
 
 if TYPE_CHECKING:
     from dirtools.fileview.file_info import FileInfo  # noqa: F401
@@ -34,6 +36,54 @@ logger = logging.getLogger(__name__)
 CompareCallable = Callable[[Any, Any], bool]
 
 
+# (compare, other_compare) -> test for (value, other_value), that is
+# True when 'compare(x, value)' implies 'other_compare(x, other_value)'
+TIGHTENED_COMPARE = {
+    (operator.eq, operator.eq): operator.eq,
+    (operator.eq, operator.gt): operator.gt,
+    (operator.eq, operator.ge): operator.ge,
+    (operator.eq, operator.lt): operator.lt,
+    (operator.eq, operator.le): operator.le,
+    (operator.gt, operator.gt): operator.ge,
+    (operator.gt, operator.ge): operator.ge,
+    (operator.ge, operator.gt): operator.gt,
+    (operator.ge, operator.ge): operator.ge,
+    (operator.lt, operator.lt): operator.le,
+    (operator.lt, operator.le): operator.le,
+    (operator.le, operator.lt): operator.lt,
+    (operator.le, operator.le): operator.le,
+}
+
+
+def is_tightened_compare(compare: CompareCallable, value: Any,
+                         other_compare: CompareCallable, other_value: Any) -> bool:
+    test = TIGHTENED_COMPARE.get((compare, other_compare))
+    return test is not None and test(value, other_value)
+
+
+def match_func_implies(lhs: Optional['MatchFunc'], rhs: Optional['MatchFunc']) -> bool:
+    """Returns True when every file matched by 'lhs' is also matched
+    by 'rhs', i.e. 'lhs' is a refinement of 'rhs'. None matches
+    everything. The check is conservative, False means 'don't know'."""
+
+    if rhs is None or isinstance(rhs, TrueMatchFunc):
+        return True
+    elif lhs is None:
+        return False
+    elif isinstance(lhs, FalseMatchFunc):
+        return True
+    elif isinstance(lhs, OrMatchFunc):
+        return all(match_func_implies(func, rhs) for func in lhs._funcs)
+    elif isinstance(rhs, AndMatchFunc):
+        return all(match_func_implies(lhs, func) for func in rhs._funcs)
+    elif isinstance(lhs, AndMatchFunc):
+        return any(match_func_implies(func, rhs) for func in lhs._funcs)
+    elif isinstance(rhs, OrMatchFunc):
+        return any(match_func_implies(lhs, func) for func in rhs._funcs)
+    else:
+        return lhs.implies(rhs)
+
+
 class MatchFunc:
 
     def __call__(self, fileinfo: 'FileInfo') -> bool:
@@ -42,6 +92,12 @@ class MatchFunc:
     def cost(self) -> float:
         return 1
 
+    def implies(self, other: 'MatchFunc') -> bool:
+        """Single function version of match_func_implies(), 'other'
+        is neither an AndMatchFunc nor an OrMatchFunc."""
+
+        return False
+
 
 class FalseMatchFunc(MatchFunc):
 
@@ -87,6 +143,9 @@ class ExcludeMatchFunc(MatchFunc):
     def __call__(self, fileinfo: 'FileInfo') -> bool:
         return not self._func(fileinfo)
 
+    def implies(self, other: MatchFunc) -> bool:
+        return isinstance(other, ExcludeMatchFunc) and match_func_implies(other._func, self._func)
+
 
 class FolderMatchFunc(MatchFunc):
 
@@ -96,6 +155,9 @@ class FolderMatchFunc(MatchFunc):
     def __call__(self, fileinfo: 'FileInfo') -> bool:
         return fileinfo.isdir()
 
+    def implies(self, other: MatchFunc) -> bool:
+        return isinstance(other, FolderMatchFunc)
+
 
 class GlobMatchFunc(MatchFunc):
 
@@ -113,6 +175,25 @@ class GlobMatchFunc(MatchFunc):
             filename = fileinfo.basename().lower()
             return fnmatchcase(filename, self.pattern)
 
+    def substring(self) -> Optional[str]:
+        """Returns X when the pattern is a plain '*X*' substring search."""
+
+        if len(self.pattern) >= 2 and self.pattern[0] == "*" and self.pattern[-1] == "*":
+            needle: str = self.pattern[1:-1]
+            if not is_glob_pattern(needle):
+                return needle
+        return None
+
+    def implies(self, other: MatchFunc) -> bool:
+        if not isinstance(other, GlobMatchFunc) or self.case_sensitive != other.case_sensitive:
+            return False
+        elif self.pattern == other.pattern:
+            return True
+        else:
+            needle = self.substring()
+            other_needle = other.substring()
+            return needle is not None and other_needle is not None and other_needle in needle
+
 
 class RegexMatchFunc(MatchFunc):
 
@@ -122,6 +203,9 @@ class RegexMatchFunc(MatchFunc):
     def __call__(self, fileinfo: 'FileInfo') -> bool:
         return bool(self.rx.search(fileinfo.basename()))
 
+    def implies(self, other: MatchFunc) -> bool:
+        return isinstance(other, RegexMatchFunc) and self.rx == other.rx
+
 
 class FuzzyMatchFunc(MatchFunc):
 
@@ -144,6 +228,10 @@ class SizeMatchFunc(MatchFunc):
     def __call__(self, fileinfo: 'FileInfo') -> bool:
         return self.compare(fileinfo.size(), self.size)
 
+    def implies(self, other: MatchFunc) -> bool:
+        return (isinstance(other, SizeMatchFunc) and
+                is_tightened_compare(self.compare, self.size, other.compare, other.size))
+
 
 class MetadataMatchFunc(MatchFunc):
 
@@ -167,6 +255,12 @@ class MetadataMatchFunc(MatchFunc):
     def cost(self) -> float:
         return 50
 
+    def implies(self, other: MatchFunc) -> bool:
+        return (isinstance(other, MetadataMatchFunc) and
+                self._field == other._field and
+                self._type == other._type and
+                is_tightened_compare(self._compare, self._value, other._compare, other._value))
+
 
 class LengthMatchFunc(MatchFunc):
 
@@ -177,6 +271,10 @@ class LengthMatchFunc(MatchFunc):
     def __call__(self, fileinfo: 'FileInfo') -> bool:
         return self.compare(len(fileinfo.basename()), self.length)
 
+    def implies(self, other: MatchFunc) -> bool:
+        return (isinstance(other, LengthMatchFunc) and
+                is_tightened_compare(self.compare, self.length, other.compare, other.length))
+
 
 class RandomMatchFunc(MatchFunc):
 
@@ -226,6 +324,9 @@ class CharsetMatchFunc(MatchFunc):
         else:
             return True
 
+    def implies(self, other: MatchFunc) -> bool:
+        return isinstance(other, CharsetMatchFunc) and self._charset == other._charset
+
 
 class DateMatchFunc(MatchFunc):
 
@@ -342,9 +443,14 @@ class WeekdayMatchFunc(MatchFunc):
 
 class ContainsMatchFunc(MatchFunc):
 
-    def __init__(self, line_match_func) -> None:
+    def __init__(self, line_match_func, substring: Optional[str] = None, case_sensitive: bool = False) -> None:
         self._line_match_func = line_match_func
 
+        # set when 'line_match_func' is a plain substring search, only
+        # used to detect refinements
+        self._substring = substring
+        self._case_sensitive = case_sensitive
+
     def __call__(self, fileinfo: 'FileInfo') -> bool:
         location = fileinfo.location()
 
@@ -363,5 +469,11 @@ class ContainsMatchFunc(MatchFunc):
     def cost(self) -> float:
         return 100
 
+    def implies(self, other: MatchFunc) -> bool:
+        return (isinstance(other, ContainsMatchFunc) and
+                self._substring is not None and other._substring is not None and
+                self._case_sensitive == other._case_sensitive and
+                other._substring in self._substring)
+
 
 # EOF #
@@ -424,7 +424,7 @@ class MatchFuncFactory:
         def line_match_func(line, needle=needle):
             return needle in line.lower()
 
-        return ContainsMatchFunc(line_match_func)
+        return ContainsMatchFunc(line_match_func, needle, case_sensitive=False)
 
     def make_Contains(self, argument):
         needle = argument
@@ -432,7 +432,7 @@ class MatchFuncFactory:
         def line_match_func(line, needle=needle):
             return needle in line
 
-        return ContainsMatchFunc(line_match_func)
+        return ContainsMatchFunc(line_match_func, needle, case_sensitive=True)
 
     def make_contains_regex(self, argument):
         rx = re.compile(argument, re.IGNORECASE)
@@ -15,13 +15,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, cast
 
 import traceback
 import logging
 import os
 
-from PyQt5.QtCore import QObject, pyqtSignal, QThread
+from PyQt5.QtCore import QObject, pyqtSignal, QThread, QTimer
 from PyQt5.QtCore import QMimeDatabase
 
 from dirtools.fileview.metadata_cache import MetaDataCache
@@ -42,10 +42,19 @@ class MetaDataCollectorWorker(QObject):
         self.vfs = vfs
         self._close = False
 
+        # files whose metadata is collected ahead of time by owner,
+        # one per event loop iteration so that real requests don't
+        # have to wait for the whole list
+        self._prefetch_queues: Dict[object, List[Location]] = {}
+
     def init(self):
         self.mimedb = QMimeDatabase()
         self.cache = MetaDataCache()
 
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setInterval(0)
+        self._prefetch_timer.timeout.connect(self._prefetch_next)
+
     def on_delete_metadata_requested(self, locations: List[Location]) -> None:
         for location in locations:
             abspath = self.vfs.get_stdio_name(location)
@@ -55,6 +64,34 @@ class MetaDataCollectorWorker(QObject):
         if self._close:
             return
 
+        self.sig_metadata_ready.emit(location, self._collect_metadata(location))
+
+    def on_prefetch_requested(self, locations: List[Location], owner: object) -> None:
+        """Fill the cache for 'locations' without reporting anything,
+        replaces the previous prefetch request of 'owner'."""
+
+        self._prefetch_queues.pop(owner, None)
+        if locations:
+            self._prefetch_queues[owner] = list(locations)
+            self._prefetch_timer.start()
+        elif not self._prefetch_queues:
+            self._prefetch_timer.stop()
+
+    def _prefetch_next(self) -> None:
+        if self._close or not self._prefetch_queues:
+            self._prefetch_timer.stop()
+            return
+
+        # take turns between the owners
+        owner = next(iter(self._prefetch_queues))
+        queue = self._prefetch_queues.pop(owner)
+        location = queue.pop(0)
+        if queue:
+            self._prefetch_queues[owner] = queue
+
+        self._collect_metadata(location)
+
+    def _collect_metadata(self, location: Location) -> Dict[str, Any]:
         abspath = self.vfs.get_stdio_name(location)
         cached_metadata = self.cache.retrieve_metadata(abspath)
 
@@ -73,12 +110,12 @@ class MetaDataCollectorWorker(QObject):
                 'type': "error",
                 'error_message': error_message
             }
-            self.sig_metadata_ready.emit(location, metadata)
+            return metadata
 
         else:
             if cached_metadata is not None and \
                (("mtime" in cached_metadata) and (stat.st_mtime == cached_metadata["mtime"])):
-                self.sig_metadata_ready.emit(location, cached_metadata)
+                return cast(Dict[str, Any], cached_metadata)
             else:
                 try:
                     metadata.update(self._create_generic_metadata(location, abspath))
@@ -96,7 +133,7 @@ class MetaDataCollectorWorker(QObject):
                     }
 
                 self.cache.store_metadata(abspath, metadata)
-                self.sig_metadata_ready.emit(location, metadata)
+                return metadata
 
     def _create_generic_metadata(self, location: Location, abspath: str) -> Dict[str, Any]:
         metadata: Dict[str, Any] = {}
@@ -118,6 +155,7 @@ class MetaDataCollector(QObject):
 
     sig_metadata_ready = pyqtSignal(Location, dict)
     sig_request_metadata = pyqtSignal(Location)
+    sig_prefetch_metadata = pyqtSignal(list, object)
     sig_delete_metadatas = pyqtSignal(list)
 
     def __init__(self, vfs: StdioFilesystem) -> None:
@@ -129,6 +167,7 @@ class MetaDataCollector(QObject):
 
         self._thread.started.connect(self._worker.init)
         self.sig_request_metadata.connect(self._worker.on_metadata_requested)
+        self.sig_prefetch_metadata.connect(self._worker.on_prefetch_requested)
         self.sig_delete_metadatas.connect(self._worker.on_delete_metadata_requested)
         self._worker.sig_metadata_ready.connect(self._on_metadata_ready)
 
@@ -142,6 +181,12 @@ class MetaDataCollector(QObject):
     def request_metadata(self, location: Location) -> None:
         self.sig_request_metadata.emit(location)
 
+    def prefetch_metadata(self, locations: List[Location], owner: object) -> None:
+        """Collect the metadata of 'locations' into the cache in the
+        background, an empty list cancels the previous prefetch of
+        'owner', those of others are kept."""
+        self.sig_prefetch_metadata.emit(locations, owner)
+
     def request_delete_metadatas(self, locations: List[Location]) -> None:
         self.sig_delete_metadatas.emit(locations)
 
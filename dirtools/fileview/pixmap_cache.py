@@ -0,0 +1,105 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Dict, Optional, Set, Tuple, cast
+
+import logging
+from collections import OrderedDict
+
+from PyQt5.QtGui import QPixmap
+
+from dirtools.fileview.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Default for "globals/pixmap_cache_size" in MiB
+PIXMAP_CACHE_SIZE = 128
+
+
+class PixmapCache:
+    """Keeps recently shown thumbnails around as QPixmap, shared by all
+    windows, so that going back to a directory or opening it a second
+    time doesn't have to load them from disk again. Entries are keyed
+    by the file's mtime, so a modified file misses the cache. The least
+    recently used pixmaps are dropped once they exceed the
+    "globals/pixmap_cache_size" setting."""
+
+    def __init__(self) -> None:
+        self._pixmaps: OrderedDict[Tuple[str, str, int], QPixmap] = OrderedDict()
+        self._size = 0
+
+        # keys of the pixmaps by url, for discard()
+        self._keys: Dict[str, Set[Tuple[str, str, int]]] = {}
+
+    def budget(self) -> int:
+        return cast(int, settings.value("globals/pixmap_cache_size", PIXMAP_CACHE_SIZE, int)) * 1024 * 1024
+
+    def get(self, url: str, flavor: str, mtime: int) -> Optional[QPixmap]:
+        key = (url, flavor, mtime)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def put(self, url: str, flavor: str, mtime: int, pixmap: QPixmap) -> None:
+        key = (url, flavor, mtime)
+        old = self._pixmaps.pop(key, None)
+        if old is not None:
+            self._size -= self._pixmap_size(old)
+
+        self._pixmaps[key] = pixmap
+        self._keys.setdefault(url, set()).add(key)
+        self._size += self._pixmap_size(pixmap)
+        self._shrink()
+
+    def discard(self, url: str, flavor: Optional[str] = None) -> None:
+        """Forget the pixmaps of 'url', all flavors if 'flavor' is None."""
+
+        keys = self._keys.get(url)
+        if keys is None:
+            return
+
+        for key in [key for key in keys if flavor is None or key[1] == flavor]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._pixmaps.clear()
+        self._keys.clear()
+        self._size = 0
+
+    def _remove(self, key: Tuple[str, str, int]) -> None:
+        self._size -= self._pixmap_size(self._pixmaps.pop(key))
+
+        keys = self._keys[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys[key[0]]
+
+    def _pixmap_size(self, pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def _shrink(self) -> None:
+        budget = self.budget()
+        while self._size > budget and self._pixmaps:
+            self._remove(next(iter(self._pixmaps)))
+
+    def __len__(self) -> int:
+        return len(self._pixmaps)
+
+
+# EOF #
@@ -17,9 +17,12 @@
 
 from PyQt5.QtWidgets import (QDialog, QDialogButtonBox, QVBoxLayout,
                              QGroupBox, QCheckBox, QSpinBox, QLabel,
-                             QLineEdit)
+                             QLineEdit, QComboBox)
 
+from dirtools.fileview.directory_cache import DIRECTORY_CACHE_SIZE
+from dirtools.fileview.pixmap_cache import PIXMAP_CACHE_SIZE
 from dirtools.fileview.settings import settings
+from dirtools.filesystem import Durability
 
 
 class PreferencesDialog(QDialog):
@@ -64,6 +67,11 @@ class PreferencesDialog(QDialog):
         checkbox = QCheckBox("Center Icons")
         vbox.addWidget(checkbox)
 
+        checkbox = QCheckBox("Only create items for visible files")
+        checkbox.setChecked(settings.value("globals/virtualize_file_view", True, bool))
+        checkbox.stateChanged.connect(lambda state: settings.set_value("globals/virtualize_file_view", state))
+        vbox.addWidget(checkbox)
+
         label = QLabel("Horizontal Spacing")
         spinbox = QSpinBox()
         vbox.addWidget(label)
@@ -85,6 +93,27 @@ class PreferencesDialog(QDialog):
         vbox.addWidget(label)
         vbox.addWidget(spinbox)
 
+        label = QLabel("Directory Cache Size (MiB, for going back to recently viewed directories)")
+        spinbox = QSpinBox()
+        spinbox.setRange(0, 4096)
+        spinbox.setValue(settings.value("globals/directory_cache_size", DIRECTORY_CACHE_SIZE, int))
+        spinbox.valueChanged.connect(lambda value: settings.set_value("globals/directory_cache_size", value))
+        vbox.addWidget(label)
+        vbox.addWidget(spinbox)
+
+        label = QLabel("Thumbnail Cache Size (MiB, thumbnails kept in memory for all windows)")
+        spinbox = QSpinBox()
+        spinbox.setRange(0, 4096)
+        spinbox.setValue(settings.value("globals/pixmap_cache_size", PIXMAP_CACHE_SIZE, int))
+        spinbox.valueChanged.connect(lambda value: settings.set_value("globals/pixmap_cache_size", value))
+        vbox.addWidget(label)
+        vbox.addWidget(spinbox)
+
+        checkbox = QCheckBox("Generate thumbnails in-process instead of using the D-Bus thumbnailer (needs restart)")
+        checkbox.setChecked(settings.value("globals/local_thumbnailer", False, bool))
+        checkbox.stateChanged.connect(lambda state: settings.set_value("globals/local_thumbnailer", state))
+        vbox.addWidget(checkbox)
+
         label = QLabel("Extraction Cache Directory")
         lineedit = QLineEdit()
         vbox.addWidget(label)
@@ -102,6 +131,28 @@ class PreferencesDialog(QDialog):
         checkbox.stateChanged.connect(lambda state: settings.set_value("globals/close_on_transfer_completed", state))
         vbox.addWidget(checkbox)
 
+        checkbox = QCheckBox("Verify copied files by comparing checksums")
+        checkbox.setChecked(settings.value("globals/verify_transfers", False, bool))
+        checkbox.stateChanged.connect(lambda state: settings.set_value("globals/verify_transfers", state))
+        vbox.addWidget(checkbox)
+
+        checkbox = QCheckBox("Keep copied files out of the page cache (always on for files over 256MiB)")
+        checkbox.setChecked(settings.value("globals/streaming_transfers", False, bool))
+        checkbox.stateChanged.connect(lambda state: settings.set_value("globals/streaming_transfers", state))
+        vbox.addWidget(checkbox)
+
+        label = QLabel("Durability")
+        combobox = QComboBox()
+        combobox.addItem("None: leave writeback to the kernel", Durability.NONE.value)
+        combobox.addItem("Batch: sync the target filesystem after the transfer", Durability.BATCH.value)
+        combobox.addItem("Strict: sync every file (slow)", Durability.STRICT.value)
+        combobox.setCurrentIndex(combobox.findData(settings.value("globals/transfer_durability",
+                                                                  Durability.BATCH.value)))
+        combobox.currentIndexChanged.connect(
+            lambda idx: settings.set_value("globals/transfer_durability", combobox.itemData(idx)))
+        vbox.addWidget(label)
+        vbox.addWidget(combobox)
+
         self._transfer_group_box.setLayout(vbox)
         return self._transfer_group_box
 
@@ -0,0 +1,275 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import TYPE_CHECKING, List, Optional
+
+import logging
+
+from PyQt5.QtCore import QObject, QTimer
+
+from dirtools.util import numeric_sort_key
+from dirtools.fileview.directory_watcher import DirectoryWatcher
+from dirtools.fileview.file_collection import FileCollectionSnapshot
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.location import Location
+
+if TYPE_CHECKING:
+    from dirtools.fileview.application import FileViewApplication  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+# Time in milliseconds without any real work before the next
+# directory gets prefetched.
+PREFETCH_DELAY = 500
+
+# Directories with more entries are not worth the memory, the listing
+# gets abandoned.
+PREFETCH_MAX_FILES = 10000
+
+# Number of files at the start of a directory whose metadata and
+# thumbnails are warmed up, roughly what the first screen shows.
+PREFETCH_METADATA_FILES = 32
+PREFETCH_THUMBNAIL_FILES = 128
+
+# Number of directories waiting to be prefetched, older hints get
+# dropped.
+PREFETCH_QUEUE_SIZE = 4
+
+
+def _basename_key(fileinfo: FileInfo):
+    return numeric_sort_key(fileinfo.basename().lower())
+
+
+class Prefetcher(QObject):
+    """Lists the directories the user is likely to visit next, the
+    hovered or selected one and the siblings of the current one, and
+    puts them into the DirectoryCache. Their metadata and thumbnails
+    are warmed up as well. Only one directory is handled at a time and
+    only after PREFETCH_DELAY of idle time, any real work postpones or
+    cancels it."""
+
+    def __init__(self, app: 'FileViewApplication') -> None:
+        super().__init__()
+
+        self._app = app
+        self._suspended = False
+
+        self._queue: List[Location] = []
+
+        # directory whose siblings get queued once the listing of its
+        # parent is known
+        self._siblings_of: Optional[Location] = None
+
+        # the listing in progress
+        self._watcher: Optional[DirectoryWatcher] = None
+        self._location: Optional[Location] = None
+        self._fileinfos: List[FileInfo] = []
+
+        self._warming = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(PREFETCH_DELAY)
+        self._timer.timeout.connect(self._start_next)
+
+    def close(self) -> None:
+        self.cancel()
+
+    def cancel(self) -> None:
+        self._timer.stop()
+        self._queue.clear()
+        self._siblings_of = None
+        self._stop_listing()
+        self._stop_warming()
+
+    def suspend(self) -> None:
+        """Cancel everything and don't start anything new until resume(),
+        used while the Controller loads a directory itself."""
+
+        self.cancel()
+        self._suspended = True
+
+    def resume(self) -> None:
+        self._suspended = False
+        self._schedule()
+
+    def postpone(self) -> None:
+        """Real work arrived, stop whatever is in progress and try again
+        once things are idle."""
+
+        if self._watcher is not None:
+            assert self._location is not None
+            self._queue.insert(0, self._location)
+            self._stop_listing()
+
+        self._stop_warming()
+        self._schedule()
+
+    def prefetch_directory(self, location: Location) -> None:
+        if not self._is_prefetchable(location) or location == self._location:
+            return
+
+        if location in self._queue:
+            self._queue.remove(location)
+        self._queue.insert(0, location)
+        del self._queue[PREFETCH_QUEUE_SIZE:]
+
+        # restarting the timer means that sweeping over a lot of
+        # directories only prefetches the one the pointer rests on
+        self._schedule()
+
+    def prefetch_siblings(self, location: Location) -> None:
+        parent = location.parent()
+        if parent == location or not self._is_prefetchable(parent):
+            return
+
+        self._siblings_of = location
+
+        snapshot = self._app.directory_cache.peek(parent)
+        if snapshot is not None:
+            self._queue_siblings(snapshot.fileinfos)
+        elif parent not in self._queue:
+            self._queue.append(parent)
+
+        self._schedule()
+
+    def _is_prefetchable(self, location: Location) -> bool:
+        return location.protocol() == "file" and not location.has_payload()
+
+    def _schedule(self) -> None:
+        if not self._suspended and self._watcher is None and self._queue:
+            self._timer.start()
+
+    def _queue_siblings(self, parent_fileinfos: List[FileInfo]) -> None:
+        location = self._siblings_of
+        self._siblings_of = None
+        if location is None:
+            return
+
+        directories = sorted((fi for fi in parent_fileinfos
+                              if fi.isdir() and not fi.basename().startswith(".")),
+                             key=_basename_key)
+        locations = [fi.location() for fi in directories]
+
+        try:
+            idx = locations.index(location)
+        except ValueError:
+            return
+
+        # next sibling first, as that is the more common direction
+        for sibling in locations[idx + 1:idx + 2] + locations[max(0, idx - 1):idx]:
+            if sibling not in self._queue:
+                self._queue.append(sibling)
+
+    def _start_next(self) -> None:
+        if self._suspended or self._watcher is not None:
+            return
+
+        while self._queue:
+            location = self._queue.pop(0)
+
+            snapshot = self._app.directory_cache.peek(location)
+            if snapshot is None:
+                break
+
+            if self._siblings_of is not None and self._siblings_of.parent() == location:
+                self._queue_siblings(snapshot.fileinfos)
+        else:
+            return
+
+        logger.debug("Prefetcher._start_next: %s", location)
+
+        watcher = DirectoryWatcher(self._app.vfs, location)
+        self._watcher = watcher
+        self._location = location
+        self._fileinfos = []
+
+        # signals that were already on their way when a listing got
+        # stopped must not end up in the next one
+        watcher.sig_scandir_progress.connect(
+            lambda fileinfos: self._on_scandir_progress(watcher, fileinfos))
+        watcher.sig_scandir_finished.connect(
+            lambda fileinfos: self._on_scandir_finished(watcher, fileinfos))
+        watcher.sig_message.connect(
+            lambda message: self._on_message(watcher, message))
+        watcher.start()
+
+    def _on_scandir_progress(self, watcher: DirectoryWatcher, fileinfos: List[FileInfo]) -> None:
+        if watcher is not self._watcher:
+            return
+
+        self._fileinfos.extend(fileinfos)
+        if len(self._fileinfos) > PREFETCH_MAX_FILES:
+            logger.debug("Prefetcher: %s: too many files", self._location)
+            self._stop_listing()
+            self._schedule()
+
+    def _on_scandir_finished(self, watcher: DirectoryWatcher, fileinfos: List[FileInfo]) -> None:
+        if watcher is not self._watcher:
+            return
+
+        assert self._location is not None
+        location = self._location
+        fileinfos = self._fileinfos + fileinfos
+        self._stop_listing()
+
+        if len(fileinfos) <= PREFETCH_MAX_FILES:
+            if location not in self._app.directory_cache:
+                self._app.directory_cache.store(location, FileCollectionSnapshot(fileinfos, None))
+
+            if self._siblings_of is not None and self._siblings_of.parent() == location:
+                self._queue_siblings(fileinfos)
+
+            self._warm(fileinfos)
+
+        self._schedule()
+
+    def _on_message(self, watcher: DirectoryWatcher, message: str) -> None:
+        if watcher is not self._watcher:
+            return
+
+        logger.debug("Prefetcher: %s: %s", self._location, message)
+        self._stop_listing()
+        self._schedule()
+
+    def _warm(self, fileinfos: List[FileInfo]) -> None:
+        files = sorted((fi for fi in fileinfos if not fi.isdir()), key=_basename_key)
+        locations = [fi.location() for fi in files]
+
+        # the collector and thumbnailer are shared by all windows, the
+        # prefetcher is the owner so that the others are left alone
+        self._app.metadata_collector.prefetch_metadata(locations[:PREFETCH_METADATA_FILES], self)
+        self._app.thumbnailer.prefetch_thumbnails(locations[:PREFETCH_THUMBNAIL_FILES], "normal", self)
+        self._warming = True
+
+    def _stop_warming(self) -> None:
+        if self._warming:
+            self._app.metadata_collector.prefetch_metadata([], self)
+            self._app.thumbnailer.prefetch_thumbnails([], "normal", self)
+            self._warming = False
+
+    def _stop_listing(self) -> None:
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+        self._location = None
+        self._fileinfos = []
+
+
+# EOF #
@@ -121,7 +121,9 @@ class PropertiesDialog(QDialog):
                                                 self._fileinfo.gid()))
         group_edit.setReadOnly(True)
 
-        mode = self._fileinfo.stat().st_mode
+        # no permissions to show when the file couldn't be stat'ed
+        st = self._fileinfo.stat()
+        mode = st.st_mode if st is not None else 0
         access_box = QGroupBox("Access Control")
         access_user_label = QLabel("User:")
 
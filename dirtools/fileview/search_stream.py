@@ -15,25 +15,38 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Optional
+from typing import List, Optional
 
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from PyQt5.QtCore import QObject, pyqtSignal, QThread, Qt
+from PyQt5.QtCore import QObject, pyqtSignal, QThread, QTimer, Qt
 
 from dirtools.fileview.file_info import FileInfo
-from dirtools.find.action import Action
+from dirtools.fileview.location import Location
 from dirtools.find.filter import SimpleFilter
-from dirtools.find.walk import walk
 
 logger = logging.getLogger(__name__)
 
 
+# Number of directories that are scanned in parallel.
+SEARCH_JOBS = 8
+
+# Time in milliseconds between two batches of results handed to the
+# GUI.
+SEARCH_EMIT_INTERVAL = 100
+
+
 class SearchStreamWorker(QObject):
+    """Walks the directory tree top down, each directory is scanned
+    as a separate job on a thread pool. Matches are collected and
+    handed to the GUI in batches by a timer in the worker thread."""
 
-    sig_file_added = pyqtSignal(FileInfo)
-    sig_finished = pyqtSignal()
+    sig_scandir_progress = pyqtSignal(list)
+    sig_scandir_finished = pyqtSignal(list)
+    sig_search_progress = pyqtSignal(int, int)
     sig_error = pyqtSignal()
     sig_message = pyqtSignal(str)
 
@@ -43,64 +56,109 @@ class SearchStreamWorker(QObject):
         self._pattern = pattern
         self._close = False
 
-        self._action: Optional[SearchStreamAction] = None
         self._filter: Optional[SimpleFilter] = None
-
-    def close(self):
-        pass
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._timer: Optional[QTimer] = None
+
+        # everything below is shared with the pool threads
+        self._lock = threading.Lock()
+        self._pending_jobs = 0
+        self._fileinfos: List[FileInfo] = []
+        self._dirs_scanned = 0
+        self._found_count = 0
 
     def init(self) -> None:
-        self._action = SearchStreamAction(self)
-        self._filter = SimpleFilter.from_string(self._pattern)
-
-        self._find_files(self._abspath, True,
-                         filter_op=self._filter,
-                         action=self._action,
-                         topdown=False, maxdepth=None)
-
-        if self._action.found_count() == 0:
-            self.sig_message.emit("Search did not give any results")
-
-        self.sig_finished.emit()
-
-    def _find_files(self, directory, recursive, filter_op, action, topdown, maxdepth):
-        for root, dirs, files in walk(directory, topdown=topdown, maxdepth=maxdepth):
-            for f in files:
-                if filter_op.match_file(root, f):
-                    action.file(root, f)
+        try:
+            self._filter = SimpleFilter.from_string(self._pattern)
+        except Exception as err:
+            self.sig_message.emit(str(err))
+            self.sig_scandir_finished.emit([])
+            return
+
+        # the timer has to be created in the worker thread
+        self._timer = QTimer(self)
+        self._timer.setInterval(SEARCH_EMIT_INTERVAL)
+        self._timer.timeout.connect(self._on_timeout)
+
+        self._executor = ThreadPoolExecutor(SEARCH_JOBS)
+        self._submit(self._abspath)
+        self._timer.start()
 
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.stop()
+
+        if self._executor is not None:
+            # queued jobs see _close and return right away, running
+            # ones check it for every entry, so this returns almost
+            # immediately (no cancel_futures, that needs Python 3.9)
+            self._executor.shutdown(wait=True)
+
+    def _submit(self, path: str) -> None:
+        assert self._executor is not None
+        with self._lock:
+            self._pending_jobs += 1
+        self._executor.submit(self._scan_directory, path)
+
+    def _scan_directory(self, path: str) -> None:
+        try:
+            self._scan_directory_entries(path)
+        except Exception as err:
+            logger.debug("SearchStreamWorker._scan_directory: %s: %s", path, err)
+        finally:
+            with self._lock:
+                self._pending_jobs -= 1
+
+    def _scan_directory_entries(self, path: str) -> None:
+        if self._close:
+            return
+
+        assert self._filter is not None
+        simple_filter = self._filter
+        location = Location.from_path(path)
+        matches: List[FileInfo] = []
+
+        with os.scandir(path) as it:
+            for entry in it:
                 if self._close:
                     return
 
-            if not recursive:
-                del dirs[:]
+                if entry.is_dir(follow_symlinks=False):
+                    self._submit(entry.path)
+                elif simple_filter.match_direntry(entry):
+                    # the stat() done by the filter is cached in the DirEntry
+                    matches.append(FileInfo.from_direntry(location, entry))
 
+        with self._lock:
+            self._dirs_scanned += 1
+            self._found_count += len(matches)
+            self._fileinfos += matches
 
-class SearchStreamAction(Action):
+    def _on_timeout(self) -> None:
+        with self._lock:
+            fileinfos = self._fileinfos
+            self._fileinfos = []
+            finished = self._pending_jobs == 0
+            dirs_scanned = self._dirs_scanned
+            found_count = self._found_count
 
-    def __init__(self, worker: SearchStreamWorker) -> None:
-        super().__init__()
+        self.sig_search_progress.emit(dirs_scanned, found_count)
 
-        self._found_count = 0
-        self._worker = worker
+        if not finished:
+            if fileinfos:
+                self.sig_scandir_progress.emit(fileinfos)
+        else:
+            assert self._timer is not None
+            self._timer.stop()
 
-    def file(self, root: str, filename: str) -> None:
-        self._found_count += 1
-        fullpath = os.path.join(root, filename)
-        fileinfo = FileInfo.from_path(fullpath)
-        self._worker.sig_file_added.emit(fileinfo)
+            if found_count == 0:
+                self.sig_message.emit("Search did not give any results")
 
-    def directory(self, root: str, filename: str) -> None:
-        self._found_count += 1
-        fullpath = os.path.join(root, filename)
-        fileinfo = FileInfo.from_path(fullpath)
-        self._worker.sig_file_added.emit(fileinfo)
-
-    def finish(self) -> None:
-        pass
+            self.sig_scandir_finished.emit(fileinfos)
 
     def found_count(self) -> int:
-        return self._found_count
+        with self._lock:
+            return self._found_count
 
 
 class SearchStream(QObject):
@@ -131,12 +189,16 @@ class SearchStream(QObject):
         self._thread.wait()
 
     @property
-    def sig_file_added(self):
-        return self._worker.sig_file_added
+    def sig_scandir_progress(self):
+        return self._worker.sig_scandir_progress
+
+    @property
+    def sig_scandir_finished(self):
+        return self._worker.sig_scandir_finished
 
     @property
-    def sig_finished(self):
-        return self._worker.sig_finished
+    def sig_search_progress(self):
+        return self._worker.sig_search_progress
 
     @property
     def sig_message(self):
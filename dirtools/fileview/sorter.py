@@ -31,20 +31,47 @@ class Sorter:
         self.reverse = False
         self.key_func: Callable[[FileInfo], Any] = lambda x: numeric_sort_key(x.basename().lower())
 
+        # identifies the current order, changes whenever anything
+        # but the direction changes
+        self._key_token = object()
+
     def set_directories_first(self, v: bool) -> None:
-        self.directories_first = v
+        if v != self.directories_first:
+            self.directories_first = v
+            self._key_token = object()
 
     def set_sort_reversed(self, rev: bool) -> None:
         self.reverse = rev
 
     def set_key_func(self, key_func: Callable[[FileInfo], Any]) -> None:
         self.key_func = key_func
+        self._key_token = object()
+
+    def get_key_token(self) -> object:
+        return self._key_token
 
     def get_key_func(self) -> Callable[[FileInfo], Any]:
-        if self.directories_first:
-            return lambda fileinfo: (not fileinfo.isdir(), self.key_func(fileinfo))
-        else:
-            return self.key_func
+        """Returns a key function that caches the key in the FileInfo, so
+        it is only computed once as long as the order doesn't change."""
+
+        token = self._key_token
+        key_func = self.key_func
+        directories_first = self.directories_first
+
+        def cached_key_func(fileinfo: FileInfo) -> Any:
+            if fileinfo._sort_key_token is token:
+                return fileinfo._sort_key
+
+            if directories_first:
+                key = (not fileinfo.isdir(), key_func(fileinfo))
+            else:
+                key = key_func(fileinfo)
+
+            fileinfo._sort_key = key
+            fileinfo._sort_key_token = token
+            return key
+
+        return cached_key_func
 
     # def apply(self, file_collection: 'FileCollection') -> None:
     #     file_collection.sort(self.get_key_func(), reverse=self.reverse)
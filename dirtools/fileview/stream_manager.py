@@ -36,7 +36,10 @@ class StreamManager:
 
     def get_stdin(self) -> Optional[Tuple[IO, str]]:
         if self._stdin_id is None:
-            tee_io, stream_id = self.record(sys.stdin)
+            # unbuffered, so that a read() returns whatever the pipe
+            # has available instead of waiting for the buffer to fill
+            stdin = os.fdopen(sys.stdin.fileno(), "rb", buffering=0, closefd=False)
+            tee_io, stream_id = self.record(stdin)
             self._stdin_id = stream_id
             return cast(IO, tee_io), stream_id
         else:
@@ -50,17 +53,17 @@ class StreamManager:
         stream_id = uuid.UUID(stream_id_text)
         filename = os.path.join(self._cachedir, str(stream_id))
         try:
-            fd = open(filename, "r")
+            fd = open(filename, "rb", buffering=0)
         except Exception as err:
             logger.exception("failed to open '%s' for reading", filename)
             return None
         else:
             return fd
 
-    def record(self, fd: IO[str]) -> Optional[Tuple[TeeIO, str]]:
+    def record(self, fd: IO[bytes]) -> Optional[Tuple[TeeIO, str]]:
         outfile, stream_id = self._make_outfile()
         try:
-            fd_out = open(outfile, "w")
+            fd_out = open(outfile, "wb")
         except Exception as err:
             logger.exception("failed to open '%s' for writing", outfile)
             return None
@@ -71,6 +71,9 @@ class Thumbnail:
                 # extracting (e.g. looking at an extracting archive).
                 if int(self.file_item.fileinfo.mtime()) != self.mtime:
                     self.reset()
+                else:
+                    self.file_item.controller.app.pixmap_cache.put(
+                        self.file_item.fileinfo.location().as_url(), self.flavor, self.mtime, self.pixmap)
             except ValueError as err:
                 logger.error("%s: couldn't read Thumb::MTime tag on thumbnail: %s",
                              self.file_item.fileinfo.location(), err)
@@ -85,9 +88,25 @@ class Thumbnail:
     def request(self, force=False) -> None:
         assert self.status != ThumbnailStatus.LOADING
 
-        thumbnailer = self.file_item.controller.app.thumbnailer
+        app = self.file_item.controller.app
         location = self.file_item.fileinfo.location()
-        mimetype = self.file_item.controller.app.mime_database.get_mime_type(location).name()
+
+        # a hit in the shared cache saves the round trip through the
+        # ThumbnailerWorker and the PNG decoding
+        if force:
+            app.pixmap_cache.discard(location.as_url(), self.flavor)
+        else:
+            mtime = int(self.file_item.fileinfo.mtime())
+            pixmap = app.pixmap_cache.get(location.as_url(), self.flavor, mtime)
+            if pixmap is not None:
+                self.status = ThumbnailStatus.THUMBNAIL_READY
+                self.pixmap = pixmap
+                self.mtime = mtime
+                self.file_item.update()
+                return
+
+        thumbnailer = app.thumbnailer
+        mimetype = app.mime_database.get_mime_type(location).name()
 
         if not thumbnailer.is_supported(mimetype):
             self.status = ThumbnailStatus.THUMBNAIL_UNAVAILABLE
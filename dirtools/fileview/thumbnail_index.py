@@ -0,0 +1,113 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Dict, Optional, Set
+
+import logging
+import os
+
+from PyQt5.QtCore import QObject
+
+from inotify_simple import flags as inotify_flags
+
+from dirtools.dbus_thumbnailer import DBusThumbnailer
+from dirtools.fileview.directory_watcher import INotifyQt
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_FLAGS = (
+    inotify_flags.CREATE |
+    inotify_flags.DELETE |
+    inotify_flags.MOVED_FROM |
+    inotify_flags.MOVED_TO
+)
+
+
+class ThumbnailIndex(QObject):
+    """Knows which thumbnails exist in the thumbnail cache, so that
+    looking one up doesn't need a stat(). Each flavor directory is
+    listed once on first use and then kept up to date with inotify."""
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+
+        self._listings: Dict[str, Set[str]] = {}
+        self._watches: Dict[str, INotifyQt] = {}
+
+    def close(self) -> None:
+        for inotify in self._watches.values():
+            inotify.close()
+        self._watches.clear()
+        self._listings.clear()
+
+    def lookup(self, url: str, flavor: str) -> Optional[str]:
+        """Returns the filename of the thumbnail for 'url' if there is
+        one, the thumbnail might still be outdated."""
+
+        filename: str = DBusThumbnailer.thumbnail_from_url(url, flavor)
+        if os.path.basename(filename) in self._listing(flavor, os.path.dirname(filename)):
+            return filename
+        else:
+            return None
+
+    def _listing(self, flavor: str, directory: str) -> Set[str]:
+        listing = self._listings.get(flavor)
+        if listing is not None:
+            return listing
+
+        listing = set()
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+            # watch before listing, so nothing created in between gets lost
+            if flavor not in self._watches:
+                inotify = INotifyQt(self)
+                inotify.add_watch(directory, INDEX_FLAGS)
+                inotify.sig_event.connect(lambda ev: self._on_inotify_event(flavor, ev))
+                self._watches[flavor] = inotify
+
+            with os.scandir(directory) as it:
+                for entry in it:
+                    listing.add(entry.name)
+        except OSError as err:
+            # without a listing everything is a miss and goes to the
+            # thumbnailer, which is slow, but still correct
+            logger.error("ThumbnailIndex: %s: %s", directory, err)
+        else:
+            self._listings[flavor] = listing
+
+        logger.debug("ThumbnailIndex: %s: %d thumbnails", directory, len(listing))
+        return listing
+
+    def _on_inotify_event(self, flavor: str, ev) -> None:
+        if ev.mask & inotify_flags.Q_OVERFLOW:
+            # events got lost, list the directory again on next use
+            self._listings.pop(flavor, None)
+            return
+
+        listing = self._listings.get(flavor)
+        if listing is None:
+            return
+
+        if ev.mask & (inotify_flags.CREATE | inotify_flags.MOVED_TO):
+            listing.add(ev.name)
+        elif ev.mask & (inotify_flags.DELETE | inotify_flags.MOVED_FROM):
+            listing.discard(ev.name)
+
+
+# EOF #
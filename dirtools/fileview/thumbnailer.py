@@ -15,18 +15,23 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import List, Callable, Dict, Optional, Set
+from typing import List, Callable, Dict, Optional, Set, Tuple, Union
 
+import heapq
 import logging
 import os
 from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-from PyQt5.QtCore import Qt, QObject, pyqtSignal, QThread
+from PyQt5.QtCore import Qt, QObject, pyqtSignal, QThread, QTimer
 from PyQt5.QtDBus import QDBusConnection
 from PyQt5.QtGui import QImage
 
 from dirtools.dbus_thumbnailer import DBusThumbnailer
 from dirtools.fileview.location import Location
+from dirtools.fileview.settings import settings
+from dirtools.fileview.thumbnail_index import ThumbnailIndex
+from dirtools.local_thumbnailer import LocalThumbnailer
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +39,23 @@ logger = logging.getLogger(__name__)
 ThumbnailCallback = Callable[[Location, Optional[str], Optional[QImage], Optional[int], Optional[str]], None]
 
 
+# Number of thumbnails send to the D-Bus thumbnailer in one request
+THUMBNAIL_BATCH_SIZE = 32
+
+# Number of D-Bus requests in flight at a time, the rest stays in the
+# ThumbnailerWorker where it can still be reordered or cancelled
+THUMBNAIL_MAX_BATCHES = 2
+
+# Time in milliseconds that requests for thumbnails outside of the
+# viewport are collected before they are send off, visible ones go
+# out right away
+THUMBNAIL_BATCH_DELAY = 250
+
+# Number of threads loading existing thumbnails, QImage releases the
+# GIL while decoding
+THUMBNAIL_DECODER_THREADS = 4
+
+
 class WorkerDBusThumbnailerListener:
 
     def __init__(self, worker):
@@ -66,6 +88,9 @@ class ThumbnailerWorker(QObject):
     # location, flavor, callback, error_code, error_message
     sig_thumbnail_error = pyqtSignal(Location, str, object, int, str)
 
+    # request, priority; from the decoder threads back to the worker
+    sig_decode_failed = pyqtSignal(object, int)
+
     def __init__(self, vfs, parent=None) -> None:
         super().__init__(parent)
         # This function is called from the main thread, leave
@@ -74,11 +99,23 @@ class ThumbnailerWorker(QObject):
         self._vfs = vfs
         self._close = False
 
-        self._dbus_thumbnailer: Optional[DBusThumbnailer] = None
-        self._queued_requests: Dict[int, List[ThumbnailRequest]] = defaultdict(list)
+        # requests that still have to be looked up in the index, with
+        # their priority, collected so that a screen full of requests
+        # gets handled in one go
+        self._lookup_requests: Dict[ThumbnailRequest, int] = {}
+
+        # requests send to the D-Bus thumbnailer by handle and url
+        self._queued_requests: Dict[int, Dict[str, List[ThumbnailRequest]]] = {}
+
+        # requests waiting to be send, with their (priority, sequence
+        # number), lower goes first
+        self._pending_requests: Dict[ThumbnailRequest, Tuple[int, int]] = {}
+        self._sequence = 0
 
-        self._timer_id = 0
-        self._thumbnail_requests: List[ThumbnailRequest] = []
+        # thumbnails that are read ahead of time, with their flavor, by
+        # owner, one per event loop iteration so that real requests
+        # don't have to wait
+        self._prefetch_queues: Dict[object, Tuple[List[Location], str]] = {}
 
         self._supported_uri_types: Set[str] = set()
         self._supported_mime_types: Set[str] = set([
@@ -92,46 +129,106 @@ class ThumbnailerWorker(QObject):
         ])
 
     def init(self):
-        self._dbus_thumbnailer = DBusThumbnailer(QDBusConnection.sessionBus(),
-                                                 WorkerDBusThumbnailerListener(self))
+        listener = WorkerDBusThumbnailerListener(self)
+
+        thumbnailer: Optional[Union[DBusThumbnailer, LocalThumbnailer]] = None
+        if not settings.value("globals/local_thumbnailer", False, bool):
+            dbus_thumbnailer = DBusThumbnailer(QDBusConnection.sessionBus(), listener)
+            try:
+                # FIXME: potential race condition
+                result = dbus_thumbnailer.get_supported()
+            except Exception as err:
+                logger.warning("Thumbnailer: D-Bus thumbnailer not available, generating thumbnails locally: %s",
+                               err)
+                dbus_thumbnailer.close()
+            else:
+                thumbnailer = dbus_thumbnailer
+
+        if thumbnailer is None:
+            thumbnailer = LocalThumbnailer(listener)
+            result = thumbnailer.get_supported()
+
+        self._thumbnailer: Union[DBusThumbnailer, LocalThumbnailer] = thumbnailer
 
-        # FIXME: potential race condition
-        result = self._dbus_thumbnailer.get_supported()
         self._supported_uri_types.update(result[0])
         self._supported_mime_types.update(result[1])
 
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setInterval(0)
+        self._prefetch_timer.timeout.connect(self._prefetch_next)
+
+        self._dispatch_timer = QTimer(self)
+        self._dispatch_timer.setSingleShot(True)
+        self._dispatch_timer.timeout.connect(self._dispatch)
+
+        self._index = ThumbnailIndex(self)
+        self._decoder = ThreadPoolExecutor(max_workers=THUMBNAIL_DECODER_THREADS)
+        self.sig_decode_failed.connect(self._queue_request)
+
+        self._lookup_timer = QTimer(self)
+        self._lookup_timer.setSingleShot(True)
+        self._lookup_timer.setInterval(0)
+        self._lookup_timer.timeout.connect(self._lookup)
+
     def close(self):
         assert self._close
 
-        del self._dbus_thumbnailer
+        # queued decodes return right away once _close is set
+        self._decoder.shutdown(wait=True)
+        self._index.close()
+
+        if isinstance(self._thumbnailer, LocalThumbnailer):
+            self._thumbnailer.close()
+        del self._thumbnailer
 
-    def timerEvent(self, ev) -> None:
-        req_by_flavor: defaultdict = defaultdict(list)
-        for req in self._thumbnail_requests:
-            req_by_flavor[req.flavor].append(req)
+    def _schedule_dispatch(self) -> None:
+        if not self._pending_requests or len(self._queued_requests) >= THUMBNAIL_MAX_BATCHES:
+            return
 
-        for flavor, reqs in req_by_flavor.items():
-            logger.debug("Thumbnailer: requesting a batch of %s thubnails", len(reqs))
+        priority, _ = min(self._pending_requests.values())
+        delay = 0 if priority == 0 else THUMBNAIL_BATCH_DELAY
+        if not self._dispatch_timer.isActive() or self._dispatch_timer.remainingTime() > delay:
+            self._dispatch_timer.start(delay)
 
-            filenames = []
+    def _dispatch(self) -> None:
+        if self._close:
+            return
+
+        while self._pending_requests and len(self._queued_requests) < THUMBNAIL_MAX_BATCHES:
+            first = min(self._pending_requests, key=self._pending_requests.__getitem__)
+            reqs = heapq.nsmallest(THUMBNAIL_BATCH_SIZE,
+                                   (req for req in self._pending_requests if req.flavor == first.flavor),
+                                   key=self._pending_requests.__getitem__)
             for req in reqs:
-                filenames.append(self._vfs.get_stdio_name(req.location))
+                del self._pending_requests[req]
 
-            handle = self._dbus_thumbnailer.queue(filenames, flavor)
-            self._queued_requests[handle].append(reqs)
+            logger.debug("Thumbnailer: requesting a batch of %s thumbnails", len(reqs))
 
-        self._thumbnail_requests.clear()
+            url2requests: Dict[str, List[ThumbnailRequest]] = defaultdict(list)
+            for req in reqs:
+                url2requests[self._vfs.get_stdio_url(req.location)].append(req)
+
+            filenames = [self._vfs.get_stdio_name(req.location) for req in reqs]
+            handle = self._thumbnailer.queue(filenames, first.flavor)
+            assert handle is not None  # only None for an empty batch
+            self._queued_requests[handle] = url2requests
+
+        self._schedule_dispatch()
 
     def on_thumbnail_requested(self, location: Location, flavor: str, force: bool,
-                               callback: ThumbnailCallback):
+                               priority: int, callback: ThumbnailCallback):
+        req = ThumbnailRequest(location, flavor, callback)
 
-        thumbnail_filename = DBusThumbnailer.thumbnail_from_url(location.as_url(), flavor)
-        exists = os.path.exists(thumbnail_filename)
-        if exists and not force:
-            image = QImage(thumbnail_filename)
-            self.sig_thumbnail_ready.emit(location, flavor, callback, image)
+        if not force:
+            old = self._lookup_requests.get(req)
+            if old is None or priority < old:
+                self._lookup_requests[req] = priority
+
+            if not self._lookup_timer.isActive():
+                self._lookup_timer.start()
         else:
-            if exists and force:
+            thumbnail_filename = DBusThumbnailer.thumbnail_from_url(self._vfs.get_stdio_url(location), flavor)
+            if os.path.exists(thumbnail_filename):
                 # DBusThumbnailCache.delete doesn't seem to be able to
                 # get the file deleted fast enough. The request thus
                 # isn't guranteed to regenerate the thumbnail. So
@@ -141,24 +238,141 @@ class ThumbnailerWorker(QObject):
                 # self.dbus_thumbnail_cache.delete(location.as_url())
                 os.unlink(thumbnail_filename)
 
-            self._thumbnail_requests.append(ThumbnailRequest(location, flavor, callback))
+            self._queue_request(req, priority)
+
+    def _lookup(self) -> None:
+        """Load the thumbnails that exist already with the decoder pool,
+        only the missing ones go to the thumbnailer."""
 
-            if self._timer_id == 0:
-                self._timer_id = self.startTimer(500)
+        if self._close:
+            return
+
+        requests = sorted(self._lookup_requests.items(), key=lambda item: item[1])
+        self._lookup_requests = {}
+
+        misses = 0
+        for req, priority in requests:
+            thumbnail_filename = self._index.lookup(self._vfs.get_stdio_url(req.location), req.flavor)
+            if thumbnail_filename is not None:
+                self._decoder.submit(self._decode, req, thumbnail_filename, priority)
+            else:
+                self._queue_request(req, priority)
+                misses += 1
+
+        logger.debug("Thumbnailer._lookup: %d requests, %d misses", len(requests), misses)
+
+    def _decode(self, req: ThumbnailRequest, thumbnail_filename: str, priority: Optional[int]) -> None:
+        """Runs in the decoder threads. With a 'priority' a thumbnail
+        that can't be loaded goes to the thumbnailer, without it is
+        reported as it is."""
+
+        if self._close:
+            return
+
+        image = QImage(thumbnail_filename)
+        if image.isNull() and priority is not None:
+            # removed since the lookup or not completely written
+            self.sig_decode_failed.emit(req, priority)
+        else:
+            self.sig_thumbnail_ready.emit(req.location, req.flavor, req.callback, image)
+
+    def _queue_request(self, req: ThumbnailRequest, priority: int) -> None:
+        old = self._pending_requests.get(req)
+        if old is None:
+            self._pending_requests[req] = (priority, self._sequence)
+            self._sequence += 1
+        elif priority < old[0]:
+            self._pending_requests[req] = (priority, old[1])
+
+        self._schedule_dispatch()
+
+    def on_prioritize_requested(self, priorities: Dict[Location, int], callback: ThumbnailCallback) -> None:
+        for req, (_, sequence) in self._pending_requests.items():
+            if req.callback == callback:
+                priority = priorities.get(req.location)
+                if priority is not None:
+                    self._pending_requests[req] = (priority, sequence)
+
+        self._schedule_dispatch()
+
+    def on_cancel_requested(self, locations: List[Location], callback: ThumbnailCallback) -> None:
+        cancelled = set(locations)
+
+        for req in [req for req in self._lookup_requests
+                    if req.location in cancelled and req.callback == callback]:
+            del self._lookup_requests[req]
+
+        for req in [req for req in self._pending_requests
+                    if req.location in cancelled and req.callback == callback]:
+            del self._pending_requests[req]
+
+        # requests that already went out are dropped as well, the whole
+        # D-Bus request is dequeued once nothing of it is wanted anymore
+        for handle, url2requests in list(self._queued_requests.items()):
+            for url, reqs in list(url2requests.items()):
+                reqs[:] = [req for req in reqs
+                           if req.location not in cancelled or req.callback != callback]
+                if not reqs:
+                    del url2requests[url]
+
+            if not url2requests:
+                del self._queued_requests[handle]
+                try:
+                    self._thumbnailer.dequeue(handle)
+                except Exception as err:
+                    logger.warning("Thumbnailer: failed to dequeue %s: %s", handle, err)
+
+        self._schedule_dispatch()
+
+    def on_prefetch_requested(self, locations: List[Location], flavor: str, owner: object) -> None:
+        """Read the existing thumbnails of 'locations' into the page
+        cache, missing ones are not generated. Replaces the previous
+        prefetch request of 'owner'."""
+
+        self._prefetch_queues.pop(owner, None)
+        if locations:
+            self._prefetch_queues[owner] = (list(locations), flavor)
+            self._prefetch_timer.start()
+        elif not self._prefetch_queues:
+            self._prefetch_timer.stop()
+
+    def _prefetch_next(self) -> None:
+        if self._close or not self._prefetch_queues:
+            self._prefetch_timer.stop()
+            return
+
+        # take turns between the owners
+        owner = next(iter(self._prefetch_queues))
+        queue, flavor = self._prefetch_queues.pop(owner)
+        location = queue.pop(0)
+        if queue:
+            self._prefetch_queues[owner] = (queue, flavor)
+
+        thumbnail_filename = self._index.lookup(self._vfs.get_stdio_url(location), flavor)
+        if thumbnail_filename is None:
+            return
+
+        try:
+            with open(thumbnail_filename, "rb") as fin:
+                fin.read()
+        except OSError:
+            pass
 
     def on_thumbnail_started(self, handle: int):
         pass
 
     def on_thumbnail_finished(self, handle: int):
-        del self._queued_requests[handle]
+        self._queued_requests.pop(handle, None)
+        self._schedule_dispatch()
 
     def _find_requests(self, handle, urls) -> List[ThumbnailRequest]:
+        url2requests = self._queued_requests.get(handle)
+        if url2requests is None:
+            return []
+
         results = []
-        for reqs in self._queued_requests.get(handle, []):
-            for req in reqs:
-                req_url = self._vfs.get_stdio_url(req.location)
-                if req_url in urls:
-                    results.append(req)
+        for url in urls:
+            results.extend(url2requests.pop(url, []))
         return results
 
     def on_thumbnail_ready(self, handle: int, urls: List[str], flavor: str):
@@ -167,12 +381,7 @@ class ThumbnailerWorker(QObject):
         for req in reqs:
             thumbnail_filename = DBusThumbnailer.thumbnail_from_filename(
                 self._vfs.get_stdio_name(req.location), req.flavor)
-
-            # On shutdown this causes:
-            # QObject::~QObject: Timers cannot be stopped from another thread
-            image = QImage(thumbnail_filename)
-
-            self.sig_thumbnail_ready.emit(req.location, req.flavor, req.callback, image)
+            self._decoder.submit(self._decode, req, thumbnail_filename, None)
 
     def on_thumbnail_error(self, handle: int, urls: List[str], error_code, message):
         reqs = self._find_requests(handle, urls)
@@ -182,12 +391,21 @@ class ThumbnailerWorker(QObject):
 
 class Thumbnailer(QObject):
 
-    # location, flavor, force, callback
-    sig_thumbnail_requested = pyqtSignal(Location, str, bool, object)
+    # location, flavor, force, priority, callback
+    sig_thumbnail_requested = pyqtSignal(Location, str, bool, int, object)
+
+    # priorities, callback
+    sig_prioritize_requested = pyqtSignal(dict, object)
+
+    # locations, callback
+    sig_cancel_requested = pyqtSignal(list, object)
 
     # location, flavor, callback
     sig_thumbnail_error = pyqtSignal(Location, str, object)
 
+    # locations, flavor, owner
+    sig_prefetch_requested = pyqtSignal(list, str, object)
+
     sig_close_requested = pyqtSignal()
 
     def __init__(self, vfs, parent=None) -> None:
@@ -203,6 +421,9 @@ class Thumbnailer(QObject):
 
         # requests to the worker
         self.sig_thumbnail_requested.connect(self._worker.on_thumbnail_requested)
+        self.sig_prioritize_requested.connect(self._worker.on_prioritize_requested)
+        self.sig_cancel_requested.connect(self._worker.on_cancel_requested)
+        self.sig_prefetch_requested.connect(self._worker.on_prefetch_requested)
 
         # replies from the worker
         self._worker.sig_thumbnail_ready.connect(self.on_thumbnail_ready)
@@ -223,9 +444,28 @@ class Thumbnailer(QObject):
         return self._worker._supported_mime_types
 
     def request_thumbnail(self, location: Location, flavor: str, force: bool,
-                          callback: ThumbnailCallback):
+                          callback: ThumbnailCallback, priority: int = 0):
+        """Requests with a lower 'priority' are handled first, 0 is for
+        thumbnails that are visible right now."""
+
         logger.debug("Thumbnailer.request_thumbnail: %s  %s", location, flavor)
-        self.sig_thumbnail_requested.emit(location, flavor, force, callback)
+        self.sig_thumbnail_requested.emit(location, flavor, force, priority, callback)
+
+    def prioritize_thumbnails(self, priorities: Dict[Location, int], callback: ThumbnailCallback) -> None:
+        """Change the priority of requests that haven't been send to the
+        thumbnailer yet."""
+        self.sig_prioritize_requested.emit(priorities, callback)
+
+    def cancel_thumbnails(self, locations: List[Location], callback: ThumbnailCallback) -> None:
+        """Drop the requests for 'locations' made with 'callback', the
+        callback won't be called for them."""
+        self.sig_cancel_requested.emit(locations, callback)
+
+    def prefetch_thumbnails(self, locations: List[Location], flavor: str, owner: object) -> None:
+        """Warm the lookup of existing thumbnails in the background, an
+        empty list cancels the previous prefetch of 'owner', those of
+        others are kept."""
+        self.sig_prefetch_requested.emit(locations, flavor, owner)
 
     def delete_thumbnails(self, files: List[str]):
         logger.warning("Thumbnailer.delete_thumbnail (not implemented): %s", files)
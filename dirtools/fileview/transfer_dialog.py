@@ -182,6 +182,7 @@ class TransferDialog(QDialog):
         progress.sig_copy_file.connect(self._on_copy_file)
         progress.sig_copy_progress.connect(lambda x, y: self._on_copy_progress("", x, y))
         progress.sig_copy_directory.connect(self._on_copy_directory)
+        progress.sig_verify_file.connect(self._on_verify_file)
         progress.sig_remove_file.connect(self._on_remove_file)
         progress.sig_remove_directory.connect(self._on_remove_directory)
         progress.sig_link_file.connect(self._on_link_file)
@@ -211,6 +212,12 @@ class TransferDialog(QDialog):
             self._source_widget.setText(src)
             self._dest_widget.setText(dst)
 
+    def _on_verify_file(self, src: str, dst: str, success: bool):
+        if success:
+            self._transfer_log_widget.append("verified file {}".format(dst))
+        else:
+            self._transfer_log_widget.append("<b>verification failed: {} -> {}</b>".format(src, dst))
+
     def _on_move_file(self, src: str, dst: str, resolution: ConflictResolution):
         if resolution == ConflictResolution.SKIP:
             self._transfer_log_widget.append("skipping file {}".format(src))
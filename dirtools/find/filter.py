@@ -71,5 +71,9 @@ class SimpleFilter:
         fileinfo = LazyFileInfo.from_path(path)
         return self._expr(fileinfo)
 
+    def match_direntry(self, entry: os.DirEntry) -> bool:
+        fileinfo = LazyFileInfo.from_direntry(entry)
+        return bool(self._expr(fileinfo))
+
 
 # EOF #
@@ -0,0 +1,81 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Optional
+
+import logging
+import os
+import sqlite3
+
+import xdg.BaseDirectory
+
+from dirtools.file_transfer import sha1sum
+
+logger = logging.getLogger(__name__)
+
+
+class HashCache:
+    """Persistent cache of file checksums. Entries are keyed by the
+    absolute path and are only valid as long as size and mtime of the
+    file stay the same."""
+
+    def __init__(self, filename: Optional[str] = None) -> None:
+        if filename is None:
+            directory = os.path.join(xdg.BaseDirectory.xdg_cache_home, "dirtools")
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            filename = os.path.join(directory, "hashes.sqlite")
+
+        self._db_filename = filename
+        self._db = sqlite3.connect(self._db_filename, isolation_level=None)
+        self._init_db()
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def _init_db(self) -> None:
+        self._db.execute("CREATE TABLE IF NOT EXISTS hashes ("
+                         "path TEXT PRIMARY KEY, "
+                         "size INTEGER, "
+                         "mtime_ns INTEGER, "
+                         "sha1 TEXT)")
+
+    def lookup(self, path: str, st: os.stat_result) -> Optional[str]:
+        c = self._db.cursor()
+        c.execute("SELECT sha1 FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                  (os.path.abspath(path), st.st_size, st.st_mtime_ns))
+        row = c.fetchone()
+        return row[0] if row is not None else None
+
+    def store(self, path: str, st: os.stat_result, digest: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO hashes (path, size, mtime_ns, sha1) VALUES (?, ?, ?, ?)",
+                         (os.path.abspath(path), st.st_size, st.st_mtime_ns, digest))
+
+    def sha1sum(self, path: str) -> str:
+        st = os.stat(path)
+
+        digest = self.lookup(path, st)
+        if digest is None:
+            logger.debug("HashCache.sha1sum: cache miss: %s", path)
+            digest = sha1sum(path)
+            self.store(path, st, digest)
+
+        return digest
+
+
+# EOF #
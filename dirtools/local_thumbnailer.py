@@ -0,0 +1,249 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# https://specifications.freedesktop.org/thumbnail-spec/thumbnail-spec-latest.html
+
+
+from typing import Dict, List, Optional, Set
+
+import functools
+import logging
+import multiprocessing
+import os
+import tempfile
+import urllib.parse
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PyQt5.QtCore import Qt, QObject, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+from dirtools.dbus_thumbnailer import DBusThumbnailer, DBusThumbnailerError
+
+logger = logging.getLogger(__name__)
+
+
+FLAVOR_SIZES = {
+    "normal": 128,
+    "large": 256,
+}
+
+
+def make_thumbnail(filename: str, url: str, flavor: str) -> Optional[str]:
+    """Write the thumbnail for 'filename' to the freedesktop thumbnail
+    cache, returns an error message on failure. This runs in a worker
+    process."""
+
+    try:
+        st = os.stat(filename)
+    except OSError as err:
+        return str(err)
+
+    size = FLAVOR_SIZES[flavor]
+
+    reader = QImageReader(filename)
+    reader.setAutoTransform(True)
+
+    # let the decoder do the downscaling, for JPEG this skips most of
+    # the decoding work
+    image_size = reader.size()
+    if image_size.isValid() and (image_size.width() > size or image_size.height() > size):
+        reader.setScaledSize(image_size.scaled(QSize(size, size), Qt.KeepAspectRatio))
+
+    image = reader.read()
+    if image.isNull():
+        return reader.errorString()
+
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    if image.hasAlphaChannel():
+        image = image.convertToFormat(QImage.Format_ARGB32)
+    else:
+        image = image.convertToFormat(QImage.Format_RGB32)
+
+    image.setText("Thumb::URI", url)
+    image.setText("Thumb::MTime", str(int(st.st_mtime)))
+    image.setText("Thumb::Size", str(st.st_size))
+    if image_size.isValid():
+        image.setText("Thumb::Image::Width", str(image_size.width()))
+        image.setText("Thumb::Image::Height", str(image_size.height()))
+    image.setText("Software", "dirtool")
+
+    thumbnail_filename = DBusThumbnailer.thumbnail_from_url(url, flavor)
+    thumbnail_dir = os.path.dirname(thumbnail_filename)
+    os.makedirs(thumbnail_dir, mode=0o700, exist_ok=True)
+
+    # the spec asks for an atomic rename, so that other programs never
+    # see a partially written thumbnail
+    fd, tmpfile = tempfile.mkstemp(suffix=".png", dir=thumbnail_dir)
+    os.close(fd)
+    try:
+        if not image.save(tmpfile, "PNG"):
+            return "couldn't write {}".format(tmpfile)
+        os.chmod(tmpfile, 0o600)
+        os.replace(tmpfile, thumbnail_filename)
+    finally:
+        if os.path.exists(tmpfile):
+            os.unlink(tmpfile)
+
+    return None
+
+
+class LocalThumbnailer(QObject):
+    """Generates thumbnails in a pool of worker processes instead of
+    going through the D-Bus thumbnailer service. It only handles image
+    formats supported by QImageReader, but works where the service is
+    missing. The interface mirrors DBusThumbnailer, results are
+    reported to the listener in the thread that owns the object."""
+
+    # handle, url, error_code, error_message, both None on success
+    sig_thumbnail_done = pyqtSignal(int, str, object, object)
+
+    def __init__(self, listener=None, max_workers: Optional[int] = None) -> None:
+        super().__init__()
+
+        self.listener = listener
+        self._max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        self._next_handle = 1
+        self._flavors: Dict[int, str] = {}
+        self._futures: Dict[int, List[Future]] = {}
+        self._unfinished: Dict[int, Set[str]] = {}
+
+        # queued even within the same thread, so that the caller of
+        # queue() has the handle before hearing about it, the PyQt5
+        # stubs don't know about 'type'
+        self.sig_thumbnail_done.connect(self._on_thumbnail_done,
+                                        type=Qt.QueuedConnection)  # type: ignore[call-arg]
+
+    def close(self) -> None:
+        # forget the handles first, cancel() runs the done callbacks
+        # right away
+        futures = [future for futures in self._futures.values() for future in futures]
+        self._flavors.clear()
+        self._futures.clear()
+        self._unfinished.clear()
+
+        for future in futures:
+            future.cancel()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork isn't safe with Qt threads running, so start clean
+            # processes instead
+            self._executor = ProcessPoolExecutor(max_workers=self._max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def queue(self, files, flavor="default") -> Optional[int]:
+        logger.debug("LocalThumbnailer.queue: %s  %s", files, flavor)
+
+        if files == []:
+            return None
+
+        if flavor == "default":
+            flavor = "normal"
+
+        handle = self._next_handle
+        self._next_handle += 1
+
+        urls = ["file://" + urllib.parse.quote(os.path.abspath(f)) for f in files]
+        self._flavors[handle] = flavor
+        self._unfinished[handle] = set(urls)
+        self.listener.started(handle)
+
+        if flavor not in FLAVOR_SIZES:
+            for url in urls:
+                self.sig_thumbnail_done.emit(handle, url, DBusThumbnailerError.UNSUPPORTED_FLAVOR.value,
+                                             "unsupported flavor: {}".format(flavor))
+        else:
+            executor = self._get_executor()
+            futures = []
+            for filename, url in zip(files, urls):
+                future = executor.submit(make_thumbnail, os.path.abspath(filename), url, flavor)
+                # runs in a thread of the executor, the signal gets
+                # the result back to this object's thread
+                future.add_done_callback(functools.partial(self._on_future_done, handle, url))
+                futures.append(future)
+            self._futures[handle] = futures
+
+        return handle
+
+    def _on_future_done(self, handle: int, url: str, future: Future) -> None:
+        if future.cancelled():
+            message: Optional[str] = "cancelled"
+        elif future.exception() is not None:
+            message = str(future.exception())
+        else:
+            message = future.result()
+
+        if message is None:
+            self.sig_thumbnail_done.emit(handle, url, None, None)
+        else:
+            self.sig_thumbnail_done.emit(handle, url, DBusThumbnailerError.INVALID_DATA.value, message)
+
+    def _on_thumbnail_done(self, handle: int, url: str,
+                           error_code: Optional[int], message: Optional[str]) -> None:
+        unfinished = self._unfinished.get(handle)
+        if unfinished is None:
+            # dequeued
+            return
+
+        if error_code is None:
+            self.listener.ready(handle, [url], self._flavors[handle])
+        else:
+            self.listener.error(handle, [url], error_code, message)
+
+        unfinished.discard(url)
+        if not unfinished:
+            self._finish(handle)
+
+    def _finish(self, handle: int) -> None:
+        del self._flavors[handle]
+        del self._unfinished[handle]
+        self._futures.pop(handle, None)
+
+        self.listener.finished(handle)
+        if not self._unfinished:
+            self.listener.idle()
+
+    def dequeue(self, handle) -> None:
+        logger.debug("LocalThumbnailer.dequeue: %s", handle)
+
+        self._flavors.pop(handle, None)
+        self._unfinished.pop(handle, None)
+
+        for future in self._futures.pop(handle, []):
+            future.cancel()
+
+    def get_supported(self):
+        mime_types = [bytes(mime_type).decode() for mime_type in QImageReader.supportedMimeTypes()]
+        return (["file"], mime_types)
+
+    def get_schedulers(self):
+        return ["default"]
+
+    def get_flavors(self):
+        return list(FLAVOR_SIZES)
+
+
+# EOF #
@@ -0,0 +1,266 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Dict, List, NamedTuple, Optional, IO
+
+import fcntl
+import json
+import logging
+import os
+import stat
+import time
+import uuid
+from enum import Enum
+
+import xdg.BaseDirectory
+
+logger = logging.getLogger(__name__)
+
+
+def default_journal_directory() -> str:
+    return os.path.join(xdg.BaseDirectory.xdg_cache_home, "dirtools", "transfers")
+
+
+class JournalState(Enum):
+
+    PLANNED = "planned"
+    COMPLETED = "completed"
+    VERIFIED = "verified"
+
+
+class JournalEntry(NamedTuple):
+    state: JournalState
+    source: str
+    isdir: bool
+    size: int
+    mtime_ns: int
+
+
+class TransferJournal:
+    """Append-only record of the copy+delete operations that a
+    cross-device move performs. Each line of the journal file is a
+    JSON object, the first line describes the transfer itself, the
+    following lines record the state of individual destinations. If
+    the transfer gets interrupted the journal stays behind and can be
+    used to resume the transfer without copying everything again."""
+
+    @staticmethod
+    def create(action: str, sources: List[str], destdir: str,
+               relative: bool = False, directory: Optional[str] = None) -> 'TransferJournal':
+        if directory is None:
+            directory = default_journal_directory()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        filename = os.path.join(directory, "{}-{}.journal".format(int(time.time()), uuid.uuid4().hex))
+        journal = TransferJournal(filename)
+        journal.action = action
+        journal.sources = list(sources)
+        journal.destdir = os.path.abspath(destdir)
+        journal.relative = relative
+        journal.cwd = os.getcwd()
+        journal.acquire()
+        journal._write({"action": journal.action,
+                        "sources": journal.sources,
+                        "destdir": journal.destdir,
+                        "relative": journal.relative,
+                        "cwd": journal.cwd,
+                        "time": time.time()})
+        return journal
+
+    @staticmethod
+    def find_unfinished(directory: Optional[str] = None) -> List['TransferJournal']:
+        """Returns all journals that have been left behind by interrupted
+        transfers, oldest first."""
+
+        if directory is None:
+            directory = default_journal_directory()
+
+        if not os.path.isdir(directory):
+            return []
+
+        journals: List[TransferJournal] = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".journal"):
+                continue
+
+            filename = os.path.join(directory, name)
+            if TransferJournal.is_in_use(filename):
+                # the transfer is still running in another process
+                continue
+
+            try:
+                journals.append(TransferJournal.load(filename))
+            except Exception as err:
+                logger.error("TransferJournal.find_unfinished: %s: %s", filename, err)
+
+        return journals
+
+    @staticmethod
+    def is_in_use(filename: str) -> bool:
+        with open(filename, "a") as fout:
+            try:
+                fcntl.flock(fout, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            else:
+                fcntl.flock(fout, fcntl.LOCK_UN)
+                return False
+
+    @staticmethod
+    def load(filename: str) -> 'TransferJournal':
+        journal = TransferJournal(filename)
+
+        with open(filename, "r") as fin:
+            header = json.loads(fin.readline())
+            journal.action = header["action"]
+            journal.sources = header["sources"]
+            journal.destdir = header["destdir"]
+            journal.relative = header["relative"]
+            journal.cwd = header["cwd"]
+
+            for line in fin:
+                try:
+                    js = json.loads(line)
+                except ValueError:
+                    # the last line might be incomplete when the
+                    # process got killed while writing it
+                    logger.warning("TransferJournal.load: %s: ignoring broken line: %r", filename, line)
+                    continue
+
+                journal._apply(js)
+
+        return journal
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+
+        self.action: str = ""
+        self.sources: List[str] = []
+        self.destdir: str = ""
+        self.relative: bool = False
+
+        # sources are stored as given, relative paths and --relative
+        # have to be interpreted relative to 'cwd'
+        self.cwd: str = ""
+
+        self._entries: Dict[str, JournalEntry] = {}
+        self._fout: Optional[IO[str]] = None
+
+    def abs_sources(self) -> List[str]:
+        return [os.path.normpath(os.path.join(self.cwd, source)) for source in self.sources]
+
+    def _apply(self, js: Dict) -> None:
+        dest = js["dest"]
+        state = JournalState(js["state"])
+
+        if state == JournalState.PLANNED:
+            self._entries[dest] = JournalEntry(state, js["source"], js["isdir"], js["size"], js["mtime_ns"])
+        elif dest in self._entries:
+            self._entries[dest] = self._entries[dest]._replace(state=state)
+
+    def acquire(self) -> None:
+        """Open the journal for writing and lock it, so that no other
+        process tries to resume the same transfer."""
+
+        if self._fout is not None:
+            return
+
+        fout = open(self.filename, "a")
+        try:
+            fcntl.flock(fout, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fout.close()
+            raise Exception("{}: journal is in use by another transfer".format(self.filename))
+        self._fout = fout
+
+    def _write(self, js: Dict) -> None:
+        self.acquire()
+        assert self._fout is not None
+
+        # one write() call per line, so that an interruption can at
+        # most damage the last line
+        self._fout.write(json.dumps(js) + "\n")
+        self._fout.flush()
+
+    def _record(self, js: Dict) -> None:
+        self._write(js)
+        self._apply(js)
+
+    def planned(self, source: str, dest: str) -> None:
+        st = os.lstat(source)
+        self._record({"state": JournalState.PLANNED.value,
+                      "source": os.path.abspath(source),
+                      "dest": os.path.abspath(dest),
+                      "isdir": os.path.isdir(source),
+                      "size": st.st_size,
+                      "mtime_ns": st.st_mtime_ns})
+
+    def completed(self, dest: str) -> None:
+        self._record({"state": JournalState.COMPLETED.value, "dest": os.path.abspath(dest)})
+
+    def verified(self, dest: str) -> None:
+        self._record({"state": JournalState.VERIFIED.value, "dest": os.path.abspath(dest)})
+
+    def lookup(self, source: str, dest: str) -> Optional[JournalEntry]:
+        entry = self._entries.get(os.path.abspath(dest))
+        if entry is None or entry.source != os.path.abspath(source):
+            return None
+        else:
+            return entry
+
+    def is_transferred(self, source: str, dest: str) -> bool:
+        """Returns True when 'dest' is a complete copy of 'source'
+        according to the journal and neither file has been changed
+        since."""
+
+        entry = self.lookup(source, dest)
+        if entry is None or entry.state == JournalState.PLANNED:
+            return False
+
+        try:
+            src_st = os.lstat(source)
+            dst_st = os.lstat(dest)
+        except FileNotFoundError:
+            return False
+
+        if stat.S_ISLNK(src_st.st_mode):
+            # symlinks are recreated, not copied, so their mtime differs
+            return stat.S_ISLNK(dst_st.st_mode) and os.readlink(source) == os.readlink(dest)
+
+        return (src_st.st_size == entry.size == dst_st.st_size and
+                src_st.st_mtime_ns == entry.mtime_ns == dst_st.st_mtime_ns)
+
+    def close(self) -> None:
+        if self._fout is not None:
+            self._fout.close()
+            self._fout = None
+
+    def finish(self) -> None:
+        """The transfer finished successfully, the journal is no longer
+        needed."""
+
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def __str__(self) -> str:
+        return "TransferJournal({!r}, {} -> {})".format(self.filename, self.sources, self.destdir)
+
+
+# EOF #
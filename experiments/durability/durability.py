@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Compare the throughput of the Filesystem durability modes by
+# copying a tree of small files:
+#
+#   ./durability.py [DIRECTORY] [FILES] [SIZE]
+#
+# DIRECTORY should be on the disk that is to be measured, not on tmpfs.
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from dirtools.file_transfer import FileTransfer, ConsoleMediator, ConsoleProgress
+from dirtools.filesystem import Filesystem, Durability
+
+
+class QuietProgress(ConsoleProgress):
+
+    def copy_progress(self, current: int, total: int) -> None:
+        pass
+
+
+def make_tree(directory: str, count: int, size: int) -> None:
+    for i in range(count):
+        subdir = os.path.join(directory, "dir{:03d}".format(i // 1000))
+        if not os.path.isdir(subdir):
+            os.makedirs(subdir)
+
+        with open(os.path.join(subdir, "file{:06d}".format(i)), "wb") as fout:
+            fout.write(os.urandom(size))
+
+
+def main(argv):
+    basedir = argv[1] if len(argv) > 1 else None
+    count = int(argv[2]) if len(argv) > 2 else 10000
+    size = int(argv[3]) if len(argv) > 3 else 4096
+
+    tmpdir = tempfile.mkdtemp(dir=basedir)
+    try:
+        source = os.path.join(tmpdir, "source")
+        make_tree(source, count, size)
+        os.sync()
+
+        print("{} files of {} bytes in {}".format(count, size, tmpdir))
+
+        for durability in Durability:
+            target = os.path.join(tmpdir, "target-" + durability.value)
+            os.mkdir(target)
+
+            fs = Filesystem()
+            fs.verbose = False
+            fs.durability = durability
+
+            transfer = FileTransfer(fs, ConsoleMediator(), QuietProgress())
+
+            start = time.time()
+            transfer.copy(source, target)
+            transfer.finish()
+            if durability == Durability.NONE:
+                # include the writeback the kernel would do later anyway
+                os.sync()
+            duration = time.time() - start
+
+            print("{:>8}: {:8.2f} sec  {:10.1f} files/sec".format(
+                durability.value, duration, count / duration))
+
+            shutil.rmtree(target)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+
+# EOF #
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Measure the memory cost of a FileInfo, including its Location, as
+# it is created for every entry of a directory scan:
+#
+#   ./fileinfo_memory.py [COUNT]
+#
+# COUNT FileInfos are created from a temporary directory and kept
+# alive, the result is the number of allocated bytes per entry.
+
+
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.location import Location
+
+
+FILES_PER_DIRECTORY = 10000
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100000
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for i in range(FILES_PER_DIRECTORY):
+            with open(os.path.join(tmpdir, "IMG_{:06d}.jpg".format(i)), "w"):
+                pass
+
+        location = Location.from_path(tmpdir)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+
+        fileinfos = []
+        while len(fileinfos) < count:
+            with os.scandir(tmpdir) as it:
+                for entry in it:
+                    if len(fileinfos) >= count:
+                        break
+                    fileinfos.append(FileInfo.from_direntry(location, entry))
+
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # the list holding the FileInfos is not part of the cost
+        per_entry = (after - before - sys.getsizeof(fileinfos)) / len(fileinfos)
+
+        print("{} FileInfos: {:.1f} MiB, {:.0f} bytes per entry".format(
+            len(fileinfos), (after - before) / 1024 / 1024, per_entry))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+
+# EOF #
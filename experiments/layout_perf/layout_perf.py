@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Measure the cost of the FileView layout operations depending on the
+# number of files. 'all tiles' is what positioning every tile costs,
+# which is what a layout used to do, the other operations should
+# stay flat as the number of files grows:
+#
+#   ./layout_perf.py [COUNT]...
+
+
+import sys
+import time
+
+from PyQt5.QtCore import QRectF
+
+from dirtools.fileview.layout import RootLayout, HBoxLayout, TileLayout, TileStyle
+
+
+VIEWPORT_WIDTH = 1280
+VIEWPORT_HEIGHT = 720
+
+
+class Entry:
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def location(self) -> str:
+        return self.name
+
+
+def build(entries):
+    grid = TileLayout(TileStyle(), group=False)
+    grid.set_fileinfos(entries)
+
+    hbox = HBoxLayout()
+    hbox.add(grid)
+
+    root = RootLayout()
+    root.set_root(hbox)
+    root.set_append_layout(grid)
+    root.layout(VIEWPORT_WIDTH, VIEWPORT_HEIGHT)
+    return root, grid
+
+
+def measure(func, repeat=10):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv[1:]] or [1000, 10000, 100000, 1000000]
+
+    print("{:>8}  {:>10}  {:>10}  {:>10}  {:>10}  {:>10}  {:>10}".format(
+        "files", "build", "resize", "viewport", "insert", "remove", "all tiles"))
+
+    for count in counts:
+        entries = [Entry("file{:07d}".format(i)) for i in range(count)]
+
+        build_time = measure(lambda: build(list(entries)), repeat=3)
+
+        root, grid = build(list(entries))
+        resize_time = measure(lambda: root.layout(VIEWPORT_WIDTH - 100, VIEWPORT_HEIGHT))
+        root.layout(VIEWPORT_WIDTH, VIEWPORT_HEIGHT)
+
+        middle = root.get_bounding_rect().height() / 2
+        rect = QRectF(0, middle - VIEWPORT_HEIGHT, VIEWPORT_WIDTH, 3 * VIEWPORT_HEIGHT)
+        viewport_time = measure(lambda: list(root.get_fileinfos_in_rect(rect)))
+
+        # build the Location index outside of the measurement
+        root.get_fileinfo_pos(entries[0])
+
+        extra = Entry("extra")
+        insert_time = measure(lambda: (root.insert_fileinfo(grid, count // 2, extra),
+                                       root.remove_locations([extra.location()])), repeat=100)
+
+        # the file is inserted again to keep the count stable
+        def remove_one():
+            entry = grid.fileinfos[count // 2]
+            root.remove_locations([entry.location()])
+            root.relayout()
+            root.insert_fileinfo(grid, count // 2, entry)
+        remove_time = measure(remove_one, repeat=100)
+
+        all_time = measure(lambda: list(root.get_fileinfos_in_rect(None)), repeat=3)
+
+        print("{:>8}  {:>8.3f}ms  {:>8.3f}ms  {:>8.3f}ms  {:>8.3f}ms  {:>8.3f}ms  {:>8.3f}ms".format(
+            count,
+            build_time * 1000, resize_time * 1000, viewport_time * 1000,
+            insert_time * 1000, remove_time * 1000, all_time * 1000))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+
+# EOF #
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Microbenchmark of the Location operations that FileCollection,
+# FileView and the caches use for every file:
+#
+#   ./location_perf.py [NUMBER]
+
+
+import sys
+import timeit
+
+
+SETUP = ("from dirtools.fileview.location import Location; "
+         "a = Location.from_url('file:///home/juser/foo.rar//archive:bar.jpg'); "
+         "b = Location.from_url('file:///home/juser/foo.rar//archive:bar.jpg'); "
+         "d = Location.from_url('file:///home/juser/Pictures'); "
+         "c = d.join(d, 'IMG_0001.jpg')")
+
+
+TESTS = [
+    ("hash(a)", "hash(a)"),
+    ("a == b", "a == b"),
+    ("{a: 1}[b]", "{a: 1}[b]"),
+    ("a.as_url()", "a.as_url()"),
+    ("str(c)", "str(c)"),
+    ("Location.join(d, name)", "Location.join(d, 'IMG_0001.jpg')"),
+    ("d.child(name)", "d.child('IMG_0001.jpg')"),
+    ("c.parent()", "c.parent()"),
+    ("Location.from_url()", "Location.from_url('file:///home/juser/foo.rar//archive:bar.jpg')"),
+    ("Location.from_path()", "Location.from_path('/home/juser/Pictures/IMG_0001.jpg')"),
+]
+
+
+def main(argv):
+    number = int(argv[1]) if len(argv) > 1 else 1000000
+
+    for name, stmt in TESTS:
+        try:
+            duration = timeit.timeit(stmt, SETUP, number=number)
+        except AttributeError as err:
+            print("{:>24}: n/a ({})".format(name, err))
+        else:
+            print("{:>24}: {:6.3f} sec  {:7.1f} ns/op".format(name, duration, duration / number * 1e9))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+
+# EOF #
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Measure the cost of sorting a FileCollection, 'uncached' is the
+# SortedList rebuild with a plain key function for comparison:
+#
+#   ./sort_perf.py [COUNT]...
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sortedcontainers import SortedList
+
+from dirtools.fileview.file_collection import FileCollection
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.location import Location
+from dirtools.fileview.settings import settings
+from dirtools.fileview.sorter import Sorter
+from dirtools.util import numeric_sort_key
+
+
+FILES_PER_DIRECTORY = 10000
+
+
+def make_fileinfos(tmpdir, count):
+    """Creates 'count' FileInfos, the files of a single directory are
+    reused under different parent directories to not need millions of
+    files on disk."""
+
+    fileinfos = []
+    for i in range(0, count, FILES_PER_DIRECTORY):
+        location = Location.from_path(os.path.join(tmpdir, "dir{:04d}".format(i // FILES_PER_DIRECTORY)))
+        with os.scandir(tmpdir) as it:
+            for entry in it:
+                if len(fileinfos) >= count:
+                    break
+                fileinfos.append(FileInfo.from_direntry(location, entry))
+    return fileinfos
+
+
+def measure(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv[1:]] or [100000, 1000000]
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        settings.init(os.path.join(tmpdir, "settings.ini"))
+
+        for i in range(FILES_PER_DIRECTORY):
+            with open(os.path.join(tmpdir, "IMG_{:d}.jpg".format(i * 7919 % FILES_PER_DIRECTORY)), "w"):
+                pass
+
+        print("{:>8}  {:>10}  {:>10}  {:>10}  {:>10}  {:>10}  {:>10}".format(
+            "files", "uncached", "set", "reverse", "resort", "modify", "by size"))
+
+        for count in counts:
+            fileinfos = make_fileinfos(tmpdir, count)
+
+            def uncached_key(fileinfo):
+                return (not fileinfo.isdir(), numeric_sort_key(fileinfo.basename().lower()))
+
+            uncached_time = measure(lambda: SortedList(fileinfos, key=uncached_key))
+
+            collection = FileCollection()
+            sorter = Sorter()
+            collection.set_sorter(sorter)
+
+            set_time = measure(lambda: collection.set_fileinfos(fileinfos))
+
+            sorter.set_sort_reversed(True)
+            reverse_time = measure(lambda: collection.set_sorter(sorter))
+
+            # a new Sorter with the same order, keys have to be recomputed
+            resort_time = measure(lambda: collection.set_sorter(Sorter()))
+
+            # replace 1000 FileInfos with fresh ones, as a modify does
+            def modify():
+                for fileinfo in fileinfos[:1000]:
+                    collection.modify_file(FileInfo.from_path(fileinfo.abspath()))
+            modify_time = measure(modify)
+
+            sorter = Sorter()
+            sorter.set_key_func(lambda fileinfo: fileinfo.size())
+            size_time = measure(lambda: collection.set_sorter(sorter))
+
+            print("{:>8}  {:>8.3f}s  {:>8.3f}s  {:>8.3f}s  {:>8.3f}s  {:>8.3f}s  {:>8.3f}s".format(
+                count, uncached_time, set_time, reverse_time, resort_time, modify_time, size_time))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+
+# EOF #
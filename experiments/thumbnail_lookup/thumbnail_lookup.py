@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Compare loading existing thumbnails one by one with os.path.exists()
+# and QImage() against the ThumbnailIndex lookup and a decoder pool,
+# every other file has a thumbnail. 'exists' and 'index' only measure
+# finding the thumbnails, the decoding scales with the number of
+# cores:
+#
+#   ./thumbnail_lookup.py [COUNT] [THREADS]
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import xdg.BaseDirectory
+from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtGui import QColor, QImage
+
+from dirtools.dbus_thumbnailer import DBusThumbnailer
+from dirtools.fileview.thumbnail_index import ThumbnailIndex
+
+
+def make_thumbnails(urls, flavor):
+    image = QImage(128, 96, QImage.Format_RGB32)
+    for idx, url in enumerate(urls):
+        image.fill(QColor(idx % 256, (idx // 256) % 256, 0))
+        filename = DBusThumbnailer.thumbnail_from_url(url, flavor)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        image.save(filename)
+
+
+def load_sequential(urls, flavor):
+    images = []
+    for url in urls:
+        filename = DBusThumbnailer.thumbnail_from_url(url, flavor)
+        if os.path.exists(filename):
+            images.append(QImage(filename))
+    return images
+
+
+def find_sequential(urls, flavor):
+    return [filename
+            for filename in (DBusThumbnailer.thumbnail_from_url(url, flavor) for url in urls)
+            if os.path.exists(filename)]
+
+
+def find_indexed(urls, flavor):
+    index = ThumbnailIndex()
+    filenames = [filename
+                 for filename in (index.lookup(url, flavor) for url in urls)
+                 if filename is not None]
+    index.close()
+    return filenames
+
+
+def load_indexed(urls, flavor, threads):
+    index = ThumbnailIndex()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = []
+        for url in urls:
+            filename = index.lookup(url, flavor)
+            if filename is not None:
+                futures.append(executor.submit(QImage, filename))
+        images = [future.result() for future in futures]
+    index.close()
+    return images
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 10000
+    threads = int(argv[2]) if len(argv) > 2 else 4
+
+    app = QCoreApplication([])  # noqa: F841
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        xdg.BaseDirectory.xdg_cache_home = tmpdir
+
+        urls = ["file://" + urllib.parse.quote("/images/image{:06d}.jpg".format(i)) for i in range(count)]
+        make_thumbnails(urls[::2], "normal")
+
+        # the page cache can't be dropped without root, so all runs
+        # read warm files
+        for name, func in [("exists", lambda: find_sequential(urls, "normal")),
+                           ("index", lambda: find_indexed(urls, "normal")),
+                           ("sequential", lambda: load_sequential(urls, "normal")),
+                           ("indexed", lambda: load_indexed(urls, "normal", threads))]:
+            start = time.time()
+            images = func()
+            duration = time.time() - start
+            print("{:>10}: {:8.3f} sec  {} thumbnails".format(name, duration, len(images)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
+
+
+# EOF #
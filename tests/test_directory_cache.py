@@ -0,0 +1,154 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from dirtools.fileview.directory_cache import DirectoryCache, DirectoryReconciler, FILEINFO_SIZE_ESTIMATE
+from dirtools.fileview.file_collection import FileCollection, FileCollectionSnapshot
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.location import Location
+from dirtools.fileview.settings import settings
+
+
+class DirectoryCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        settings.init(os.path.join(self.tmpdir, "settings.ini"))
+
+        self.directory = os.path.join(self.tmpdir, "directory")
+        os.mkdir(self.directory)
+        for name in ["a.txt", "b.txt", "c.txt"]:
+            self._make_file(name, b"")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _make_file(self, name, content):
+        with open(os.path.join(self.directory, name), "wb") as fout:
+            fout.write(content)
+
+    def _scan(self):
+        location = Location.from_path(self.directory)
+        with os.scandir(self.directory) as it:
+            return [FileInfo.from_direntry(location, entry) for entry in it]
+
+    def test_budget(self):
+        settings.set_value("globals/directory_cache_size", 1)
+        cache = DirectoryCache()
+
+        count = 1024 * 1024 // FILEINFO_SIZE_ESTIMATE // 2
+        snapshot = FileCollectionSnapshot(self._scan() * (count // 3), None)
+
+        cache.store(Location.from_path("/a"), snapshot)
+        cache.store(Location.from_path("/b"), snapshot)
+        self.assertEqual(len(cache), 2)
+
+        cache.store(Location.from_path("/c"), snapshot)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.take(Location.from_path("/a")))
+        self.assertIs(cache.take(Location.from_path("/b")), snapshot)
+        self.assertEqual(len(cache), 1)
+
+        cache.store(Location.from_path("/d"), FileCollectionSnapshot(self._scan() * count * 3, None))
+        self.assertIsNone(cache.take(Location.from_path("/d")))
+
+    def test_peek(self):
+        cache = DirectoryCache()
+        location = Location.from_path("/a")
+        snapshot = FileCollectionSnapshot(self._scan(), None)
+
+        self.assertNotIn(location, cache)
+        cache.store(location, snapshot)
+        self.assertIn(location, cache)
+        self.assertIs(cache.peek(location), snapshot)
+        self.assertIs(cache.take(location), snapshot)
+        self.assertIsNone(cache.peek(location))
+
+    def test_restore(self):
+        collection = FileCollection()
+        collection.add_fileinfos(self._scan())
+        snapshot = collection.snapshot()
+        old_fileinfos = list(collection.get_fileinfos())
+
+        collection.clear()
+        collection.restore(snapshot)
+        self.assertEqual(list(collection.get_fileinfos()), old_fileinfos)
+
+        os.remove(os.path.join(self.directory, "a.txt"))
+        self._make_file("b.txt", b"Hello World")
+        self._make_file("d.txt", b"")
+
+        removed = []
+        added = []
+        modified = []
+        collection.sig_files_removed.connect(
+            lambda locations: removed.extend(os.path.basename(x.get_path()) for x in locations))
+        collection.sig_files_added.connect(lambda fileinfos, new: added.extend(fi.basename() for fi in fileinfos))
+        collection.sig_files_modified.connect(lambda fileinfos: modified.extend(fi.basename() for fi in fileinfos))
+
+        reconciler = DirectoryReconciler(collection)
+        reconciler.add_fileinfos(self._scan())
+        reconciler.finish()
+
+        self.assertEqual((removed, added, modified), (["a.txt"], ["d.txt"], ["b.txt"]))
+        self.assertEqual([fi.basename() for fi in collection.get_fileinfos()], ["b.txt", "c.txt", "d.txt"])
+        self.assertIs(collection.get_fileinfo(old_fileinfos[2].location()), old_fileinfos[2])
+
+    def test_reconcile_removed_by_inotify(self):
+        collection = FileCollection()
+        collection.restore(FileCollectionSnapshot(self._scan(), None))
+
+        reconciler = DirectoryReconciler(collection)
+        os.remove(os.path.join(self.directory, "a.txt"))
+        os.remove(os.path.join(self.directory, "b.txt"))
+        collection.remove_files([Location.from_path(os.path.join(self.directory, "a.txt"))])
+        reconciler.add_fileinfos(self._scan())
+
+        removed = []
+        collection.sig_files_removed.connect(
+            lambda locations: removed.extend(os.path.basename(x.get_path()) for x in locations))
+
+        with mock.patch("dirtools.fileview.file_collection.logger") as logger:
+            reconciler.finish()
+        self.assertFalse(logger.error.called)
+
+        self.assertEqual(removed, ["b.txt"])
+        self.assertEqual([fi.basename() for fi in collection.get_fileinfos()], ["c.txt"])
+
+    def test_restore_unfiltered(self):
+        self._make_file(".hidden", b"")
+
+        collection = FileCollection()
+        collection._filter.show_hidden = False
+
+        # the files must already be filtered when the view hears about them
+        hidden = []
+        collection.sig_files_set.connect(
+            lambda: hidden.extend(fi.basename() for fi in collection.get_fileinfos() if fi.is_hidden))
+
+        collection.restore(FileCollectionSnapshot(self._scan(), None))
+        self.assertEqual(hidden, [".hidden"])
+        self.assertIsNone(collection._filter_thread)
+        self.assertEqual(collection.snapshot().filter_key, ("", False))
+
+
+# EOF #
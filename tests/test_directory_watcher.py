@@ -0,0 +1,152 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import inotify_simple
+from inotify_simple import flags as inotify_flags
+
+from dirtools.fileview.directory_watcher import ChangeCoalescer, Change, DirectoryWatcherWorker
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.location import Location
+
+
+class FakeVfs:
+
+    def get_stdio_name(self, location: Location) -> str:
+        return location.get_path()
+
+    def get_fileinfo(self, location: Location) -> FileInfo:
+        return FileInfo.from_path(location.get_path())
+
+
+class ChangeCoalescerTestCase(unittest.TestCase):
+
+    def test_coalesce(self):
+        changes = ChangeCoalescer()
+        self.assertFalse(changes)
+
+        # download: create, write, close
+        for change in [Change.ADDED, Change.MODIFIED, Change.MODIFIED, Change.CLOSED]:
+            changes.add("download", change)
+
+        # temporary file
+        changes.add("tmp", Change.ADDED)
+        changes.add("tmp", Change.MODIFIED)
+        changes.add("tmp", Change.REMOVED)
+
+        # rewritten in place
+        changes.add("inplace", Change.MODIFIED)
+        changes.add("inplace", Change.CLOSED)
+
+        # atomically replaced via rename
+        changes.add("atomic", Change.REMOVED)
+        changes.add("atomic", Change.ADDED)
+
+        changes.add("deleted", Change.MODIFIED)
+        changes.add("deleted", Change.REMOVED)
+
+        self.assertTrue(changes)
+        self.assertEqual(changes.take(),
+                         {"download": Change.ADDED,
+                          "inplace": Change.CLOSED,
+                          "atomic": Change.REPLACED,
+                          "deleted": Change.REMOVED})
+        self.assertFalse(changes)
+
+    def test_replaced(self):
+        changes = ChangeCoalescer()
+
+        # renamed onto an existing file and deleted
+        changes.add("saved", Change.REPLACED)
+        changes.add("saved", Change.REMOVED)
+
+        # renamed onto a new name and deleted
+        changes.add("new", Change.ADDED)
+        changes.add("new", Change.REPLACED)
+        changes.add("new", Change.REMOVED)
+
+        changes.add("twice", Change.REPLACED)
+        changes.add("twice", Change.MODIFIED)
+        changes.add("twice", Change.REPLACED)
+
+        self.assertEqual(changes.take(),
+                         {"saved": Change.REMOVED,
+                          "twice": Change.REPLACED})
+
+
+class DirectoryWatcherWorkerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name in ["document.txt", "other.txt"]:
+            with open(os.path.join(self.tmpdir, name), "w"):
+                pass
+
+        self.worker = DirectoryWatcherWorker(FakeVfs(), Location.from_path(self.tmpdir))
+        self.worker._flush_timer = mock.Mock()
+        self.worker._flush_timer.isActive.return_value = True
+        self.worker.process()
+
+        self.removed = []
+        self.added = []
+        self.worker.sig_files_removed.connect(lambda locations: self.removed.extend(locations))
+        self.worker.sig_files_added.connect(lambda fileinfos: self.added.extend(fileinfos))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _event(self, flag, name):
+        self.worker.on_inotify_event(inotify_simple.Event(wd=1, mask=flag, cookie=0, name=name))
+
+    def _location(self, name):
+        return Location.from_path(os.path.join(self.tmpdir, name))
+
+    def test_rename_over_existing(self):
+        # atomic save: write a temporary file, rename it over the old one
+        os.rename(os.path.join(self.tmpdir, "other.txt"), os.path.join(self.tmpdir, "document.txt"))
+        self._event(inotify_flags.MOVED_FROM, "other.txt")
+        self._event(inotify_flags.MOVED_TO, "document.txt")
+        self.worker._flush_changes()
+
+        self.assertEqual(sorted(self.removed), [self._location("document.txt"), self._location("other.txt")])
+        self.assertEqual([fileinfo.location() for fileinfo in self.added], [self._location("document.txt")])
+
+    def test_rename_over_existing_and_delete(self):
+        self._event(inotify_flags.MOVED_TO, "document.txt")
+        self._event(inotify_flags.DELETE, "document.txt")
+
+        # a new name that comes and goes is never shown
+        self._event(inotify_flags.MOVED_TO, "new.txt")
+        self._event(inotify_flags.DELETE, "new.txt")
+
+        self.worker._flush_changes()
+        self.assertEqual(self.removed, [self._location("document.txt")])
+        self.assertEqual(self.added, [])
+
+        # gone now, a rename onto it is an addition
+        self._event(inotify_flags.MOVED_TO, "document.txt")
+        self.worker._flush_changes()
+        self.assertEqual(self.removed, [self._location("document.txt")])
+        self.assertEqual([fileinfo.location() for fileinfo in self.added], [self._location("document.txt")])
+
+
+# EOF #
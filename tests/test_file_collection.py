@@ -0,0 +1,195 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dirtools.fileview.file_collection import FileCollection
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.grouper import Grouper, NoGrouper
+from dirtools.fileview.settings import settings
+from dirtools.fileview.sorter import Sorter
+
+
+class FileCollectionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        settings.init(os.path.join(self.tmpdir, "settings.ini"))
+
+        self.directory = os.path.join(self.tmpdir, "directory")
+        os.mkdir(self.directory)
+        for name in ["c.txt", "a.txt", ".hidden", "b.txt"]:
+            with open(os.path.join(self.directory, name), "w"):
+                pass
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _fileinfos(self, *names):
+        return [FileInfo.from_path(os.path.join(self.directory, name)) for name in names]
+
+    def test_add_fileinfos(self):
+        collection = FileCollection()
+        collection._filter.show_hidden = False
+
+        chunks = []
+        collection.sig_files_added.connect(lambda fileinfos, new: chunks.append(fileinfos))
+
+        collection.add_fileinfos(self._fileinfos("c.txt", ".hidden"))
+        collection.add_fileinfos([])
+        collection.add_fileinfos(self._fileinfos("a.txt", "b.txt"))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2])
+        self.assertEqual([fi.basename() for fi in collection.get_fileinfos()],
+                         [".hidden", "a.txt", "b.txt", "c.txt"])
+        self.assertEqual([fi.basename() for fi in collection.get_fileinfos() if fi.is_visible],
+                         ["a.txt", "b.txt", "c.txt"])
+
+    def test_remove_files(self):
+        collection = FileCollection()
+        fileinfos = self._fileinfos("a.txt", "b.txt", "c.txt")
+        collection.add_fileinfos(fileinfos)
+
+        removed = []
+        collection.sig_files_removed.connect(removed.append)
+
+        collection.remove_files([fileinfos[0].location(), fileinfos[2].location(), fileinfos[0].location()])
+
+        self.assertEqual(removed, [[fileinfos[0].location(), fileinfos[2].location()]])
+        self.assertEqual([fi.basename() for fi in collection.get_fileinfos()], ["b.txt"])
+
+    def test_changes(self):
+        collection = FileCollection()
+        fileinfos = self._fileinfos("a.txt", "b.txt", "c.txt", "d.txt")
+        collection.add_fileinfos(fileinfos[:2])
+
+        added = []
+        removed = []
+        collection.sig_file_added.connect(lambda idx, fi: added.append([fi]))
+        collection.sig_files_added.connect(lambda fis, new: added.append(fis))
+        collection.sig_files_removed.connect(removed.append)
+
+        with collection.changes():
+            collection.add_fileinfo(fileinfos[2])
+            collection.add_fileinfo(fileinfos[3])
+            collection.remove_file(fileinfos[0].location())
+            collection.remove_file(fileinfos[3].location())
+            self.assertEqual(added, [])
+            self.assertEqual(removed, [])
+
+        self.assertEqual(removed, [[fileinfos[0].location(), fileinfos[3].location()]])
+        self.assertEqual(added, [[fileinfos[2]]])
+        self.assertEqual([fi.basename() for fi in collection.get_fileinfos()], ["b.txt", "c.txt"])
+
+    def test_set_sorter(self):
+        collection = FileCollection()
+        collection.add_fileinfos(self._fileinfos("c.txt", "a.txt", "b.txt"))
+
+        calls = []
+
+        def key_func(fileinfo):
+            calls.append(fileinfo)
+            return fileinfo.basename()
+
+        sorter = Sorter()
+        sorter.set_key_func(key_func)
+        collection.set_sorter(sorter)
+        self.assertEqual(len(calls), 3)
+
+        # reversing only flips the iteration order
+        sorter.set_sort_reversed(True)
+        collection.set_sorter(sorter)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual([fi.basename() for fi in collection.get_fileinfos()],
+                         ["c.txt", "b.txt", "a.txt"])
+
+        sorter.set_directories_first(False)
+        collection.set_sorter(sorter)
+        self.assertEqual(len(calls), 6)
+
+    def test_groups(self):
+        class ExtensionGrouper(Grouper):
+
+            def __call__(self, fileinfo):
+                fileinfo.group = fileinfo.ext() or None
+
+        for name in ["a.png", "b.png"]:
+            with open(os.path.join(self.directory, name), "w"):
+                pass
+
+        collection = FileCollection()
+        collection.add_fileinfos(self._fileinfos("c.txt", "b.png"))
+        collection.set_grouper(ExtensionGrouper())
+        collection.add_fileinfos(self._fileinfos("a.txt", "a.png", ".hidden"))
+
+        def groups():
+            return [(group, [fi.basename() for fi in fileinfos])
+                    for group, fileinfos in collection.get_groups()]
+
+        self.assertEqual(groups(), [(None, [".hidden"]),
+                                    (".txt", ["a.txt", "c.txt"]),
+                                    (".png", ["a.png", "b.png"])])
+
+        collection.remove_files([fi.location() for fi in self._fileinfos("a.png", "b.png")])
+        self.assertEqual(groups(), [(None, [".hidden"]),
+                                    (".txt", ["a.txt", "c.txt"])])
+
+        regrouped = []
+        collection.sig_files_regrouped.connect(regrouped.extend)
+        collection.set_grouper(NoGrouper())
+        fileinfo = collection.get_fileinfo(self._fileinfos("c.txt")[0].location())
+        collection._grouper = ExtensionGrouper()
+        collection.update_fileinfo(fileinfo)
+        self.assertEqual(regrouped, [fileinfo])
+        self.assertEqual(groups(), [(None, [".hidden", "a.txt"]),
+                                    (".txt", ["c.txt"])])
+
+    def test_selection(self):
+        collection = FileCollection()
+        collection._filter.show_hidden = False
+        fileinfos = self._fileinfos("a.txt", "b.txt", "c.txt", ".hidden")
+        collection.add_fileinfos(fileinfos)
+
+        changes = []
+        collection.sig_selection_changed.connect(lambda: changes.append(True))
+
+        collection.set_selected(fileinfos[0], True)
+        collection.set_selected(fileinfos[0], True)
+        self.assertTrue(collection.is_selected(fileinfos[0]))
+        self.assertEqual(len(changes), 1)
+
+        collection.update_selection([fileinfos[1]], [fileinfos[0]])
+        self.assertEqual(collection.selected_fileinfos(), [fileinfos[1]])
+
+        collection.select_all()
+        self.assertEqual(sorted(fi.basename() for fi in collection.selected_fileinfos()),
+                         ["a.txt", "b.txt", "c.txt"])
+
+        collection.set_cursor(fileinfos[2].location())
+        collection.remove_files([fileinfos[2].location()])
+        self.assertIsNone(collection.cursor())
+        self.assertFalse(collection.is_selected(fileinfos[2]))
+
+        collection.clear_selection()
+        self.assertEqual(collection.selected_fileinfos(), [])
+        self.assertEqual(len(changes), 5)
+
+
+# EOF #
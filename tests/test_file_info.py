@@ -15,10 +15,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import os
+import shutil
+import tempfile
 import unittest
 
 from dirtools.fileview.file_info import FileInfo
 from dirtools.fileview.lazy_file_info import LazyFileInfo
+from dirtools.fileview.location import Location
 
 
 class FileInfoTestCase(unittest.TestCase):
@@ -42,5 +46,32 @@ class FileInfoTestCase(unittest.TestCase):
             self.assertFalse(fi.is_image())
             self.assertFalse(fi.is_archive())
 
+    def test_file_info_from_direntry(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(tmpdir, "directory"))
+            with open(os.path.join(tmpdir, "file.png"), "w") as fout:
+                fout.write("Hello World")
+            os.symlink("directory", os.path.join(tmpdir, "symlink"))
+            os.symlink("nonexisting", os.path.join(tmpdir, "broken"))
+
+            location = Location.from_path(tmpdir)
+            with os.scandir(tmpdir) as it:
+                for entry in it:
+                    fi = FileInfo.from_direntry(location, entry)
+                    expected = FileInfo.from_path(entry.path)
+
+                    self.assertEqual(fi.location(), expected.location())
+                    self.assertEqual(fi.abspath(), expected.abspath())
+                    self.assertEqual(fi.dirname(), expected.dirname())
+                    self.assertEqual(fi.basename(), expected.basename())
+                    self.assertEqual(fi.ext(), expected.ext())
+                    self.assertEqual(fi.isdir(), expected.isdir())
+                    self.assertEqual(fi.isfile(), expected.isfile())
+                    self.assertEqual(fi.size(), expected.size())
+                    self.assertEqual(fi.have_access(), expected.have_access())
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 # EOF #
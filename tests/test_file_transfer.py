@@ -0,0 +1,235 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from dirtools.file_transfer import (FileTransfer, ConsoleMediator, ConsoleProgress,
+                                    Overwrite, is_unchanged, sha1sum)
+from dirtools.filesystem import (Durability, Filesystem, StreamingWriteback,
+                                 SYNC_FILE_RANGE_WAIT_BEFORE, SYNC_FILE_RANGE_WRITE,
+                                 SYNC_FILE_RANGE_WAIT_AFTER)
+from dirtools.hash_cache import HashCache
+
+
+class FileTransferTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.srcdir = os.path.join(self.tmpdir, "src")
+        self.dstdir = os.path.join(self.tmpdir, "dst")
+        os.makedirs(os.path.join(self.srcdir, "sub"))
+        os.mkdir(self.dstdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _make_file(self, path, content):
+        with open(path, "wb") as fout:
+            fout.write(content)
+
+    def _sync(self, jobs):
+        fs = Filesystem()
+        fs.verbose = False
+        mediator = ConsoleMediator()
+        mediator.overwrite = Overwrite.UPDATE
+        mediator.merge = Overwrite.UPDATE
+        progress = ConsoleProgress()
+        transfer = FileTransfer(fs, mediator, progress, jobs=jobs)
+        transfer.copy(self.srcdir, self.dstdir)
+        transfer.wait()
+        return progress
+
+    def test_is_unchanged(self):
+        source = os.path.join(self.srcdir, "file.txt")
+        dest = os.path.join(self.dstdir, "file.txt")
+        self._make_file(source, b"Hello World")
+        shutil.copy2(source, dest)
+        self.assertTrue(is_unchanged(source, dest))
+
+        os.utime(dest, ns=(0, 0))
+        self.assertFalse(is_unchanged(source, dest))
+
+        hash_cache = HashCache(os.path.join(self.tmpdir, "hashes.sqlite"))
+        self.assertTrue(is_unchanged(source, dest, hash_cache))
+        self._make_file(dest, b"Hello Moon!")
+        self.assertFalse(is_unchanged(source, dest, hash_cache))
+        hash_cache.close()
+
+    def test_update(self):
+        for i in range(10):
+            self._make_file(os.path.join(self.srcdir, "sub", "file{}.txt".format(i)), b"content")
+
+        progress = self._sync(jobs=4)
+        self.assertEqual((progress.new_files, progress.updated_files, progress.skipped_files),
+                         (10, 0, 0))
+
+        self._make_file(os.path.join(self.srcdir, "sub", "file3.txt"), b"changed content")
+        self._make_file(os.path.join(self.srcdir, "new.txt"), b"new")
+
+        progress = self._sync(jobs=1)
+        self.assertEqual((progress.new_files, progress.updated_files, progress.skipped_files),
+                         (1, 1, 9))
+
+        with open(os.path.join(self.dstdir, "src", "sub", "file3.txt"), "rb") as fin:
+            self.assertEqual(fin.read(), b"changed content")
+
+    def test_verify(self):
+        source = os.path.join(self.srcdir, "file.txt")
+        self._make_file(source, b"Hello World")
+
+        fs = Filesystem()
+        fs.verbose = False
+        progress = ConsoleProgress()
+        transfer = FileTransfer(fs, ConsoleMediator(), progress)
+        transfer.verify = True
+        transfer.manifest = io.StringIO()
+        transfer.copy(source, self.dstdir)
+
+        dest = os.path.join(self.dstdir, "file.txt")
+        self.assertEqual(progress.failed_verifications, 0)
+        self.assertEqual(transfer.manifest.getvalue(), "{}  {}\n".format(sha1sum(source), dest))
+
+        # simulate a destination that got corrupted on the way to the disk
+        fs.sha1sum_uncached = lambda path: "0" * 40
+        transfer.manifest = None
+        transfer.copy(source, os.path.join(self.srcdir, "sub"))
+        self.assertEqual(progress.failed_verifications, 1)
+
+    def test_streaming_copy(self):
+        source = os.path.join(self.srcdir, "file.bin")
+        dest = os.path.join(self.dstdir, "file.bin")
+        content = os.urandom(1024 * 1024 + 17)
+        self._make_file(source, content)
+
+        fs = Filesystem()
+        fs.verbose = False
+        fs.streaming = True
+        fs.streaming_buffer_size = 64 * 1024
+        fs.streaming_window_size = 256 * 1024
+        fs.copy_file(source, dest)
+
+        with open(dest, "rb") as fin:
+            self.assertEqual(fin.read(), content)
+
+    def test_streaming_writeback(self):
+        source = os.path.join(self.srcdir, "file.bin")
+        self._make_file(source, b"")
+        wait = SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE | SYNC_FILE_RANGE_WAIT_AFTER
+
+        with open(source, "rb") as fin, open(os.path.join(self.dstdir, "file.bin"), "wb") as fout, \
+             mock.patch("dirtools.filesystem.sync_file_range") as sync_file_range, \
+             mock.patch("os.posix_fadvise") as posix_fadvise:
+            src, dst = fin.fileno(), fout.fileno()
+
+            writeback = StreamingWriteback(fin, fout, 100)
+            posix_fadvise.assert_called_once_with(src, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            posix_fadvise.reset_mock()
+
+            # less than a window, nothing to do
+            writeback.update(50)
+            self.assertEqual(sync_file_range.call_args_list, [])
+
+            # first window complete, start its writeback, nothing to drop yet
+            writeback.update(100)
+            self.assertEqual(sync_file_range.call_args_list, [mock.call(dst, 0, 100, SYNC_FILE_RANGE_WRITE)])
+            self.assertEqual(posix_fadvise.call_args_list, [])
+            sync_file_range.reset_mock()
+
+            # second window complete, wait for and drop the first
+            writeback.update(150)
+            writeback.update(230)
+            self.assertEqual(sync_file_range.call_args_list,
+                             [mock.call(dst, 100, 130, SYNC_FILE_RANGE_WRITE),
+                              mock.call(dst, 0, 100, wait)])
+            self.assertEqual(posix_fadvise.call_args_list,
+                             [mock.call(dst, 0, 100, os.POSIX_FADV_DONTNEED),
+                              mock.call(src, 0, 100, os.POSIX_FADV_DONTNEED)])
+            sync_file_range.reset_mock()
+            posix_fadvise.reset_mock()
+
+            # the rest gets dropped at the end
+            writeback.finish(250)
+            self.assertEqual(sync_file_range.call_args_list, [mock.call(dst, 100, 150, wait)])
+            self.assertEqual(posix_fadvise.call_args_list,
+                             [mock.call(dst, 100, 150, os.POSIX_FADV_DONTNEED),
+                              mock.call(src, 100, 150, os.POSIX_FADV_DONTNEED)])
+
+    def _fd_path(self, fd):
+        return os.readlink("/proc/self/fd/{}".format(fd))
+
+    def _copy_with_durability(self, durability, dirs, fake_devices=None):
+        """Copy a file into each of 'dirs' and sync, returns the paths
+        given to os.fsync() and syncfs(). 'fake_devices' maps directories
+        to the st_dev they should report."""
+
+        source = os.path.join(self.srcdir, "file.txt")
+        self._make_file(source, b"Hello World")
+
+        fs = Filesystem()
+        fs.verbose = False
+        fs.durability = durability
+
+        real_stat = os.stat
+
+        def fake_stat(path, *args, **kwargs):
+            st = real_stat(path, *args, **kwargs)
+            if fake_devices is not None and path in fake_devices:
+                values = list(st)
+                values[2] = fake_devices[path]
+                st = os.stat_result(values)
+            return st
+
+        fsynced = []
+        synced = []
+        with mock.patch("os.fsync", side_effect=lambda fd: fsynced.append(self._fd_path(fd))), \
+             mock.patch("dirtools.filesystem.syncfs", side_effect=lambda fd: synced.append(self._fd_path(fd))), \
+             mock.patch("os.stat", side_effect=fake_stat):
+            for i, directory in enumerate(dirs):
+                fs.copy_file(source, os.path.join(directory, "file{}.txt".format(i)))
+            fs.sync()
+
+        return fsynced, synced
+
+    def test_durability_none(self):
+        fsynced, synced = self._copy_with_durability(Durability.NONE, [self.dstdir])
+        self.assertEqual((fsynced, synced), ([], []))
+
+    def test_durability_strict(self):
+        fsynced, synced = self._copy_with_durability(Durability.STRICT, [self.dstdir])
+        self.assertEqual(fsynced, [os.path.join(self.dstdir, "file0.txt"), self.dstdir])
+        self.assertEqual(synced, [])
+
+    def test_durability_batch(self):
+        dir1 = os.path.join(self.dstdir, "a")
+        dir2 = os.path.join(self.dstdir, "b")
+        dir3 = os.path.join(self.dstdir, "c")
+        for directory in (dir1, dir2, dir3):
+            os.mkdir(directory)
+
+        # one syncfs() per filesystem, one fsync() per directory
+        fsynced, synced = self._copy_with_durability(Durability.BATCH, [dir1, dir2, dir3, dir1],
+                                                     fake_devices={dir3: -1})
+        self.assertEqual(fsynced, [dir1, dir2, dir3])
+        self.assertEqual(synced, [dir1, dir3])
+
+
+# EOF #
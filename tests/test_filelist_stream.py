@@ -0,0 +1,40 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from dirtools.fileview.filelist_stream import EntrySplitter
+
+
+class EntrySplitterTestCase(unittest.TestCase):
+
+    def test_split(self):
+        splitter = EntrySplitter(b"\0")
+
+        self.assertEqual(splitter.feed(b"/tmp/a\0/tmp/"), [b"/tmp/a"])
+        self.assertEqual(splitter.feed(b"b"), [])
+        self.assertEqual(splitter.feed(b"\0\0/tmp/c\0/tmp/d"), [b"/tmp/b", b"/tmp/c"])
+        self.assertEqual(splitter.finish(), [b"/tmp/d"])
+        self.assertEqual(splitter.finish(), [])
+
+    def test_trailing_separator(self):
+        splitter = EntrySplitter(b"\n")
+
+        self.assertEqual(splitter.feed(b"a\nb\n"), [b"a", b"b"])
+        self.assertEqual(splitter.finish(), [])
+
+
+# EOF #
@@ -18,6 +18,7 @@
 import unittest
 
 from dirtools.fileview.filter_expr_parser import FilterExprParser
+from dirtools.fileview.match_func import match_func_implies
 
 
 class UtilTestCase(unittest.TestCase):
@@ -69,4 +70,37 @@ class UtilTestCase(unittest.TestCase):
             self.assertEqual(result, expected)
             parser.parse(text)
 
+    def test_match_func_implies(self):
+        test_cases = [
+            ("mk", "mkv", True),
+            ("mkv", "mk", False),
+            ("glob:*.mk", "glob:*.mkv", False),
+            ("glob:*.mkv", "glob:*.mkv", True),
+            ("mkv", "mkv size:>10", True),
+            ("mkv size:>10", "mkv", False),
+            ("size:>10", "size:>20", True),
+            ("size:>20", "size:>10", False),
+            ("size:<=20", "size:<10", True),
+            ("size:>10", "size:=20", True),
+            ("width:>640", "width:>=1280", True),
+            ("width:>640", "height:>1280", False),
+            ("contains:foo", "contains:foobar", True),
+            ("contains:foo", "Contains:foobar", False),
+            ("-foobar", "-foo", True),
+            ("-foo", "-foobar", False),
+            ("foo OR bar", "foo", True),
+            ("foo", "foo OR bar", False),
+            ("foo", "bar", False),
+            ("random:0.5", "random:0.5", False),
+        ]
+
+        parser = FilterExprParser()
+        for old, new, expected in test_cases:
+            self.assertEqual(match_func_implies(parser.parse(new), parser.parse(old)), expected,
+                             "{!r} -> {!r}".format(old, new))
+
+        self.assertTrue(match_func_implies(parser.parse("foo"), None))
+        self.assertFalse(match_func_implies(None, parser.parse("foo")))
+
+
 # EOF #
@@ -0,0 +1,86 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.filter import Filter
+from dirtools.fileview.filter_worker import FilterWorker
+from dirtools.fileview.settings import settings
+
+
+class FilterWorkerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        settings.init(os.path.join(self.tmpdir, "settings.ini"))
+
+        self.fileinfos = []
+        for i in range(1000):
+            path = os.path.join(self.tmpdir, ".file{:04d}".format(i) if i % 10 == 0 else "file{:04d}".format(i))
+            self.fileinfos.append(FileInfo.from_path(path))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_batches(self):
+        worker = FilterWorker()
+        worker._generation = 1
+
+        batches = []
+        finished = []
+        worker.sig_batch_ready.connect(lambda generation, results: batches.append(results))
+        worker.sig_finished.connect(finished.append)
+
+        filter = Filter()
+        filter.show_hidden = False
+        worker._on_filter_requested(1, filter, self.fileinfos, 100)
+
+        self.assertEqual([len(batch) for batch in batches], [100, 200, 400, 300])
+        self.assertEqual(finished, [1])
+
+        results = [result for batch in batches for result in batch]
+        self.assertEqual([fi for fi, is_excluded, is_hidden in results], self.fileinfos)
+        self.assertEqual(sum(is_hidden for fi, is_excluded, is_hidden in results), 100)
+
+        # evaluation must not touch the FileInfos, that is left to the GUI thread
+        self.assertFalse(any(fi.is_hidden for fi in self.fileinfos))
+
+    def test_cancel(self):
+        worker = FilterWorker()
+        worker._generation = 1
+
+        batches = []
+        finished = []
+
+        def on_batch_ready(generation, results):
+            batches.append(results)
+            # a newer request arrives while the first one is running
+            worker._generation = 2
+
+        worker.sig_batch_ready.connect(on_batch_ready)
+        worker.sig_finished.connect(finished.append)
+
+        worker._on_filter_requested(1, Filter(), self.fileinfos, 100)
+
+        self.assertEqual([len(batch) for batch in batches], [100])
+        self.assertEqual(finished, [])
+
+
+# EOF #
@@ -0,0 +1,89 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from PyQt5.QtCore import QRectF
+
+from dirtools.fileview.layout import RootLayout, HBoxLayout, TileLayout, TileStyle
+
+
+class Entry:
+
+    def __init__(self, name):
+        self.name = name
+
+    def location(self):
+        return self.name
+
+
+class LayoutTestCase(unittest.TestCase):
+
+    def _build(self, count):
+        style = TileStyle()
+        style.set_padding(10, 10)
+        style.set_spacing(5, 5)
+        style.set_tile_size(100, 100)
+
+        grid = TileLayout(style, group=False)
+        grid.set_fileinfos([Entry("file{}".format(i)) for i in range(count)])
+
+        hbox = HBoxLayout()
+        hbox.add(grid)
+
+        root = RootLayout()
+        root.set_root(hbox)
+        root.set_append_layout(grid)
+
+        # room for 4 columns
+        root.layout(20 + 4 * 105 - 5, 300)
+        return root, grid
+
+    def test_tile_pos(self):
+        root, grid = self._build(10)
+
+        self.assertEqual(grid.columns, 4)
+        self.assertEqual(grid.get_tile_pos(0), (10, 10))
+        self.assertEqual(grid.get_tile_pos(5), (115, 115))
+        self.assertEqual(grid.height, 3 * 105 - 5 + 20)
+
+    def test_fileinfos_in_rect(self):
+        root, grid = self._build(10)
+
+        tiles = list(root.get_fileinfos_in_rect(QRectF(0, 0, 120, 120)))
+        self.assertEqual([fi.name for fi, x, y in tiles], ["file0", "file1", "file4", "file5"])
+
+        tiles = list(root.get_fileinfos_in_rect(QRectF(0, 220, 1000, 1000)))
+        self.assertEqual([fi.name for fi, x, y in tiles], ["file8", "file9"])
+
+        self.assertEqual(len(list(root.get_fileinfos_in_rect(None))), 10)
+
+    def test_insert_remove(self):
+        root, grid = self._build(10)
+
+        root.remove_locations(["file1"])
+        root.relayout()
+        self.assertEqual(root.get_fileinfo_pos(grid.fileinfos[1]), (115, 10))
+        self.assertEqual(grid.fileinfos[1].name, "file2")
+
+        extra = Entry("extra")
+        root.insert_fileinfo(grid, 0, extra)
+        self.assertEqual(root.get_fileinfo_pos(extra), (10, 10))
+        self.assertEqual(root.get_fileinfo_pos(grid.fileinfos[4]), (10, 115))
+
+
+# EOF #
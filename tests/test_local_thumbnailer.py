@@ -0,0 +1,63 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import urllib.parse
+
+import xdg.BaseDirectory
+from PyQt5.QtGui import QColor, QImage
+
+from dirtools.dbus_thumbnailer import DBusThumbnailer
+from dirtools.local_thumbnailer import make_thumbnail
+
+
+class LocalThumbnailerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+        self.xdg_cache_home = xdg.BaseDirectory.xdg_cache_home
+        xdg.BaseDirectory.xdg_cache_home = os.path.join(self.tmpdir, "cache")
+
+    def tearDown(self):
+        xdg.BaseDirectory.xdg_cache_home = self.xdg_cache_home
+        shutil.rmtree(self.tmpdir)
+
+    def test_make_thumbnail(self):
+        filename = os.path.join(self.tmpdir, "image.jpg")
+        image = QImage(1024, 512, QImage.Format_RGB32)
+        image.fill(QColor(255, 0, 0))
+        self.assertTrue(image.save(filename))
+        url = "file://" + urllib.parse.quote(filename)
+
+        self.assertIsNone(make_thumbnail(filename, url, "normal"))
+
+        thumbnail = QImage(DBusThumbnailer.thumbnail_from_url(url, "normal"))
+        self.assertEqual((thumbnail.width(), thumbnail.height()), (128, 64))
+        self.assertEqual(thumbnail.text("Thumb::URI"), url)
+        self.assertEqual(thumbnail.text("Thumb::MTime"), str(int(os.path.getmtime(filename))))
+
+        broken = os.path.join(self.tmpdir, "broken.jpg")
+        with open(broken, "w") as fout:
+            fout.write("not an image")
+        self.assertIsNotNone(make_thumbnail(broken, "file://" + urllib.parse.quote(broken), "normal"))
+
+
+# EOF #
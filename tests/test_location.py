@@ -82,7 +82,7 @@ class LocationTestCase(unittest.TestCase):
             location = Location.from_url(text)
             self.assertEqual(location._protocol, protocol)
             self.assertEqual(location._path, abspath)
-            self.assertEqual(location._payloads, payloads)
+            self.assertEqual(location._payloads, tuple(payloads))
 
         fail_texts = [
             "/home/juser/test.rar",
@@ -124,7 +124,7 @@ class LocationTestCase(unittest.TestCase):
             location = location.parent()
             self.assertEqual(location._protocol, protocol, text)
             self.assertEqual(location._path, abspath, text)
-            self.assertEqual(location._payloads, payloads, text)
+            self.assertEqual(location._payloads, tuple(payloads), text)
 
     def test_location_join(self):
         join_texts = [
@@ -147,7 +147,32 @@ class LocationTestCase(unittest.TestCase):
 
             self.assertEqual(result._protocol, protocol, base_text)
             self.assertEqual(result._path, abspath, base_text)
-            self.assertEqual(result._payloads, payloads, base_text)
+            self.assertEqual(result._payloads, tuple(payloads), base_text)
+
+    def test_location_child(self):
+        child_texts = [
+            ("file:///", "foobar", "file:///foobar"),
+            ("file:///home/juser", "foobar", "file:///home/juser/foobar"),
+            ("file:///home/juser/test.rar//rar", "foobar", "file:///home/juser/test.rar//rar:foobar"),
+            ("file:///home/juser/test.rar//rar:foo", "bar.png", "file:///home/juser/test.rar//rar:foo/bar.png"),
+        ]
+
+        for base_text, name, expected in child_texts:
+            base = Location.from_url(base_text)
+            self.assertEqual(base.child(name), Location.from_url(expected), base_text)
+            self.assertEqual(base.child(name), Location.join(base, name), base_text)
+            self.assertEqual(hash(base.child(name)), hash(Location.join(base, name)), base_text)
+            self.assertIs(base.child(name).parent(), base, base_text)
+            self.assertEqual(base.child(name).parent(), base.child(name)._make_parent(), base_text)
+
+    def test_location_with_payload(self):
+        location = Location.from_url("file:///home/juser/test.rar")
+        archive = location.with_payload(Payload("archive", ""))
+
+        self.assertEqual(archive, Location.from_url("file:///home/juser/test.rar//archive"))
+        self.assertEqual(archive.as_url(), "file:///home/juser/test.rar//archive")
+        self.assertEqual(archive.origin(), location)
+        self.assertEqual(location.as_url(), "file:///home/juser/test.rar")
 
     def test_ancestry(self):
         location = Location.from_url("file:///home/juser/test.rar//rar:bar/foo.zip//zip:bar.png")
@@ -16,11 +16,12 @@
 
 
 import unittest
+from unittest import mock
 
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication
 
-from dirtools.fileview.metadata_collector import MetaDataCollector
+from dirtools.fileview.metadata_collector import MetaDataCollector, MetaDataCollectorWorker
 from dirtools.fileview.stdio_filesystem import StdioFilesystem
 from dirtools.fileview.location import Location
 
@@ -54,4 +55,34 @@ class MetaDataCollectorTestCase(unittest.TestCase):
             vfs.close()
 
 
+class MetaDataCollectorWorkerTestCase(unittest.TestCase):
+
+    def test_prefetch(self):
+        worker = MetaDataCollectorWorker(None)
+        worker._prefetch_timer = mock.Mock()
+
+        collected = []
+        worker._collect_metadata = collected.append
+
+        window1 = object()
+        window2 = object()
+        a, b, c, d = [Location.from_path("/" + name) for name in "abcd"]
+
+        worker.on_prefetch_requested([a, b], window1)
+        worker.on_prefetch_requested([c, d], window2)
+        worker._prefetch_next()
+        worker._prefetch_next()
+        self.assertEqual(collected, [a, c])
+
+        # cancelling one window leaves the other alone
+        worker.on_prefetch_requested([], window1)
+        self.assertFalse(worker._prefetch_timer.stop.called)
+        worker._prefetch_next()
+        self.assertEqual(collected, [a, c, d])
+
+        worker._prefetch_next()
+        self.assertTrue(worker._prefetch_timer.stop.called)
+        self.assertEqual(collected, [a, c, d])
+
+
 # EOF #
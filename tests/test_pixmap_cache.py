@@ -0,0 +1,80 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from PyQt5.QtGui import QImage
+
+from dirtools.fileview.pixmap_cache import PixmapCache
+from dirtools.fileview.settings import settings
+
+
+class PixmapCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        settings.init(os.path.join(self.tmpdir, "settings.ini"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_pixmap_cache(self):
+        settings.set_value("globals/pixmap_cache_size", 1)
+        cache = PixmapCache()
+
+        # QImage has the same size accessors as QPixmap, but doesn't
+        # need a QGuiApplication; 256x256x32bit = 256KiB
+        image = QImage(256, 256, QImage.Format_RGB32)
+
+        cache.put("file:///a", "normal", 100, image)
+        self.assertIs(cache.get("file:///a", "normal", 100), image)
+        self.assertIsNone(cache.get("file:///a", "normal", 101))
+        self.assertIsNone(cache.get("file:///a", "large", 100))
+
+        for name in "bcd":
+            cache.put("file:///" + name, "normal", 100, image)
+        self.assertEqual(len(cache), 4)
+
+        # 'a' was used last, so 'b' goes first
+        cache.get("file:///a", "normal", 100)
+        cache.put("file:///e", "normal", 100, image)
+        self.assertEqual(len(cache), 4)
+        self.assertIsNone(cache.get("file:///b", "normal", 100))
+        self.assertIsNotNone(cache.get("file:///a", "normal", 100))
+
+        cache.discard("file:///e")
+        cache.put("file:///a", "large", 100, QImage(16, 16, QImage.Format_RGB32))
+        cache.discard("file:///a")
+        self.assertIsNone(cache.get("file:///a", "normal", 100))
+        self.assertIsNone(cache.get("file:///a", "large", 100))
+        self.assertEqual(len(cache), 2)
+
+        cache.put("file:///c", "large", 100, QImage(16, 16, QImage.Format_RGB32))
+        cache.discard("file:///c", "large")
+        self.assertIsNotNone(cache.get("file:///c", "normal", 100))
+        self.assertIsNone(cache.get("file:///c", "large", 100))
+
+        # evicted and discarded urls don't linger in the index
+        self.assertEqual(sorted(cache._keys), ["file:///c", "file:///d"])
+        cache.clear()
+        self.assertEqual((len(cache), cache._keys), (0, {}))
+
+
+# EOF #
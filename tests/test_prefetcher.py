@@ -0,0 +1,209 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from dirtools.fileview.directory_cache import DirectoryCache
+from dirtools.fileview.file_collection import FileCollectionSnapshot
+from dirtools.fileview.file_info import FileInfo
+from dirtools.fileview.location import Location
+from dirtools.fileview.prefetcher import Prefetcher, PREFETCH_QUEUE_SIZE
+from dirtools.fileview.settings import settings
+
+
+class FakeDirectoryWatcher(QObject):
+
+    sig_scandir_progress = pyqtSignal(list)
+    sig_scandir_finished = pyqtSignal(list)
+    sig_message = pyqtSignal(str)
+
+    def __init__(self, vfs, location: Location) -> None:
+        super().__init__()
+
+        self.location = location
+        self.started = False
+        self.closed = False
+
+    def start(self) -> None:
+        self.started = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeApplication:
+
+    def __init__(self) -> None:
+        self.vfs = None
+        self.directory_cache = DirectoryCache()
+        self.metadata_collector = mock.Mock()
+        self.thumbnailer = mock.Mock()
+
+
+class PrefetcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        settings.init(os.path.join(self.tmpdir, "settings.ini"))
+
+        self.parent = os.path.join(self.tmpdir, "parent")
+        for name in ["dir1", "dir2", "dir10", ".hidden"]:
+            os.makedirs(os.path.join(self.parent, name))
+        with open(os.path.join(self.parent, "file.txt"), "w"):
+            pass
+
+        self.app = FakeApplication()
+        self.prefetcher = Prefetcher(self.app)
+        # timers need an event loop, _start_next() gets called directly
+        self.prefetcher._timer = mock.Mock()
+
+        patcher = mock.patch("dirtools.fileview.prefetcher.DirectoryWatcher", FakeDirectoryWatcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _location(self, *names):
+        return Location.from_path(os.path.join(self.parent, *names))
+
+    def _scan(self, *names):
+        path = os.path.join(self.parent, *names)
+        return [FileInfo.from_path(os.path.join(path, name)) for name in sorted(os.listdir(path))]
+
+    def test_prefetch_directory(self):
+        locations = [Location.from_path("/dir{}".format(i)) for i in range(6)]
+        for location in locations:
+            self.prefetcher.prefetch_directory(location)
+
+        # newest first, the oldest hints get dropped
+        self.assertEqual(self.prefetcher._queue, locations[:1:-1])
+        self.assertEqual(len(self.prefetcher._queue), PREFETCH_QUEUE_SIZE)
+        self.assertTrue(self.prefetcher._timer.start.called)
+
+        self.prefetcher.prefetch_directory(locations[3])
+        self.assertEqual(self.prefetcher._queue, [locations[3], locations[5], locations[4], locations[2]])
+
+        self.prefetcher.prefetch_directory(Location.from_url("file:///archive.zip//archive"))
+        self.assertEqual(len(self.prefetcher._queue), PREFETCH_QUEUE_SIZE)
+
+        self.prefetcher._start_next()
+        watcher = self.prefetcher._watcher
+        self.assertEqual(watcher.location, locations[3])
+        self.assertTrue(watcher.started)
+
+        # already being listed
+        self.prefetcher.prefetch_directory(locations[3])
+        self.assertNotIn(locations[3], self.prefetcher._queue)
+
+    def test_prefetch_siblings(self):
+        parent = Location.from_path(self.parent)
+        self.app.directory_cache.store(parent, FileCollectionSnapshot(self._scan(), None))
+
+        self.prefetcher.prefetch_siblings(self._location("dir2"))
+        self.assertEqual(self.prefetcher._queue, [self._location("dir10"), self._location("dir1")])
+
+        self.prefetcher.cancel()
+        self.prefetcher.prefetch_siblings(self._location("dir10"))
+        self.assertEqual(self.prefetcher._queue, [self._location("dir2")])
+
+        # hidden directories and files are no siblings
+        self.prefetcher.cancel()
+        self.prefetcher.prefetch_siblings(self._location(".hidden"))
+        self.assertEqual(self.prefetcher._queue, [])
+
+    def test_prefetch_siblings_uncached(self):
+        parent = Location.from_path(self.parent)
+
+        self.prefetcher.prefetch_siblings(self._location("dir1"))
+        self.assertEqual(self.prefetcher._queue, [parent])
+
+        self.prefetcher._start_next()
+        watcher = self.prefetcher._watcher
+        self.assertEqual(watcher.location, parent)
+
+        watcher.sig_scandir_finished.emit(self._scan())
+        self.assertTrue(watcher.closed)
+        self.assertIsNone(self.prefetcher._watcher)
+        self.assertIn(parent, self.app.directory_cache)
+        self.assertEqual(self.prefetcher._queue, [self._location("dir2")])
+
+        self.app.metadata_collector.prefetch_metadata.assert_called_once_with(
+            [self._location("file.txt")], self.prefetcher)
+
+    def test_postpone(self):
+        location = self._location("dir1")
+        self.prefetcher.prefetch_directory(self._location("dir2"))
+        self.prefetcher.prefetch_directory(location)
+        self.prefetcher._start_next()
+
+        watcher = self.prefetcher._watcher
+        watcher.sig_scandir_progress.emit(self._scan("dir1"))
+
+        self.prefetcher.postpone()
+        self.assertTrue(watcher.closed)
+        self.assertIsNone(self.prefetcher._watcher)
+        self.assertEqual(self.prefetcher._queue, [location, self._location("dir2")])
+
+        # results of the stopped listing must not show up anywhere
+        watcher.sig_scandir_finished.emit([])
+        self.assertNotIn(location, self.app.directory_cache)
+
+        self.prefetcher._start_next()
+        new_watcher = self.prefetcher._watcher
+        self.assertIsNot(new_watcher, watcher)
+        self.assertEqual(new_watcher.location, location)
+
+        watcher.sig_scandir_progress.emit(self._scan())
+        watcher.sig_scandir_finished.emit([])
+        self.assertIs(self.prefetcher._watcher, new_watcher)
+        self.assertEqual(self.prefetcher._fileinfos, [])
+
+        new_watcher.sig_scandir_finished.emit([])
+        self.assertEqual(self.app.directory_cache.peek(location).fileinfos, [])
+
+        # warming gets stopped as well
+        self.prefetcher.postpone()
+        self.app.metadata_collector.prefetch_metadata.assert_called_with([], self.prefetcher)
+        self.app.thumbnailer.prefetch_thumbnails.assert_called_with([], "normal", self.prefetcher)
+
+    def test_too_many_files(self):
+        location = Location.from_path(self.parent)
+        self.prefetcher.prefetch_directory(location)
+        self.prefetcher._start_next()
+        watcher = self.prefetcher._watcher
+
+        with mock.patch("dirtools.fileview.prefetcher.PREFETCH_MAX_FILES", 4):
+            watcher.sig_scandir_progress.emit(self._scan()[:3])
+            self.assertIs(self.prefetcher._watcher, watcher)
+
+            watcher.sig_scandir_progress.emit(self._scan()[3:])
+            self.assertTrue(watcher.closed)
+            self.assertIsNone(self.prefetcher._watcher)
+
+            watcher.sig_scandir_finished.emit([])
+            self.assertNotIn(location, self.app.directory_cache)
+            self.assertFalse(self.app.metadata_collector.prefetch_metadata.called)
+
+
+# EOF #
@@ -0,0 +1,172 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from PyQt5.QtCore import QCoreApplication, Qt
+
+from dirtools.fileview.search_stream import SearchStream, SEARCH_EMIT_INTERVAL
+from dirtools.find.filter import SimpleFilter
+from dirtools.find.walk import walk
+
+
+class SlowIterator:
+
+    def __init__(self, it, event, delay):
+        self._it = it
+        self._event = event
+        self._delay = delay
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._it.close()
+
+    def __iter__(self):
+        if self._event is not None:
+            self._event.wait()
+        for entry in self._it:
+            time.sleep(self._delay)
+            yield entry
+
+
+class SlowScandir:
+    """Wraps os.scandir() so that listing 'path' blocks on 'event'
+    and then yields one entry every 'delay' seconds."""
+
+    def __init__(self, path, event=None, delay=0.0):
+        self._scandir = os.scandir
+        self._path = path
+        self._event = event
+        self._delay = delay
+
+    def __call__(self, path):
+        it = self._scandir(path)
+        if path != self._path:
+            return it
+        else:
+            return SlowIterator(it, self._event, self._delay)
+
+
+class SearchStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # the worker thread's event loop wants an application
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+
+        self.tmpdir = tempfile.mkdtemp()
+
+        for directory in ["a", "a/b", "a/b/c", "d"]:
+            os.makedirs(os.path.join(self.tmpdir, directory))
+        for filename in ["1.jpg", "2.png", "a/3.jpg", "a/b/4.jpg", "a/b/c/5.txt", "d/6.jpg"]:
+            with open(os.path.join(self.tmpdir, filename), "w"):
+                pass
+        os.symlink("a/b", os.path.join(self.tmpdir, "link.jpg"))
+        os.symlink("1.jpg", os.path.join(self.tmpdir, "d/7.jpg"))
+
+        self.progress = []
+        self.finished = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _start(self, pattern):
+        stream = SearchStream(self.tmpdir, pattern)
+
+        # direct connections, the main thread doesn't run an event loop
+        stream.sig_scandir_progress.connect(lambda fileinfos: self.progress.append(fileinfos),
+                                            type=Qt.DirectConnection)
+        stream.sig_scandir_finished.connect(lambda fileinfos: self.finished.append(fileinfos),
+                                            type=Qt.DirectConnection)
+        stream.start()
+        return stream
+
+    def _wait(self, condition, timeout=5.0):
+        end = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), end, "timed out")
+            time.sleep(0.01)
+
+    def _results(self):
+        return sorted(fileinfo.abspath()
+                      for fileinfos in self.progress + self.finished
+                      for fileinfo in fileinfos)
+
+    def test_matches(self):
+        # what the walk() based search used to give
+        simple_filter = SimpleFilter.from_string("*.jpg")
+        expected = sorted(os.path.join(root, filename)
+                          for root, dirs, files in walk(self.tmpdir, topdown=False, maxdepth=None)
+                          for filename in files
+                          if simple_filter.match_file(root, filename))
+        self.assertIn(os.path.join(self.tmpdir, "link.jpg"), expected)
+
+        stream = self._start("*.jpg")
+        try:
+            self._wait(lambda: self.finished)
+        finally:
+            stream.close()
+
+        self.assertEqual(self._results(), expected)
+
+    def test_finished_once(self):
+        event = threading.Event()
+        with mock.patch("os.scandir", SlowScandir(os.path.join(self.tmpdir, "a/b/c"), event)):
+            stream = self._start("*.jpg")
+            try:
+                # everything but a/b/c is done, the search isn't
+                time.sleep(SEARCH_EMIT_INTERVAL * 3 / 1000)
+                self.assertEqual(self.finished, [])
+
+                event.set()
+                self._wait(lambda: self.finished)
+
+                time.sleep(SEARCH_EMIT_INTERVAL * 3 / 1000)
+                self.assertEqual(len(self.finished), 1)
+            finally:
+                stream.close()
+
+        self.assertEqual(len(self._results()), 6)
+
+    def test_close(self):
+        for i in range(100):
+            with open(os.path.join(self.tmpdir, "a", "{}.jpg".format(i)), "w"):
+                pass
+
+        # listing a/ takes ten seconds, if nobody stops it
+        with mock.patch("os.scandir", SlowScandir(os.path.join(self.tmpdir, "a"), delay=0.1)):
+            stream = self._start("*.jpg")
+            self._wait(lambda: self.progress)
+
+            start = time.monotonic()
+            stream.close()
+            self.assertLess(time.monotonic() - start, 1.0)
+
+            emitted = len(self.progress) + len(self.finished)
+            time.sleep(SEARCH_EMIT_INTERVAL * 3 / 1000)
+            self.assertEqual(len(self.progress) + len(self.finished), emitted)
+            self.assertEqual(self.finished, [])
+
+
+# EOF #
@@ -0,0 +1,138 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import inotify_simple
+import xdg.BaseDirectory
+from PyQt5.QtGui import QColor, QImage
+
+from dirtools.dbus_thumbnailer import DBusThumbnailer
+from dirtools.fileview.location import Location
+from dirtools.fileview.thumbnail_index import ThumbnailIndex
+from dirtools.fileview.thumbnailer import ThumbnailerWorker, ThumbnailRequest
+
+
+class SyncExecutor:
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class ThumbnailIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+        self.xdg_cache_home = xdg.BaseDirectory.xdg_cache_home
+        xdg.BaseDirectory.xdg_cache_home = os.path.join(self.tmpdir, "cache")
+
+        self.index = ThumbnailIndex()
+
+    def tearDown(self):
+        self.index.close()
+        xdg.BaseDirectory.xdg_cache_home = self.xdg_cache_home
+        shutil.rmtree(self.tmpdir)
+
+    def _url(self, name):
+        return "file://" + os.path.join(self.tmpdir, name)
+
+    def _make_thumbnail(self, name, valid=True):
+        filename = DBusThumbnailer.thumbnail_from_url(self._url(name), "normal")
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        if valid:
+            image = QImage(16, 16, QImage.Format_RGB32)
+            image.fill(QColor(255, 0, 0))
+            self.assertTrue(image.save(filename, "PNG"))
+        else:
+            with open(filename, "w") as fout:
+                fout.write("not an image")
+        return filename
+
+    def _process_events(self):
+        """Deliver the pending inotify events, what the QSocketNotifier
+        would do in the event loop."""
+        inotify = self.index._watches["normal"]
+        inotify._on_activated(inotify.inotify.fd)
+
+    def test_lookup(self):
+        a = self._make_thumbnail("a.jpg")
+
+        # listed on first use
+        self.assertEqual(self.index.lookup(self._url("a.jpg"), "normal"), a)
+        self.assertIsNone(self.index.lookup(self._url("b.jpg"), "normal"))
+        self.assertIsNone(self.index.lookup(self._url("a.jpg"), "large"))
+
+        b = self._make_thumbnail("b.jpg")
+        self._process_events()
+        self.assertEqual(self.index.lookup(self._url("b.jpg"), "normal"), b)
+
+        os.remove(a)
+        self._process_events()
+        self.assertIsNone(self.index.lookup(self._url("a.jpg"), "normal"))
+
+        # written under a temporary name and renamed, as the spec demands
+        c = DBusThumbnailer.thumbnail_from_url(self._url("c.jpg"), "normal")
+        os.rename(b, c)
+        self._process_events()
+        self.assertEqual(self.index.lookup(self._url("c.jpg"), "normal"), c)
+        self.assertIsNone(self.index.lookup(self._url("b.jpg"), "normal"))
+
+    def test_overflow(self):
+        self.assertIsNone(self.index.lookup(self._url("a.jpg"), "normal"))
+
+        # events that got lost, the directory gets listed again
+        a = self._make_thumbnail("a.jpg")
+        inotify = self.index._watches["normal"]
+        inotify.sig_event.emit(inotify_simple.Event(wd=-1, mask=inotify_simple.flags.Q_OVERFLOW,
+                                                    cookie=0, name=""))
+        self.assertEqual(self.index.lookup(self._url("a.jpg"), "normal"), a)
+        self.assertIs(self.index._watches["normal"], inotify)
+
+    def test_decode_failed(self):
+        vfs = mock.Mock()
+        vfs.get_stdio_url.side_effect = lambda location: location.as_url()
+
+        worker = ThumbnailerWorker(vfs)
+        worker._index = self.index
+        worker._decoder = SyncExecutor()
+        worker._dispatch_timer = mock.Mock()
+        worker._dispatch_timer.isActive.return_value = False
+        worker.sig_decode_failed.connect(worker._queue_request)
+
+        ready = []
+        worker.sig_thumbnail_ready.connect(lambda location, flavor, callback, image: ready.append(location))
+
+        good = ThumbnailRequest(Location.from_url(self._url("good.jpg")), "normal", None)
+        broken = ThumbnailRequest(Location.from_url(self._url("broken.jpg")), "normal", None)
+        self._make_thumbnail("good.jpg")
+        self._make_thumbnail("broken.jpg", valid=False)
+
+        worker._lookup_requests = {good: 3, broken: 2}
+        worker._lookup()
+
+        # the broken one goes to the thumbnailer to be generated again
+        self.assertEqual(ready, [good.location])
+        self.assertEqual(list(worker._pending_requests), [broken])
+        self.assertEqual(worker._pending_requests[broken][0], 2)
+
+
+# EOF #
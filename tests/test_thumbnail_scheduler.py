@@ -0,0 +1,198 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+from unittest import mock
+
+from dirtools.fileview.location import Location
+from dirtools.fileview.thumbnailer import ThumbnailerWorker, ThumbnailRequest, THUMBNAIL_BATCH_DELAY
+
+
+class FakeVfs:
+
+    def get_stdio_url(self, location: Location) -> str:
+        return location.as_url()
+
+    def get_stdio_name(self, location: Location) -> str:
+        return location.get_path()
+
+
+class FakeThumbnailer:
+
+    def __init__(self) -> None:
+        self.queued = []
+        self.dequeued = []
+
+    def queue(self, files, flavor="default"):
+        self.queued.append((files, flavor))
+        return len(self.queued)
+
+    def dequeue(self, handle) -> None:
+        self.dequeued.append(handle)
+
+
+class FakeTimer:
+
+    def __init__(self) -> None:
+        self.interval = None
+
+    def start(self, interval=0) -> None:
+        self.interval = interval
+
+    def stop(self) -> None:
+        self.interval = None
+
+    def isActive(self) -> bool:
+        return self.interval is not None
+
+    def remainingTime(self) -> int:
+        return self.interval
+
+
+def callback1(*args):
+    pass
+
+
+def callback2(*args):
+    pass
+
+
+class ThumbnailSchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.worker = ThumbnailerWorker(FakeVfs())
+        self.thumbnailer = FakeThumbnailer()
+        self.worker._thumbnailer = self.thumbnailer
+        self.worker._dispatch_timer = FakeTimer()
+        self.worker._lookup_timer = FakeTimer()
+
+    def _request(self, name, flavor="normal", callback=callback1):
+        return ThumbnailRequest(Location.from_path("/" + name), flavor, callback)
+
+    def _queue(self, priority, name, flavor="normal", callback=callback1):
+        self.worker._queue_request(self._request(name, flavor, callback), priority)
+
+    def _fire(self):
+        """Let the dispatch timer expire."""
+        self.assertTrue(self.worker._dispatch_timer.isActive())
+        self.worker._dispatch_timer.stop()
+        self.worker._dispatch()
+
+    def test_dispatch_order(self):
+        for name, flavor, priority in [("a", "normal", 5), ("b", "normal", 1), ("c", "large", 2),
+                                       ("d", "normal", 3), ("e", "large", 7), ("f", "normal", 4)]:
+            self._queue(priority, name, flavor)
+
+        with mock.patch("dirtools.fileview.thumbnailer.THUMBNAIL_BATCH_SIZE", 2):
+            self._fire()
+
+            # best first, batches are per flavor, only two in flight
+            self.assertEqual(self.thumbnailer.queued,
+                             [(["/b", "/d"], "normal"),
+                              (["/c", "/e"], "large")])
+            self.assertFalse(self.worker._dispatch_timer.isActive())
+
+            self.worker.on_thumbnail_finished(1)
+            self.assertEqual(self.worker._dispatch_timer.interval, THUMBNAIL_BATCH_DELAY)
+            self._fire()
+
+        self.assertEqual(self.thumbnailer.queued[2:], [(["/f", "/a"], "normal")])
+        self.assertEqual(self.worker._pending_requests, {})
+
+    def test_delay(self):
+        self._queue(3, "a")
+        self.assertEqual(self.worker._dispatch_timer.interval, THUMBNAIL_BATCH_DELAY)
+
+        # visible thumbnails go out right away
+        self._queue(0, "b")
+        self.assertEqual(self.worker._dispatch_timer.interval, 0)
+
+        self._queue(3, "c")
+        self.assertEqual(self.worker._dispatch_timer.interval, 0)
+
+        self._fire()
+        self.assertEqual(self.thumbnailer.queued, [(["/b", "/a", "/c"], "normal")])
+
+    def test_prioritize(self):
+        self._queue(3, "a")
+        self._queue(4, "b")
+        self._queue(5, "c", callback=callback2)
+        self.assertEqual(self.worker._dispatch_timer.interval, THUMBNAIL_BATCH_DELAY)
+
+        # only the requests of the given callback are affected
+        self.worker.on_prioritize_requested({Location.from_path("/b"): 0,
+                                             Location.from_path("/c"): 0}, callback1)
+        self.assertEqual(self.worker._dispatch_timer.interval, 0)
+        self.assertEqual(self.worker._pending_requests[self._request("b")][0], 0)
+        self.assertEqual(self.worker._pending_requests[self._request("c", callback=callback2)][0], 5)
+
+        self._fire()
+        self.assertEqual(self.thumbnailer.queued, [(["/b", "/a", "/c"], "normal")])
+
+    def test_cancel(self):
+        self.worker._lookup_requests[self._request("x")] = 0
+        for name in ["a", "b", "c"]:
+            self._queue(0, name)
+        self._queue(0, "a", callback=callback2)
+
+        with mock.patch("dirtools.fileview.thumbnailer.THUMBNAIL_BATCH_SIZE", 2):
+            self._fire()
+        self.assertEqual(len(self.thumbnailer.queued), 2)
+        self.assertEqual(self.worker._pending_requests, {})
+
+        # batch 1 is a and b, batch 2 is c and a of the other callback
+        self.worker.on_cancel_requested([Location.from_path("/x"), Location.from_path("/a")], callback1)
+        self.assertEqual(self.worker._lookup_requests, {})
+        self.assertEqual(self.thumbnailer.dequeued, [])
+
+        # the last url of the batch goes, so does the batch
+        self.worker.on_cancel_requested([Location.from_path("/b")], callback1)
+        self.assertEqual(self.thumbnailer.dequeued, [1])
+        self.assertNotIn(1, self.worker._queued_requests)
+
+        # still wanted by another callback
+        self.worker.on_cancel_requested([Location.from_path("/c")], callback1)
+        self.assertEqual(self.thumbnailer.dequeued, [1])
+        self.assertEqual(list(self.worker._queued_requests[2]), ["file:///a"])
+
+        self.worker.on_cancel_requested([Location.from_path("/a")], callback2)
+        self.assertEqual(self.thumbnailer.dequeued, [1, 2])
+        self.assertEqual(self.worker._queued_requests, {})
+
+    def test_prefetch(self):
+        self.worker._prefetch_timer = FakeTimer()
+        self.worker._index = mock.Mock()
+        self.worker._index.lookup.return_value = None
+
+        window1 = object()
+        window2 = object()
+        a, b, c = [Location.from_path("/" + name) for name in "abc"]
+
+        self.worker.on_prefetch_requested([a, b], "normal", window1)
+        self.worker.on_prefetch_requested([c], "large", window2)
+
+        # cancelling one window leaves the other alone
+        self.worker.on_prefetch_requested([], "normal", window1)
+        self.assertTrue(self.worker._prefetch_timer.isActive())
+
+        self.worker._prefetch_next()
+        self.worker._prefetch_next()
+        self.assertFalse(self.worker._prefetch_timer.isActive())
+        self.worker._index.lookup.assert_called_once_with("file:///c", "large")
+
+
+# EOF #
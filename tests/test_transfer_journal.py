@@ -0,0 +1,130 @@
+# dirtool.py - diff tool for directories
+# Copyright (C) 2018 Ingo Ruhnke <grumbel@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from dirtools.file_transfer import FileTransfer, ConsoleMediator, ConsoleProgress, Overwrite
+from dirtools.filesystem import Filesystem
+from dirtools.transfer_journal import TransferJournal, JournalState
+
+
+class TransferJournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.journal_dir = os.path.join(self.tmpdir, "journal")
+        self.srcdir = os.path.join(self.tmpdir, "src")
+        self.dstdir = os.path.join(self.tmpdir, "dst")
+        os.mkdir(self.srcdir)
+        os.mkdir(self.dstdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _make_file(self, path, content):
+        with open(path, "wb") as fout:
+            fout.write(content)
+
+    def _read_file(self, path):
+        with open(path, "rb") as fin:
+            return fin.read()
+
+    def _make_transfer(self, journal):
+        fs = Filesystem()
+        fs.verbose = False
+        mediator = ConsoleMediator()
+        mediator.overwrite = Overwrite.NEVER
+        return FileTransfer(fs, mediator, ConsoleProgress(), journal)
+
+    def test_load(self):
+        source = os.path.join(self.srcdir, "file.txt")
+        dest = os.path.join(self.dstdir, "file.txt")
+        self._make_file(source, b"Hello World")
+
+        journal = TransferJournal.create("move", [source], self.dstdir, directory=self.journal_dir)
+        journal.planned(source, dest)
+        self.assertEqual(TransferJournal.find_unfinished(self.journal_dir), [])
+        journal.close()
+
+        journals = TransferJournal.find_unfinished(self.journal_dir)
+        self.assertEqual(len(journals), 1)
+        self.assertEqual(journals[0].abs_sources(), [source])
+        self.assertEqual(journals[0].destdir, self.dstdir)
+        self.assertEqual(journals[0].lookup(source, dest).state, JournalState.PLANNED)
+
+        journals[0].finish()
+        self.assertEqual(TransferJournal.find_unfinished(self.journal_dir), [])
+
+    def test_resume_partial(self):
+        source = os.path.join(self.srcdir, "file.txt")
+        dest = os.path.join(self.dstdir, "file.txt")
+        self._make_file(source, b"Hello World")
+        self._make_file(dest, b"Hello")
+
+        journal = TransferJournal.create("move", [source], self.dstdir, directory=self.journal_dir)
+        journal.planned(source, dest)
+
+        self._make_transfer(journal).move(source, self.dstdir)
+
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual(self._read_file(dest), b"Hello World")
+        self.assertEqual(journal.lookup(source, dest).state, JournalState.VERIFIED)
+        journal.finish()
+
+    def test_resume_completed(self):
+        source = os.path.join(self.srcdir, "file.txt")
+        dest = os.path.join(self.dstdir, "file.txt")
+        self._make_file(source, b"Hello World")
+        shutil.copy2(source, dest)
+
+        journal = TransferJournal.create("move", [source], self.dstdir, directory=self.journal_dir)
+        journal.planned(source, dest)
+        journal.completed(dest)
+        self.assertTrue(journal.is_transferred(source, dest))
+
+        # a file changed since the copy must not count as transferred
+        os.utime(dest, ns=(0, 0))
+        self.assertFalse(journal.is_transferred(source, dest))
+        shutil.copystat(source, dest)
+
+        self._make_transfer(journal).move(source, self.dstdir)
+
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual(self._read_file(dest), b"Hello World")
+        journal.finish()
+
+    def test_unrelated_conflict(self):
+        source = os.path.join(self.srcdir, "file.txt")
+        dest = os.path.join(self.dstdir, "file.txt")
+        self._make_file(source, b"Hello World")
+        self._make_file(dest, b"Unrelated")
+
+        journal = TransferJournal.create("move", [source], self.dstdir, directory=self.journal_dir)
+
+        # without a journal entry the Mediator decides, which is set
+        # to never overwrite
+        self._make_transfer(journal).move(source, self.dstdir)
+
+        self.assertTrue(os.path.exists(source))
+        self.assertEqual(self._read_file(dest), b"Unrelated")
+        journal.finish()
+
+
+# EOF #